@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        # In-process job worker: opted into by the server's launch config
+        # (JOB_SCHEDULER_IN_PROCESS=1), so queued/leased jobs are recovered after
+        # a restart without waiting for a submission or poll. Other processes that
+        # load Django (migrate, shells, tests, scripts) never start it; without the
+        # flag, run `manage.py run_job_worker` instead.
+        if getattr(settings, "ENABLE_SCHEDULER", False) and getattr(settings, "JOB_SCHEDULER_IN_PROCESS", False):
+            from core.services.job_scheduler import get_job_worker
+            get_job_worker().start()
+
+        # Curated-pair index: loaded (or built) off the request path at startup
+        # when the launch config asks for it; otherwise on first lookup
+        if (getattr(settings, "CURATED_INDEX_WARM_ON_STARTUP", False)
+                and getattr(settings, "CURATED_LOOKUP_MODE", "alongside") != "off"):
+            from core.services.curated_index import get_curated_index
+            get_curated_index().refresh_in_background()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.services.curated_index import get_curated_index
+from core.services.dataset_store import DatasetNotFound, DatasetSchemaError
+
+
+class Command(BaseCommand):
+    help = "Build the curated (ligand, receptor) pair index from evolf_data.csv and persist it next to the CSV"
+
+    def handle(self, *args, **options):
+        index = get_curated_index()
+        self.stdout.write(self.style.NOTICE(f"🧪 Indexing curated pairs from {index.store.csv_path}..."))
+
+        try:
+            keys = index.refresh(rebuild=True)
+        except DatasetNotFound:
+            self.stdout.write(self.style.WARNING(f"⚠️ {index.store.csv_path} not found; curated index not built."))
+            return
+        except DatasetSchemaError as e:
+            self.stdout.write(self.style.WARNING(f"⚠️ {e}; curated index not built."))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Indexed {keys} pair keys into {index.path}."))
+
+
+#python manage.py build_curated_index
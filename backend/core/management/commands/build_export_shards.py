@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.services.export_shards import build_export_shards, get_shard_dir
+
+
+class Command(BaseCommand):
+    help = "Build pre-compressed export shards (Species x Class x Mutation_Status) from the EvOlf table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default=None, help='Shard directory (defaults to <media>/export_shards)')
+
+    def handle(self, *args, **options):
+        shard_dir = options.get('output') or get_shard_dir()
+        self.stdout.write(self.style.NOTICE(f"📦 Building export shards in {shard_dir}..."))
+
+        manifest = build_export_shards(shard_dir)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {len(manifest['shards'])} shards covering {manifest['totalRecords']} records."
+        ))
+
+
+#python manage.py build_export_shards
@@ -0,0 +1,83 @@
+import gzip
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.media_manifest import MEDIA_DIRS, PRECOMPRESSED_SUFFIXES
+
+# Optional: brotli siblings are only written when the module is installed
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+class Command(BaseCommand):
+    help = "Write precompressed .gz (and .br if brotli is installed) siblings for every structure file under MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Recompress even if an up-to-date sibling exists')
+        parser.add_argument('--no-brotli', action='store_true', help='Skip .br siblings')
+        parser.add_argument('--min-ratio', type=float, default=0.9,
+                            help='Only keep a sibling if it is at most this fraction of the original size')
+
+    def handle(self, *args, **options):
+        use_brotli = BROTLI_AVAILABLE and not options['no_brotli']
+        if not BROTLI_AVAILABLE and not options['no_brotli']:
+            self.stdout.write(self.style.WARNING("⚠️ brotli not installed; writing .gz siblings only."))
+
+        written = skipped = dropped = 0
+        for kind, (folder, ext) in MEDIA_DIRS.items():
+            if kind == "arrays":
+                continue  # .npz files are already compressed
+            directory = os.path.join(settings.MEDIA_ROOT, folder)
+            if not os.path.isdir(directory):
+                continue
+
+            self.stdout.write(self.style.NOTICE(f"📂 {directory}"))
+            for entry in os.scandir(directory):
+                if not entry.is_file() or not entry.name.endswith(ext):
+                    continue
+
+                src_stat = entry.stat()
+                with open(entry.path, "rb") as f:
+                    data = None
+                    for suffix, encoding in PRECOMPRESSED_SUFFIXES.items():
+                        if encoding == "br" and not use_brotli:
+                            continue
+                        target = entry.path + suffix
+                        if not options['force'] and os.path.exists(target) \
+                                and os.path.getmtime(target) >= src_stat.st_mtime:
+                            skipped += 1
+                            continue
+
+                        if data is None:
+                            data = f.read()
+                        if encoding == "br":
+                            compressed = brotli.compress(data, quality=11)
+                        else:
+                            compressed = gzip.compress(data, compresslevel=9, mtime=int(src_stat.st_mtime))
+
+                        # Not worth serving (e.g. PNGs): remove any stale sibling instead
+                        if len(compressed) > len(data) * options['min_ratio']:
+                            if os.path.exists(target):
+                                os.remove(target)
+                            dropped += 1
+                            continue
+
+                        tmp = f"{target}.tmp-{os.getpid()}"
+                        with open(tmp, "wb") as out:
+                            out.write(compressed)
+                        shutil.copystat(entry.path, tmp)
+                        os.replace(tmp, target)
+                        written += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {written} compressed files ({skipped} up to date, {dropped} not worth compressing)."
+        ))
+
+
+#python manage.py compress_structures
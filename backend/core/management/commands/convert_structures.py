@@ -0,0 +1,57 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.media_manifest import MEDIA_DIRS
+from core.services.structure_arrays import array_paths, convert_pdb
+
+
+class Command(BaseCommand):
+    help = "Convert pdb_files/<id>.pdb into compact .npz coordinate arrays (full + CA-only) under pdb_arrays/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Reconvert even if the arrays are up to date')
+
+    def handle(self, *args, **options):
+        converted = skipped = failed = 0
+        primary_ids = set()   # IDs with a pdb_files/ structure; their legacy copies are not served
+
+        for kind in ("pdb", "pdb_legacy"):
+            folder, ext = MEDIA_DIRS[kind]
+            directory = os.path.join(settings.MEDIA_ROOT, folder)
+            if not os.path.isdir(directory):
+                continue
+
+            self.stdout.write(self.style.NOTICE(f"📂 {directory}"))
+            for entry in os.scandir(directory):
+                if not entry.is_file() or not entry.name.endswith(ext):
+                    continue
+                evolf_id = entry.name[: -len(ext)]
+                if kind == "pdb":
+                    primary_ids.add(evolf_id)
+                elif evolf_id in primary_ids:
+                    # same precedence as MediaManifest.get: the pdb_files/ structure wins
+                    continue
+
+                targets = array_paths(settings.MEDIA_ROOT, evolf_id)
+                src_mtime = entry.stat().st_mtime
+                if not options['force'] and all(
+                    os.path.exists(p) and os.path.getmtime(p) >= src_mtime for p in targets.values()
+                ):
+                    skipped += 1
+                    continue
+
+                try:
+                    convert_pdb(entry.path, settings.MEDIA_ROOT, evolf_id)
+                    converted += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"⚠ {entry.name}: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Converted {converted} structures ({skipped} up to date, {failed} failed)."
+        ))
+
+
+#python manage.py convert_structures
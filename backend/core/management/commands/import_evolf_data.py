@@ -1,6 +1,11 @@
+import os
+import shutil
+
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from core.models import EvOlf  
+from core.services.dataset_store import get_dataset_csv_path
 
 class Command(BaseCommand):
     help = "Import Receptor data from a CSV file into PostgreSQL via Django ORM"
@@ -70,4 +75,25 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f"✅ Successfully imported {len(objects)} new records into PostgreSQL!")
         )
+
+        # -------------------------------------------------
+        # 3️⃣ REBUILD EXPORT SHARDS
+        # -------------------------------------------------
+        call_command("build_export_shards", stdout=self.stdout, stderr=self.stderr)
+
+        # -------------------------------------------------
+        # 4️⃣ PUBLISH THE CSV (detail lookups + curated index read it)
+        # -------------------------------------------------
+        dataset_path = get_dataset_csv_path()
+        if not (os.path.exists(dataset_path) and os.path.samefile(csv_path, dataset_path)):
+            os.makedirs(os.path.dirname(dataset_path), exist_ok=True)
+            tmp = f"{dataset_path}.tmp-{os.getpid()}"
+            shutil.copyfile(csv_path, tmp)
+            os.replace(tmp, dataset_path)
+            self.stdout.write(self.style.SUCCESS(f"✔️ Published {csv_path} as {dataset_path}."))
+
+        # -------------------------------------------------
+        # 5️⃣ REBUILD CURATED PAIR INDEX
+        # -------------------------------------------------
+        call_command("build_curated_index", stdout=self.stdout, stderr=self.stderr)
 #python manage.py import_evolf_data core/management/evolf_data.csv
\ No newline at end of file
@@ -0,0 +1,152 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from core.management.commands.run_benchmarks import _percentile
+
+STAGES = ("submit", "complete", "download", "total")
+
+
+def _smiles(i: int, unique: bool) -> str:
+    """A valid, distinct SMILES per job (alkyl chain + amine tail), so the result cache is not hit."""
+    if not unique:
+        return "CCO"
+    return "C" * (i % 200 + 1) + "O" + "N" * (i // 200)
+
+
+class Command(BaseCommand):
+    help = "Drive submit -> poll -> download against a running backend and report per-stage throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api', help='Backend API root')
+        parser.add_argument('--jobs', type=int, default=100, help='Prediction jobs to run')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent clients')
+        parser.add_argument('--sequence', default='MKTIIALSYIFCLVFA', help='Receptor sequence sent with every job')
+        parser.add_argument('--same-smiles', action='store_true',
+                            help='Send the same SMILES for every job (measures result-cache hits/coalescing)')
+        parser.add_argument('--wait', type=float, default=20.0, help='Long-poll ?wait= seconds per status request')
+        parser.add_argument('--poll-interval', type=float, default=0.0,
+                            help='Sleep between status polls (use with --wait 0 for plain polling)')
+        parser.add_argument('--timeout', type=float, default=300.0, help='Give up on a job after this many seconds')
+        parser.add_argument('--download', choices=['zip', 'csv', 'none'], default='zip',
+                            help='zip = predict/download/<id>/, csv = predict/job/<id>/results')
+        parser.add_argument('--api-key', default='', help='X-API-Key header (scheduler fairness key)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.base = options['base_url'].rstrip('/')
+        self.local = threading.local()
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+        self.stdout.write(self.style.NOTICE(
+            f"🚦 {options['jobs']} jobs against {self.base}, {options['concurrency']} concurrent clients..."
+        ))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(self.run_job, range(options['jobs'])))
+        self.report(time.perf_counter() - start)
+
+    # ------------------------------------------------------------------
+    # One job
+    # ------------------------------------------------------------------
+
+    def _session(self) -> requests.Session:
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            if self.options['api_key']:
+                session.headers["X-API-Key"] = self.options['api_key']
+        return session
+
+    def _record(self, stage, seconds=None, error=None):
+        with self.lock:
+            if error is None:
+                self.samples[stage].append(seconds)
+            else:
+                key = f"{stage}: {error}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def run_job(self, i: int):
+        session = self._session()
+        started = time.perf_counter()
+
+        # --- submit
+        try:
+            resp = session.post(f"{self.base}/predict/smiles/", json={
+                "smiles": _smiles(i, not self.options['same_smiles']),
+                "sequence": self.options['sequence'],
+                "id": str(i),
+            }, timeout=60)
+        except requests.RequestException as e:
+            return self._record("submit", error=e.__class__.__name__)
+        if resp.status_code != 200:
+            return self._record("submit", error=f"HTTP {resp.status_code}")
+        job_id = resp.json().get("job_id")
+        if not job_id:
+            return self._record("submit", error="no job_id (curated pair?)")
+        submitted = time.perf_counter()
+        self._record("submit", submitted - started)
+
+        # --- poll until finished / failed
+        deadline = submitted + self.options['timeout']
+        while True:
+            try:
+                resp = session.get(f"{self.base}/predict/job/{job_id}/",
+                                   params={"wait": self.options['wait'], "limit": 1},
+                                   timeout=self.options['wait'] + 30)
+                state = resp.json().get("status") if resp.status_code == 200 else f"HTTP {resp.status_code}"
+            except (requests.RequestException, ValueError) as e:
+                state = e.__class__.__name__
+            if state == "finished":
+                break
+            if state not in ("processing",) or time.perf_counter() > deadline:
+                return self._record("complete", error="timeout" if state == "processing" else state)
+            if self.options['poll_interval']:
+                time.sleep(self.options['poll_interval'])
+        completed = time.perf_counter()
+        self._record("complete", completed - submitted)
+
+        # --- download
+        if self.options['download'] != 'none':
+            url = (f"{self.base}/predict/download/{job_id}/" if self.options['download'] == 'zip'
+                   else f"{self.base}/predict/job/{job_id}/results")
+            try:
+                resp = session.get(url, timeout=120)
+                size = len(resp.content)
+            except requests.RequestException as e:
+                return self._record("download", error=e.__class__.__name__)
+            if resp.status_code != 200 or not size:
+                return self._record("download", error=f"HTTP {resp.status_code}")
+            self._record("download", time.perf_counter() - completed)
+        self._record("total", time.perf_counter() - started)
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def report(self, wall: float):
+        self.stdout.write(f"{'stage':<10} {'ok':>6} {'req/s':>8} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+        for stage in STAGES:
+            samples = self.samples[stage]
+            if not samples:
+                self.stdout.write(f"{stage:<10} {0:>6}")
+                continue
+            self.stdout.write(
+                f"{stage:<10} {len(samples):>6} {len(samples) / wall:>8.1f}"
+                f" {_percentile(samples, 50) * 1000:>10.1f} {_percentile(samples, 90) * 1000:>10.1f}"
+                f" {_percentile(samples, 99) * 1000:>10.1f} {max(samples) * 1000:>10.1f}"
+            )
+        self.stdout.write(f"wall time {wall:.1f} s, {len(self.samples['total']) / wall:.2f} completed jobs/s")
+        for error, count in sorted(self.errors.items()):
+            self.stdout.write(self.style.ERROR(f"❌ {count} x {error}"))
+        if not self.errors:
+            self.stdout.write(self.style.SUCCESS("✅ No errors."))
+
+
+#python manage.py loadtest_prediction --jobs 200 --concurrency 20 --download csv
+#(with `manage.py mock_pipeline` behind PREDICT_DOCKER_URL)
@@ -0,0 +1,209 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.job_paths import is_valid_job_id
+from core.services.result_cache import OUTPUT_FILENAME
+from core.services.screening_jobs import JOB_FORMAT as SCREEN_JOB_FORMAT, iter_screen_rows
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict:
+    """{field name: bytes} of a multipart/form-data body."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    fields = {}
+    if message.is_multipart():
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name:
+                fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+def _fake_prediction(*values) -> tuple:
+    """Deterministic (label, P1) for a ligand/receptor pair."""
+    digest = hashlib.sha256("\n".join(values).encode("utf-8")).digest()
+    p1 = int.from_bytes(digest[:4], "big") / 2 ** 32
+    return ("1" if p1 >= 0.5 else "0"), f"{p1:.4f}"
+
+
+def _prediction_csv(input_csv: bytes, fields: dict, job_dir: str) -> tuple:
+    """(Prediction_Output.csv bytes, row count) for the uploaded job CSV (a pair table for screening jobs)."""
+    def col(name, default):
+        return fields.get(name, b"").decode("utf-8") or default
+
+    id_col, lig_col, rec_col = col("lr_id_col", "ID"), col("lig_smiles_col", "SMILES"), col("rec_seq_col", "")
+    input_rows = csv.DictReader(io.StringIO(input_csv.decode("utf-8-sig")))
+    if col("job_format", "") == SCREEN_JOB_FORMAT:
+        # sets are read from the job directory, pairs expanded one at a time
+        input_rows = iter_screen_rows(job_dir, input_rows)
+        id_col, lig_col, rec_col = "ID", "SMILES", "Mutated_Sequence"
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["ID", "Predicted Label", "P1"])
+    rows = 0
+    for row in input_rows:
+        label, p1 = _fake_prediction(row.get(lig_col) or "", (row.get(rec_col) or "") if rec_col else "")
+        writer.writerow([row.get(id_col) or "", label, p1])
+        rows += 1
+    return out.getvalue().encode("utf-8"), rows
+
+
+class Command(BaseCommand):
+    help = ("Local stand-in for the prediction pipeline behind PREDICT_DOCKER_URL: accepts the job "
+            "multipart form and, after a configurable latency/failure profile, writes "
+            "Prediction_Output.csv into the job's output/")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8500)
+        parser.add_argument('--job-root', default=None, help='Override JOB_DATA_DIR')
+        parser.add_argument('--accept-ms', type=float, default=50.0, help='Latency of the submission response')
+        parser.add_argument('--processing-ms', type=float, default=2000.0, help='Time until the output is written')
+        parser.add_argument('--per-row-ms', type=float, default=0.0, help='Extra processing time per input row')
+        parser.add_argument('--jitter', type=float, default=0.2,
+                            help='Relative +/- jitter applied to every delay (0.2 = +/-20%%)')
+        parser.add_argument('--reject-rate', type=float, default=0.0,
+                            help='Fraction of submissions answered with 503 (exercises submission retries)')
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help='Fraction of accepted jobs that fail without output')
+        parser.add_argument('--callback-url', default='',
+                            help='Completion webhook, e.g. http://127.0.0.1:8000/api/predict/job/{job_id}/complete '
+                                 '(sent with PIPELINE_CALLBACK_TOKEN)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for jitter and failures')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.job_root = options['job_root'] or getattr(settings, "JOB_DATA_DIR", "/data")
+        self.rng = random.Random(options['seed'])
+        self.rng_lock = threading.Lock()
+        self.stats = {"accepted": 0, "rejected": 0, "finished": 0, "failed": 0}
+
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                command.handle_submission(self)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        server.daemon_threads = True
+        self.stdout.write(self.style.SUCCESS(
+            f"🧪 Mock pipeline on http://{options['host']}:{options['port']}/ writing to {self.job_root} "
+            f"(Ctrl+C to stop)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+            self.stdout.write(self.style.WARNING(f"🛑 Mock pipeline stopped: {json.dumps(self.stats)}"))
+
+    # ------------------------------------------------------------------
+    # Profile
+    # ------------------------------------------------------------------
+
+    def _random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def _delay(self, ms: float) -> float:
+        jitter = self.options['jitter']
+        return max(0.0, ms / 1000 * (1 + jitter * (2 * self._random() - 1)))
+
+    def _count(self, key):
+        with self.rng_lock:
+            self.stats[key] += 1
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def _reply(self, handler, code: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        handler.send_response(code)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def handle_submission(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length)
+        fields = _parse_multipart(handler.headers.get("Content-Type", ""), body)
+
+        job_id = fields.get("job_id", b"").decode("utf-8")
+        subdir = fields.get("job_subdir", b"").decode("utf-8") or job_id
+        job_dir = os.path.normpath(os.path.join(self.job_root, subdir))
+        if not is_valid_job_id(job_id) or os.path.basename(job_dir) != job_id \
+                or not job_dir.startswith(os.path.normpath(self.job_root) + os.sep):
+            return self._reply(handler, 400, {"error": "invalid job_id / job_subdir"})
+        if "input_file" not in fields:
+            return self._reply(handler, 400, {"error": "input_file is required"})
+
+        time.sleep(self._delay(self.options['accept_ms']))
+        if self._random() < self.options['reject_rate']:
+            self._count("rejected")
+            return self._reply(handler, 503, {"error": "mock pipeline busy"})
+
+        self._count("accepted")
+        threading.Thread(
+            target=self._process, args=(job_id, job_dir, fields), name=f"mock-{job_id}", daemon=True,
+        ).start()
+        self._reply(handler, 200, {"job_id": job_id, "status": "accepted"})
+
+    def _process(self, job_id: str, job_dir: str, fields: dict):
+        try:
+            output, rows = _prediction_csv(fields["input_file"], fields, job_dir)
+        except (UnicodeDecodeError, csv.Error, OSError) as e:
+            output, rows = None, 0
+            error = f"Unreadable input CSV: {e}"
+        else:
+            error = "Mock pipeline failure" if self._random() < self.options['fail_rate'] else None
+        time.sleep(self._delay(self.options['processing_ms'] + rows * self.options['per_row_ms']))
+
+        if error is None:
+            # written beside output/ first, so pollers never see a partial file
+            output_dir = os.path.join(job_dir, "output")
+            os.makedirs(output_dir, exist_ok=True)
+            tmp = os.path.join(job_dir, f".{OUTPUT_FILENAME}.tmp")
+            with open(tmp, "wb") as fh:
+                fh.write(output)
+            os.replace(tmp, os.path.join(output_dir, OUTPUT_FILENAME))
+            self._count("finished")
+        else:
+            self._count("failed")
+        self._callback(job_id, error)
+
+    def _callback(self, job_id: str, error):
+        url = self.options['callback_url']
+        if not url:
+            return
+        body = {"status": "failed", "error": error} if error else {"status": "finished"}
+        request = urllib.request.Request(
+            url.format(job_id=job_id), data=json.dumps(body).encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/json",
+                     "X-Pipeline-Token": getattr(settings, "PIPELINE_CALLBACK_TOKEN", "")},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except OSError as e:
+            self.stdout.write(self.style.ERROR(f"❌ Callback for {job_id} failed: {e}"))
+
+
+#python manage.py mock_pipeline --port 8500 --processing-ms 2000 --reject-rate 0.05
+#(then PREDICT_DOCKER_URL=http://127.0.0.1:8500/predict)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.services.result_cache import evict, get_cache_dir
+
+
+class Command(BaseCommand):
+    help = "Evict prediction results from the result cache by age and total size"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=float, default=None, help='Override RESULT_CACHE_MAX_AGE_DAYS')
+        parser.add_argument('--max-mb', type=float, default=None, help='Override RESULT_CACHE_MAX_BYTES (in MiB)')
+
+    def handle(self, *args, **options):
+        max_age = options['max_age_days'] * 86400 if options['max_age_days'] is not None else None
+        max_bytes = int(options['max_mb'] * 1024 * 1024) if options['max_mb'] is not None else None
+
+        self.stdout.write(self.style.NOTICE(f"🧹 Pruning result cache in {get_cache_dir()}..."))
+        stats = evict(max_age=max_age, max_bytes=max_bytes)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Removed {stats['removed']} entries ({stats['freedBytes'] / 1024:.0f} KiB); "
+            f"{stats['remaining']} entries, {stats['totalBytes'] / 1024:.0f} KiB remain."
+        ))
+
+
+#python manage.py prune_result_cache --max-age-days 30
@@ -0,0 +1,304 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from core.services.dataset_store import get_dataset_store
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = "Micro/throughput benchmarks for dataset and prediction code paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(self.suites()), help='Benchmark to run')
+        parser.add_argument('--ids', type=int, default=1000, help='Number of EvOlf IDs to use')
+        parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per latency measurement')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients for latency suites')
+        parser.add_argument('--fs-latency-ms', type=float, default=5.0,
+                            help='Artificial delay added to fsync/rename/mkdir in latency suites')
+        parser.add_argument('--wait-ms', type=float, default=1000.0,
+                            help='Long-poll wait held by each request in the async-capacity suite')
+
+    @classmethod
+    def suites(cls):
+        return {
+            "async-capacity": cls.bench_async_capacity,
+            "batch-details": cls.bench_batch_details,
+            "format-detail": cls.bench_format_detail,
+            "structure-parse": cls.bench_structure_parse,
+            "submit-latency": cls.bench_submit_latency,
+        }
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.suites()[options['suite']](self)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _sample_ids(self):
+        ids = get_dataset_store().ids()[: self.options['ids']]
+        if not ids:
+            raise CommandError("Dataset store is empty; check evolf_data.csv")
+        return ids
+
+    def _report(self, label, seconds, count):
+        rate = count / seconds if seconds else float("inf")
+        self.stdout.write(f"{label:<40} {seconds * 1000:10.1f} ms  {rate:12.0f} ids/s")
+
+    def _report_latencies(self, label, samples, wall):
+        self.stdout.write(
+            f"{label:<40} p50 {_percentile(samples, 50) * 1000:8.1f} ms  p99 {_percentile(samples, 99) * 1000:8.1f} ms"
+            f"  max {max(samples) * 1000:8.1f} ms  {len(samples) / wall:8.0f} req/s"
+        )
+
+    def _run_concurrent(self, fn):
+        """Call fn(i) for --requests i on --concurrency threads; returns (per-call latencies, wall seconds)."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def timed_call(i):
+            return _timed(fn, i)[1]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            samples = list(pool.map(timed_call, range(self.options['requests'])))
+        return samples, time.perf_counter() - start
+
+    # ------------------------------------------------------------------
+    # Suites
+    # ------------------------------------------------------------------
+
+    def bench_batch_details(self):
+        """N single GET detail/export calls vs one batch POST for the same IDs."""
+        from core.views.dataset_views import (
+            FetchDatasetDetails, DownloadByEvolfId, BatchDatasetDetails, DownloadBundleByEvolfIds,
+        )
+
+        ids = self._sample_ids()
+        factory = APIRequestFactory()
+        detail_view = FetchDatasetDetails.as_view(throttle_classes=[])
+        export_view = DownloadByEvolfId.as_view(throttle_classes=[])
+        batch_view = BatchDatasetDetails.as_view(throttle_classes=[])
+        bundle_view = DownloadBundleByEvolfIds.as_view(throttle_classes=[])
+
+        def single_details():
+            for eid in ids:
+                detail_view(factory.get(f"/api/dataset/details/{eid}/"), evolfId=eid).render()
+
+        def single_exports():
+            for eid in ids:
+                resp = export_view(factory.get(f"/api/dataset/export/{eid}/"), evolfId=eid)
+                b"".join(resp.streaming_content)
+
+        def batch_details():
+            batch_view(factory.post("/api/dataset/details", {"evolfIds": ids}, format="json")).render()
+
+        def batch_bundle():
+            resp = bundle_view(factory.post("/api/dataset/export/bundle", {"evolfIds": ids}, format="json"))
+            b"".join(resp.streaming_content)
+
+        self.stdout.write(f"batch-details: {len(ids)} IDs, best of {self.options['repeat']}")
+        for label, fn in (
+            ("GET details/<id> x N", single_details),
+            ("POST details (batch)", batch_details),
+            ("GET export/<id> x N", single_exports),
+            ("POST export/bundle (batch)", batch_bundle),
+        ):
+            best = min(_timed(fn)[1] for _ in range(self.options['repeat']))
+            self._report(label, best, len(ids))
+
+    def bench_format_detail(self):
+        """Per-call key normalisation (old gf()) vs the compiled field map, at growing batch sizes."""
+        from core.views.structure_views import DETAIL_FIELD_SOURCES, compile_field_map, resolve_detail_fields
+
+        ids = self._sample_ids()
+        store = get_dataset_store()
+        rows = [store.get(eid) for eid in ids]
+
+        def legacy_resolve(entry):
+            # the pre-compiled-map behaviour: re-normalise the whole entry for every field
+            def gf(*keys):
+                norm_entry = {k.strip().lower().replace(",", "").replace(" ", ""): v for k, v in entry.items()}
+                for k in keys:
+                    v = norm_entry.get(k.strip().lower().replace(",", "").replace(" ", ""))
+                    if v in [None, "", "nan"]:
+                        continue
+                    return str(v).strip()
+                return ""
+            return {field: gf(*sources) for field, sources in DETAIL_FIELD_SOURCES.items()}
+
+        field_map = compile_field_map(tuple(store.columns))
+
+        self.stdout.write(f"format-detail: field resolution, best of {self.options['repeat']}")
+        for size in sorted({max(1, len(rows) // 10), len(rows)}):
+            batch = rows[:size]
+            for label, fn in (
+                (f"legacy gf() x {size}", lambda: [legacy_resolve(r) for r in batch]),
+                (f"compiled map x {size}", lambda: [resolve_detail_fields(r, field_map) for r in batch]),
+            ):
+                best = min(_timed(fn)[1] for _ in range(self.options['repeat']))
+                self._report(label, best, size)
+
+    def bench_structure_parse(self):
+        """Raw PDB text parse vs loading the pre-converted .npz arrays, plus payload sizes."""
+        import gzip
+
+        from core.services.media_manifest import get_media_manifest
+        from core.services.structure_arrays import load_arrays, parse_pdb
+
+        manifest = get_media_manifest()
+        pairs = []
+        for eid in self._sample_ids():
+            pdb = manifest.get(eid, "pdb")
+            full = manifest.get(eid, "arrays")
+            ca = manifest.get(f"{eid}.ca", "arrays")
+            if pdb and full and ca:
+                pairs.append((pdb, full, ca))
+        if not pairs:
+            raise CommandError("No converted structures found; run `manage.py convert_structures` first")
+
+        texts = []
+        for pdb, _, _ in pairs:
+            with open(pdb.path, "r", encoding="utf-8", errors="ignore") as f:
+                texts.append(f.read())
+
+        raw_bytes = sum(len(t.encode("utf-8")) for t in texts)
+        gz_bytes = sum(len(gzip.compress(t.encode("utf-8"), 6)) for t in texts)
+        self.stdout.write(f"structure-parse: {len(pairs)} structures, best of {self.options['repeat']}")
+        self.stdout.write(f"{'payload: raw PDB':<40} {raw_bytes / 1024:10.0f} KiB")
+        self.stdout.write(f"{'payload: gzip PDB':<40} {gz_bytes / 1024:10.0f} KiB")
+        self.stdout.write(f"{'payload: npz (full)':<40} {sum(f.size for _, f, _ in pairs) / 1024:10.0f} KiB")
+        self.stdout.write(f"{'payload: npz (CA only)':<40} {sum(c.size for _, _, c in pairs) / 1024:10.0f} KiB")
+
+        for label, fn in (
+            ("parse raw PDB text", lambda: [parse_pdb(t) for t in texts]),
+            ("load npz (full)", lambda: [load_arrays(f.path) for _, f, _ in pairs]),
+            ("load npz (CA only)", lambda: [load_arrays(c.path) for _, _, c in pairs]),
+        ):
+            best = min(_timed(fn)[1] for _ in range(self.options['repeat']))
+            self._report(label, best, len(pairs))
+
+    def bench_submit_latency(self):
+        """Request-path job-input write under a slow filesystem: old poll+fsync writer vs atomic writer."""
+        import os
+        import tempfile
+        from unittest import mock
+
+        from django.conf import settings
+
+        from core.services.job_inputs import ensure_durable, get_job_dir, write_job_input
+
+        csv_bytes = b"ID,Temp_Ligand_ID,SMILES,Mutated_Sequence,TempRecID\n1,lig_1,CCO,,TRec1\n"
+        delay = self.options['fs_latency_ms'] / 1000
+
+        def slow(fn):
+            def wrapper(*args, **kwargs):
+                time.sleep(delay)
+                return fn(*args, **kwargs)
+            return wrapper
+
+        def legacy_write(job_id):
+            # the pre-change request path: isdir polling, fsync, size polling
+            job_dir = get_job_dir(job_id)
+            os.makedirs(job_dir, exist_ok=True)
+            for _ in range(50):
+                if os.path.isdir(job_dir):
+                    break
+                time.sleep(0.01)
+            csv_path = os.path.join(job_dir, f"{job_id}.csv")
+            with open(csv_path, "wb") as fh:
+                fh.write(csv_bytes)
+                fh.flush()
+                os.fsync(fh.fileno())
+            for _ in range(50):
+                if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+                    break
+                time.sleep(0.01)
+            return csv_path
+
+        self.stdout.write(
+            f"submit-latency: {self.options['requests']} requests, {self.options['concurrency']} concurrent, "
+            f"+{self.options['fs_latency_ms']:.1f} ms per fsync/rename/mkdir"
+        )
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(settings, "JOB_DATA_DIR", root), \
+                mock.patch("os.fsync", slow(os.fsync)), \
+                mock.patch("os.replace", slow(os.replace)), \
+                mock.patch("os.makedirs", slow(os.makedirs)):
+            for label, fn in (
+                ("legacy writer (request path)", lambda i: legacy_write(f"legacy-{i}")),
+                ("atomic writer (request path)", lambda i: write_job_input(f"atomic-{i}", csv_bytes)),
+                ("ensure_durable (background stage)", lambda i: ensure_durable(
+                    os.path.join(get_job_dir(f"atomic-{i}"), f"atomic-{i}.csv"))),
+            ):
+                samples, wall = self._run_concurrent(fn)
+                self._report_latencies(label, samples, wall)
+
+    def bench_async_capacity(self):
+        """
+        Concurrent long-poll job-status requests per worker: the sync APIView on
+        --concurrency threads (one gthread WSGI worker) vs the async view on one
+        event loop (one ASGI worker). Each request holds for --wait-ms.
+        """
+        import asyncio
+        import os
+        import tempfile
+        from unittest import mock
+
+        from django.conf import settings
+        from django.test import AsyncRequestFactory
+
+        from core.services.submission_executor import write_submission_state
+        from core.views import job_status_views
+        from core.views.async_views import AsyncJobStatusView
+
+        wait = self.options['wait_ms'] / 1000
+        count = self.options['requests']
+        sync_view = job_status_views.JobStatusAPIView.as_view(throttle_classes=[])
+        async_view = AsyncJobStatusView.as_view(throttle_classes=[])
+        factory, async_factory = APIRequestFactory(), AsyncRequestFactory()
+
+        async def run_async(job_ids):
+            async def timed_call(job_id):
+                start = time.perf_counter()
+                await async_view(async_factory.get(f"/api/predict/job/{job_id}/?wait={wait}"), job_id=job_id)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            samples = await asyncio.gather(*(timed_call(job_id) for job_id in job_ids))
+            return list(samples), time.perf_counter() - start
+
+        self.stdout.write(
+            f"async-capacity: {count} concurrent long-polls of {wait * 1000:.0f} ms, "
+            f"sync worker with {self.options['concurrency']} threads"
+        )
+        with tempfile.TemporaryDirectory() as root, \
+                mock.patch.object(settings, "JOB_DATA_DIR", root), \
+                mock.patch.object(job_status_views, "ENABLE_SCHEDULER", False):
+            job_ids = [f"bench-{i}" for i in range(count)]
+            for job_id in job_ids:
+                os.makedirs(os.path.join(root, job_id))
+                write_submission_state(os.path.join(root, job_id), state="submitted", jobId=job_id)
+
+            samples, wall = self._run_concurrent(lambda i: sync_view(
+                factory.get(f"/api/predict/job/{job_ids[i]}/", {"wait": wait}), job_id=job_ids[i]).render())
+            self._report_latencies("sync APIView (WSGI worker)", samples, wall)
+
+            samples, wall = asyncio.run(run_async(job_ids))
+            self._report_latencies("async view (ASGI worker)", samples, wall)
+
+
+#python manage.py run_benchmarks batch-details --ids 1000
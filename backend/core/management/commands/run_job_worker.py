@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.services.job_scheduler import get_job_worker, recover_expired_leases
+
+
+class Command(BaseCommand):
+    help = "Run a job-queue worker in the foreground (claims jobs from core_scheduledjob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recover-only', action='store_true',
+                            help='Re-queue jobs with expired leases and exit')
+
+    def handle(self, *args, **options):
+        recovered = recover_expired_leases()
+        self.stdout.write(self.style.NOTICE(f"♻️  Recovered {recovered} job(s) with expired leases."))
+        if options['recover_only']:
+            return
+
+        worker = get_job_worker()
+        self.stdout.write(self.style.SUCCESS(f"🚀 Job worker {worker.owner} running (Ctrl+C to stop)..."))
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
+            self.stdout.write(self.style.WARNING("🛑 Job worker stopped."))
+
+
+#python manage.py run_job_worker
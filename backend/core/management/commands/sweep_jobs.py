@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.job_paths import get_job_root
+from core.services.job_retention import sweep
+
+
+class Command(BaseCommand):
+    help = "Apply job-directory retention (age and total size) to JOB_DATA_DIR, archiving finished jobs first"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=float, default=None, help='Override JOB_RETENTION_MAX_AGE_DAYS')
+        parser.add_argument('--max-gb', type=float, default=None, help='Override JOB_RETENTION_MAX_BYTES (in GiB)')
+        parser.add_argument('--min-age-hours', type=float, default=None, help='Override JOB_RETENTION_MIN_AGE_HOURS')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be removed without removing it')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        max_bytes = int(options['max_gb'] * 1024 ** 3) if options['max_gb'] is not None else None
+        while True:
+            self.stdout.write(self.style.NOTICE(f"🧹 Sweeping job directories in {get_job_root()}..."))
+            stats = sweep(
+                max_age_days=options['max_age_days'], max_bytes=max_bytes,
+                min_age_hours=options['min_age_hours'], dry_run=options['dry_run'],
+            )
+            verb = "Would remove" if options['dry_run'] else "Removed"
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {verb} {stats['removed']} of {stats['scanned']} job(s) ({stats['expired']} past max age), "
+                f"{stats['freedBytes'] / 1024 ** 2:.1f} MiB; {stats['totalBytes'] / 1024 ** 2:.1f} MiB remain."
+            ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+
+#python manage.py sweep_jobs --dry-run
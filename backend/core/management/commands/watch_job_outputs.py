@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import PredictionJob
+from core.services.job_paths import resolve_job_dir
+from core.services.prediction_results import output_complete, record_completion
+
+
+class Command(BaseCommand):
+    help = "Record finished prediction jobs from JOB_DATA_DIR (stand-in for the pipeline completion webhook)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between scans')
+        parser.add_argument('--once', action='store_true', help='Scan once and exit')
+
+    def handle(self, *args, **options):
+        job_root = getattr(settings, "JOB_DATA_DIR", "/data")
+        self.stdout.write(self.style.NOTICE(f"👀 Watching {job_root} for finished jobs..."))
+        while True:
+            recorded = 0
+            pending = PredictionJob.objects.filter(status=PredictionJob.STATUS_PROCESSING).values_list("job_id", flat=True)
+            for job_id in pending:
+                job_dir = resolve_job_dir(job_id)
+                if job_dir is None:
+                    continue
+                try:
+                    if output_complete(job_dir, job_id):
+                        record_completion(job_id, job_dir)
+                        recorded += 1
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"❌ {job_id}: {e}"))
+            if recorded:
+                self.stdout.write(self.style.SUCCESS(f"✅ Recorded {recorded} finished job(s)."))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+
+#python manage.py watch_job_outputs --interval 2
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_rename_comment_evolf_comments_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=100, unique=True)),
+                ('handler', models.CharField(max_length=100)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('slot', models.PositiveIntegerField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=1)),
+                ('lease_owner', models.CharField(blank=True, max_length=100, null=True)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'available_at'], name='core_sched_state_avail_idx'), models.Index(fields=['state', 'lease_expires_at'], name='core_sched_state_lease_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('state', 'running')), fields=('slot',), name='core_sched_unique_running_slot')],
+            },
+        ),
+    ]
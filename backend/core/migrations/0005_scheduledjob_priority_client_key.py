@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_scheduledjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledjob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Interactive'), (10, 'Bulk')], default=0),
+        ),
+        migrations.AddField(
+            model_name='scheduledjob',
+            name='client_key',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledjob',
+            index=models.Index(fields=['state', 'priority', 'available_at'], name='core_sched_state_prio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledjob',
+            index=models.Index(fields=['client_key', 'started_at'], name='core_sched_client_start_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_scheduledjob_priority_client_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('processing', 'Processing'), ('finished', 'Finished'), ('failed', 'Failed')], default='processing', max_length=20)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('output_files', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PredictionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('row_id', models.CharField(max_length=200)),
+                ('temp_ligand_id', models.CharField(blank=True, default='', max_length=200)),
+                ('smiles', models.TextField(blank=True, default='')),
+                ('mutated_sequence', models.TextField(blank=True, default='')),
+                ('temp_rec_id', models.CharField(blank=True, default='', max_length=200)),
+                ('predicted_label', models.CharField(blank=True, default='', max_length=50)),
+                ('p1', models.CharField(blank=True, default='', max_length=50)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='core.predictionjob')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('job', 'position'), name='core_predresult_job_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_predictionjob_predictionresult'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='predictionresult',
+            index=models.Index(fields=['job', 'predicted_label', 'position'], name='core_predresult_label_idx'),
+        ),
+    ]
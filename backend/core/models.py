@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class EvOlf(models.Model):
@@ -37,3 +38,114 @@ class EvOlf(models.Model):
 
     def __str__(self):
         return self.EvOlf_ID or str(self.id)
+
+
+class ScheduledJob(models.Model):
+    """Durable job-queue row (see core.services.job_scheduler)."""
+
+    STATE_QUEUED = "queued"
+    STATE_RUNNING = "running"
+    STATE_DONE = "done"
+    STATE_FAILED = "failed"
+    STATE_CHOICES = [
+        (STATE_QUEUED, "Queued"),
+        (STATE_RUNNING, "Running"),
+        (STATE_DONE, "Done"),
+        (STATE_FAILED, "Failed"),
+    ]
+
+    # lower runs first
+    PRIORITY_INTERACTIVE = 0
+    PRIORITY_BULK = 10
+    PRIORITY_CHOICES = [
+        (PRIORITY_INTERACTIVE, "Interactive"),
+        (PRIORITY_BULK, "Bulk"),
+    ]
+
+    job_id = models.CharField(max_length=100, unique=True)
+    handler = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_QUEUED)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_INTERACTIVE)
+    # fairness key: hashed API key or client IP; jobs are round-robined across keys
+    client_key = models.CharField(max_length=100, default="", blank=True)
+    # concurrency slot held while running; unique among running jobs
+    slot = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    lease_owner = models.CharField(max_length=100, null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state", "available_at"], name="core_sched_state_avail_idx"),
+            models.Index(fields=["state", "lease_expires_at"], name="core_sched_state_lease_idx"),
+            models.Index(fields=["state", "priority", "available_at"], name="core_sched_state_prio_idx"),
+            models.Index(fields=["client_key", "started_at"], name="core_sched_client_start_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["slot"],
+                condition=models.Q(state="running"),
+                name="core_sched_unique_running_slot",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} ({self.state})"
+
+
+class PredictionJob(models.Model):
+    """A prediction job's outcome, recorded once when the pipeline reports completion."""
+
+    STATUS_PROCESSING = "processing"
+    STATUS_FINISHED = "finished"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_FINISHED, "Finished"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    job_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PROCESSING)
+    row_count = models.PositiveIntegerField(default=0)
+    output_files = models.JSONField(default=list, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.job_id} ({self.status})"
+
+
+class PredictionResult(models.Model):
+    """One predicted (ligand, receptor) row of a finished PredictionJob."""
+
+    job = models.ForeignKey(PredictionJob, on_delete=models.CASCADE, related_name="results")
+    position = models.PositiveIntegerField()
+    row_id = models.CharField(max_length=200)
+    temp_ligand_id = models.CharField(max_length=200, blank=True, default="")
+    smiles = models.TextField(blank=True, default="")
+    mutated_sequence = models.TextField(blank=True, default="")
+    temp_rec_id = models.CharField(max_length=200, blank=True, default="")
+    predicted_label = models.CharField(max_length=50, blank=True, default="")   # raw pipeline label ("0"/"1")
+    p1 = models.CharField(max_length=50, blank=True, default="")
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(fields=["job", "position"], name="core_predresult_job_position"),
+        ]
+        indexes = [
+            # ?predicted_label= filtered pages
+            models.Index(fields=["job", "predicted_label", "position"], name="core_predresult_label_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}:{self.row_id}"
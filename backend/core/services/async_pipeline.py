@@ -0,0 +1,159 @@
+# core/services/async_pipeline.py
+"""
+Pipeline submission for the async (ASGI) views.
+
+The asyncio counterpart of SubmissionExecutor: one httpx.AsyncClient per
+event loop with a bounded connection pool (SUBMIT_POOL_SIZE connections)
+shared by all requests, submissions run as tasks on the loop instead of on
+worker threads, and file access goes through asyncio.to_thread. Queue
+limit, retries, backoff and the persisted submission.json states are the
+same as the threaded executor's.
+
+httpx is optional; without it (or without a running loop that outlives
+the request, i.e. under WSGI) the async views use the threaded executor.
+With ENABLE_SCHEDULER (the default) the async views hand jobs to the
+durable job queue instead, whose workers submit them; this submitter is
+the scheduler-less (ENABLE_SCHEDULER=0) path of ASGI deployments.
+"""
+
+import asyncio
+import os
+import random
+import weakref
+
+from django.conf import settings
+
+from core.services.job_inputs import ensure_durable
+from core.services.submission_executor import (
+    PermanentSubmissionError, QueueFull, write_submission_state,
+    STATE_FAILED, STATE_QUEUED, STATE_SUBMITTED, STATE_SUBMITTING,
+)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+class AsyncPipelineSubmitter:
+    def __init__(self, pipeline_url: str, pool_size: int = 4, queue_size: int = 100, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, timeout: float = 30.0, debug: bool = False):
+        self.pipeline_url = pipeline_url
+        self.pool_size = max(1, pool_size)
+        self.queue_size = max(1, queue_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.debug = debug
+
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+        )
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self._tasks = set()   # queued + running submissions (strong refs keep the tasks alive)
+
+    def _log(self, msg):
+        if self.debug:
+            print(f"[SUBMIT] {msg}")
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def submit(self, job_id: str, csv_path: str, form_data: dict):
+        """Start a submission task. Raises QueueFull when queue_size submissions are pending."""
+        if len(self._tasks) >= self.queue_size:
+            raise QueueFull(f"Submission queue is full ({self.queue_size} jobs)")
+        await asyncio.to_thread(
+            write_submission_state, os.path.dirname(csv_path), state=STATE_QUEUED, attempts=0, jobId=job_id,
+        )
+        task = asyncio.get_running_loop().create_task(self._run(job_id, csv_path, form_data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: str, csv_path: str, form_data: dict):
+        async with self._slots:
+            try:
+                await self.run_submission(job_id, csv_path, form_data)
+            except Exception as e:  # a task error would otherwise only be logged by the loop at exit
+                self._log(f"Unexpected error for job {job_id}: {e}")
+
+    async def _post(self, csv_path: str, form_data: dict):
+        content = await asyncio.to_thread(_read_bytes, csv_path)
+        files = {"input_file": (os.path.basename(csv_path), content, "text/csv")}
+        resp = await self._client.post(self.pipeline_url, data=form_data, files=files)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise httpx.HTTPStatusError(f"Pipeline responded {resp.status_code}", request=resp.request, response=resp)
+        if resp.status_code >= 400:
+            raise PermanentSubmissionError(f"Pipeline rejected job with {resp.status_code}")
+        return resp
+
+    async def run_submission(self, job_id: str, csv_path: str, form_data: dict) -> bool:
+        """Make the input durable, then submit with retries; persists state. Returns True on success."""
+        job_dir = os.path.dirname(csv_path)
+
+        async def state(**fields):
+            await asyncio.to_thread(write_submission_state, job_dir, **fields)
+
+        try:
+            await asyncio.to_thread(ensure_durable, csv_path)
+        except OSError as e:
+            await state(state=STATE_FAILED, error=f"Job input unavailable: {e}")
+            self._log(f"Job {job_id} input not readable: {e}")
+            return False
+        attempt = 0
+        while True:
+            attempt += 1
+            await state(state=STATE_SUBMITTING, attempts=attempt)
+            try:
+                self._log(f"Submitting job {job_id} -> {self.pipeline_url} (attempt {attempt})")
+                resp = await self._post(csv_path, form_data)
+                await state(state=STATE_SUBMITTED, httpStatus=resp.status_code, error=None)
+                self._log(f"Pipeline responded {resp.status_code} for job {job_id}")
+                return True
+            except PermanentSubmissionError as e:
+                await state(state=STATE_FAILED, error=str(e))
+                self._log(f"Job {job_id} failed permanently: {e}")
+                return False
+            except (httpx.HTTPError, OSError) as e:
+                if attempt > self.max_retries:
+                    await state(state=STATE_FAILED, error=str(e))
+                    self._log(f"Job {job_id} failed after {attempt} attempts: {e}")
+                    return False
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay *= random.uniform(0.5, 1.0)
+                await state(state=STATE_SUBMITTING, error=str(e), retryInSeconds=round(delay, 2))
+                self._log(f"Job {job_id} attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+_submitters = weakref.WeakKeyDictionary()   # event loop -> AsyncPipelineSubmitter
+
+
+def get_async_submitter():
+    """
+    Return the AsyncPipelineSubmitter of the running event loop, or None when
+    httpx is missing or the views are served through WSGI (no long-lived loop).
+    """
+    if not HTTPX_AVAILABLE or not getattr(settings, "ASYNC_VIEWS", False):
+        return None
+    loop = asyncio.get_running_loop()
+    submitter = _submitters.get(loop)
+    if submitter is None:
+        submitter = _submitters[loop] = AsyncPipelineSubmitter(
+            getattr(settings, "PREDICT_DOCKER_URL", ""),
+            pool_size=getattr(settings, "SUBMIT_POOL_SIZE", 4),
+            queue_size=getattr(settings, "SUBMIT_QUEUE_SIZE", 100),
+            max_retries=getattr(settings, "SUBMIT_MAX_RETRIES", 5),
+            backoff_base=getattr(settings, "SUBMIT_BACKOFF_BASE", 1.0),
+            backoff_max=getattr(settings, "SUBMIT_BACKOFF_MAX", 60.0),
+            timeout=getattr(settings, "SUBMIT_TIMEOUT", 30.0),
+            debug=getattr(settings, "DEBUG_LOG", False),
+        )
+    return submitter
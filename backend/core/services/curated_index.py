@@ -0,0 +1,214 @@
+# core/services/curated_index.py
+"""
+Index of curated (ligand, receptor) pairs in evolf_data.csv.
+
+Maps hashed (ligand key, receptor sequence) -> EvOlf IDs, so a prediction
+request for a pair that already has measured data can be answered from
+the dataset before a pipeline job is queued. Ligand keys are the
+normalised SMILES and, when RDKit is installed, the InChIKey (matched
+against the dataset's InChiKey column). Only 8-byte digests are kept in
+memory, not the SMILES/sequence strings.
+
+Building the index means an RDKit pass over the whole dataset, so it never
+happens on a request. `manage.py build_curated_index` builds it and persists
+it next to the CSV as evolf_curated_index.json, tagged with the CSV's
+(mtime, size); import_evolf_data runs it after publishing the imported CSV
+as the served evolf_data.csv, so index, store and database hold the same
+data. Web processes launched with CURATED_INDEX_WARM_ON_STARTUP load that
+file in the background at startup (CoreConfig.ready()). Lookups only
+compare the CSV's signature with the loaded index's and, when they differ,
+start a background refresh (load the persisted index, or build and persist
+it if it is missing or stale). Until it completes, lookups answer from the
+previous index (or find nothing).
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from core.services.dataset_store import get_dataset_store
+from core.services.result_cache import RDKIT_AVAILABLE, normalize_sequence, normalize_smiles
+
+if RDKIT_AVAILABLE:
+    from rdkit import Chem
+
+INDEX_FILENAME = "evolf_curated_index.json"
+INDEX_FORMAT = 1
+
+# record fields returned to clients for a curated hit
+CURATED_FIELDS = [
+    "EvOlf_ID", "Receptor", "Species", "Mutation", "Ligand", "Method",
+    "Parameter", "Value", "Unit", "Source",
+]
+
+
+def _digest(kind: str, ligand_key: str, sequence: str) -> bytes:
+    return hashlib.blake2b(f"{kind}\x1f{ligand_key}\x1f{sequence}".encode("utf-8"), digest_size=8).digest()
+
+
+def _inchikey(smiles: str) -> str:
+    if not RDKIT_AVAILABLE or not smiles:
+        return ""
+    mol = Chem.MolFromSmiles(smiles)
+    return Chem.MolToInchiKey(mol) if mol is not None else ""
+
+
+def _cell(value) -> str:
+    if value is None or value != value:   # NaN
+        return ""
+    return str(value).strip()
+
+
+class CuratedIndex:
+    def __init__(self, store, path: str):
+        self.store = store
+        self.path = path
+        self._index = {}          # digest -> tuple of EvOlf IDs
+        self._signature = None    # dataset (mtime_ns, size) the index belongs to
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def build(self, snapshot=None) -> dict:
+        """Index a dataset snapshot, by default the store's current one (RDKit pass over the dataset)."""
+        snapshot = snapshot or self.store.snapshot()
+        cols = dict(snapshot.resolve_columns(["SMILES", "Sequence", "InChiKey"]))
+        by_header = {header.lower(): col for col, header in cols.items()}
+        smiles_col = by_header.get("smiles")
+        seq_col = by_header.get("sequence")
+        inchikey_col = by_header.get("inchikey")
+
+        index = {}
+        if smiles_col and seq_col:
+            for evolf_id, row in snapshot.items():
+                sequence = normalize_sequence(_cell(row.get(seq_col)))
+                if not sequence:
+                    continue
+                keys = []
+                smiles = normalize_smiles(_cell(row.get(smiles_col)))
+                if smiles:
+                    keys.append(_digest("smiles", smiles, sequence))
+                inchikey = _cell(row.get(inchikey_col)).upper() if inchikey_col else ""
+                if inchikey:
+                    keys.append(_digest("inchikey", inchikey, sequence))
+                for key in keys:
+                    ids = index.get(key, ())
+                    if evolf_id not in ids:
+                        index[key] = ids + (evolf_id,)
+        return index
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _save(self, index: dict, signature):
+        data = {
+            "format": INDEX_FORMAT,
+            "signature": list(signature),
+            "index": {key.hex(): list(ids) for key, ids in index.items()},
+        }
+        tmp = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _load(self, signature):
+        """The persisted index if it was built from the CSV with this signature, else None."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != INDEX_FORMAT or tuple(data.get("signature") or ()) != tuple(signature):
+            return None
+        return {bytes.fromhex(key): tuple(ids) for key, ids in data.get("index", {}).items()}
+
+    # ------------------------------------------------------------------
+    # Refresh (never on the request path)
+    # ------------------------------------------------------------------
+
+    def refresh(self, rebuild: bool = False) -> int:
+        """
+        Bring the index up to date with the dataset CSV: load the persisted
+        index, or build and persist it (always with rebuild). Returns the
+        number of indexed keys.
+        """
+        snapshot = self.store.snapshot()   # reloads a changed CSV first
+        signature = snapshot.signature
+        if not rebuild and signature == self._signature:
+            return len(self._index)
+        index = None if rebuild else self._load(signature)
+        if index is None:
+            index = self.build(snapshot)
+            try:
+                self._save(index, signature)
+            except OSError as e:
+                print(f"Could not persist the curated index: {e}")
+        self._index, self._signature = index, signature
+        return len(index)
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:   # dataset missing / unreadable: lookups keep the old index
+            print(f"Curated index refresh failed: {e}")
+
+    def refresh_in_background(self):
+        """Start refresh() on a thread unless one is already running."""
+        with self._refresh_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_quietly, name="curated-index", daemon=True,
+            )
+            self._refresh_thread.start()
+
+    def _ensure_fresh(self):
+        if self.store.stat_signature() != self._signature:
+            self.refresh_in_background()
+
+    def lookup(self, smiles: str, receptor_seq: str):
+        """EvOlf IDs with measured data for this pair (empty tuple when none)."""
+        sequence = normalize_sequence(receptor_seq)
+        if not smiles or not sequence:
+            return ()
+        self._ensure_fresh()
+        ids = list(self._index.get(_digest("smiles", normalize_smiles(smiles), sequence), ()))
+        inchikey = _inchikey(smiles.strip())
+        if inchikey:
+            for evolf_id in self._index.get(_digest("inchikey", inchikey, sequence), ()):
+                if evolf_id not in ids:
+                    ids.append(evolf_id)
+        return tuple(ids)
+
+    def records(self, evolf_ids):
+        """Curated records (CURATED_FIELDS) for the given IDs."""
+        snapshot = self.store.snapshot()
+        columns = snapshot.resolve_columns(CURATED_FIELDS)
+        rows = snapshot.get_many(evolf_ids)
+        return [
+            {header: _cell(rows[eid].get(col)) for col, header in columns}
+            for eid in evolf_ids if eid in rows
+        ]
+
+    def __len__(self):
+        return len(self._index)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_curated_index() -> CuratedIndex:
+    """Return the per-process CuratedIndex over the dataset store."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                store = get_dataset_store()
+                _index = CuratedIndex(store, os.path.join(os.path.dirname(store.csv_path), INDEX_FILENAME))
+    return _index
@@ -0,0 +1,214 @@
+# core/services/dataset_store.py
+"""
+Process-wide, keyed view of evolf_data.csv.
+
+The CSV is parsed once per process and indexed by EvOlf ID, so detail
+lookups are a dict access instead of a full pd.read_csv per request.
+The file is re-stat'ed at most every DATASET_STORE_CHECK_INTERVAL seconds
+and reloaded when its mtime or size changes. Each load is one immutable
+DatasetSnapshot swapped in as a whole.
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+from django.conf import settings
+
+ID_COLUMNS = ("EvOlf ID", "EvOlf_ID", "EvOlfID", "evolf_id")
+
+
+class DatasetNotFound(Exception):
+    """The dataset CSV does not exist."""
+
+
+class DatasetSchemaError(Exception):
+    """The dataset CSV has no usable EvOlf ID column."""
+
+
+def get_dataset_csv_path() -> str:
+    return os.path.join(settings.BASE_DIR, settings.PATH_AFTER_BASE_DIR, "evolf_data.csv")
+
+
+def _normalize_column(name: str) -> str:
+    return name.strip().replace(" ", "_").lower()
+
+
+class DatasetSnapshot:
+    """
+    One load of the CSV. Rows, columns and signature are never changed
+    after construction; a reload swaps in a whole new snapshot, so a reader
+    holding one never pairs new rows with old columns.
+    """
+
+    def __init__(self, rows: dict, columns: list, id_column: str, signature, version: int):
+        self.rows = rows
+        self.columns = columns
+        self.id_column = id_column
+        self.signature = signature  # (mtime_ns, size) of the loaded file
+        self.version = version
+        self._column_lookup = {}    # normalized name -> column
+        for col in columns:
+            self._column_lookup.setdefault(_normalize_column(col), col)
+        self._resolved = {}         # tuple(fields) -> [(column, header)]
+
+    def get(self, evolf_id):
+        return self.rows.get(evolf_id)
+
+    def ids(self):
+        return list(self.rows)
+
+    def items(self):
+        return list(self.rows.items())
+
+    def get_many(self, evolf_ids):
+        rows = self.rows
+        return {eid: rows[eid] for eid in evolf_ids if eid in rows}
+
+    def resolve_columns(self, fields):
+        key = tuple(fields)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = []
+            for field in fields:
+                col = self._column_lookup.get(_normalize_column(field))
+                if col is not None:
+                    resolved.append((col, col.strip()))
+            if not resolved:
+                resolved = [(col, col.strip()) for col in self.columns]
+            self._resolved[key] = resolved
+        return resolved
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class DatasetStore:
+    def __init__(self, csv_path: str, check_interval: float = 2.0):
+        self.csv_path = csv_path
+        self.check_interval = check_interval
+        self._snapshot = None       # DatasetSnapshot of the last successful load
+        self._failed = None         # (signature, error) of the last load that failed
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def stat_signature(self):
+        """(mtime_ns, size) of the CSV on disk now, or None when it is missing."""
+        try:
+            st = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, signature) -> DatasetSnapshot:
+        df = pd.read_csv(self.csv_path)
+
+        id_col = next((c for c in df.columns if c.strip() in ID_COLUMNS), None)
+        if not id_col:
+            raise DatasetSchemaError("Missing EvOlf_ID column in dataset")
+
+        rows = {}
+        for record in df.to_dict(orient="records"):
+            # keep the first row per ID (matches the old rows[0] behaviour)
+            rows.setdefault(record[id_col], record)
+
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        return DatasetSnapshot(rows, list(df.columns), id_col, signature, version)
+
+    def snapshot(self) -> DatasetSnapshot:
+        """
+        The current snapshot, reloaded first if the file changed. A file that
+        failed to load is not retried until its (mtime, size) changes again;
+        meanwhile the previous snapshot keeps serving, or the error is raised
+        when there is none.
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._checked_at < self.check_interval:
+                return snapshot
+            signature = self.stat_signature()
+            if signature is None:
+                raise DatasetNotFound(self.csv_path)
+            if snapshot is None or signature != snapshot.signature:
+                if self._failed is None or self._failed[0] != signature:
+                    try:
+                        self._snapshot = snapshot = self._load(signature)
+                        self._failed = None
+                    except Exception as e:
+                        print(f"Dataset CSV {self.csv_path} could not be loaded: {e}")
+                        self._failed = (signature, e)
+                if snapshot is None:
+                    self._checked_at = now
+                    raise self._failed[1].with_traceback(None)
+            self._checked_at = now
+            return snapshot
+
+    # ------------------------------------------------------------------
+    # Lookups (each one freshness check against one snapshot; callers that
+    # combine several should take snapshot() once instead)
+    # ------------------------------------------------------------------
+
+    def get(self, evolf_id):
+        """Return the raw CSV row (column -> value) for evolf_id, or None."""
+        return self.snapshot().get(evolf_id)
+
+    def ids(self):
+        """All EvOlf IDs in file order."""
+        return self.snapshot().ids()
+
+    def items(self):
+        """[(evolf_id, row)] for every entry, in file order."""
+        return self.snapshot().items()
+
+    def get_many(self, evolf_ids):
+        """Return {evolf_id: row} for the IDs that exist, in one freshness check."""
+        return self.snapshot().get_many(evolf_ids)
+
+    def resolve_columns(self, fields):
+        """
+        Map wanted field names onto dataset columns, ignoring case, padding
+        and space/underscore differences. Returns [(column, header)] where
+        header is the stripped column name; falls back to every column when
+        none of the fields exist. Resolved once per field list and load.
+        """
+        return self.snapshot().resolve_columns(fields)
+
+    @property
+    def columns(self):
+        return self.snapshot().columns
+
+    @property
+    def signature(self):
+        """(mtime_ns, size) of the loaded CSV, or None before the first load."""
+        snapshot = self._snapshot
+        return snapshot.signature if snapshot else None
+
+    def __len__(self):
+        return len(self.snapshot())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_dataset_store() -> DatasetStore:
+    """Return the per-process DatasetStore for the configured evolf_data.csv."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DatasetStore(
+                    get_dataset_csv_path(),
+                    check_interval=float(getattr(settings, "DATASET_STORE_CHECK_INTERVAL", 2.0)),
+                )
+    return _store
@@ -0,0 +1,248 @@
+# core/services/export_shards.py
+"""
+Pre-built export shards for filter-only dataset exports.
+
+After an import, every Species x Class x Mutation_Status combination is
+written once as a gzip-compressed CSV per EvOlf_ID order (rows only, each
+prefixed with its rank in the database's ORDER BY EvOlf_ID) and recorded in
+manifest.json. DatasetExportAPIView serves filter-only exports sorted by
+EvOlf_ID (no search term, no explicit IDs) from them: the first request for
+a filter combination streams a k-way merge of the matching shards, on the
+stored rank so the order is the database's collation order, into a ZIP
+holding only data.csv; later requests copy that entry as-is and append
+metadata.json and README.txt (see zip_stream.extend_zip). Only combinations
+that are actually requested get built; the unfiltered default export is
+built with the shards. Other sort columns are left to the database.
+"""
+
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import datetime
+import os
+import shutil
+import threading
+import zipfile
+from operator import itemgetter
+
+from django.conf import settings
+
+from core.models import EvOlf
+
+# Columns included in filtered exports (shared with DatasetExportAPIView)
+EXPORT_FIELDS = ['EvOlf_ID', 'Class', 'Species', 'Receptor_ID', 'Receptor', 'UniProt_ID',
+                 'Mutation_Status', 'Mutation', 'Mutation_Impact', 'Sequence', 'Receptor_SubType',
+                 'Ligand_ID', 'Ligand', 'SMILES', 'CID', 'InChiKey', 'InChi', 'IUPAC_Name', 'Source',
+                 'Model', 'Source_Links', 'Value', 'Method']
+
+# Fields that make up a shard key, paired with the export filter names
+FACET_FIELDS = (
+    ("Species", "species"),
+    ("Class", "class_filter"),
+    ("Mutation_Status", "mutation_type"),
+)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 3
+
+EXPORT_README = "EvoLF dataset export containing filtered data."
+SORT_ORDERS = ("asc", "desc")
+
+_manifest_lock = threading.Lock()
+_manifest_cache = {"mtime": None, "data": None}
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def get_shard_dir() -> str:
+    return os.path.join(settings.BASE_DIR, settings.PATH_AFTER_BASE_DIR, "export_shards")
+
+
+def _shard_filename(values, sort_order: str) -> str:
+    digest = hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()[:16]
+    return f"shard_{digest}_{sort_order}.csv.gz"
+
+
+def _data_filename(shards: list, sort_order: str) -> str:
+    names = sorted(shard["files"][sort_order] for shard in shards)
+    digest = hashlib.sha1("\x1f".join(names).encode("utf-8")).hexdigest()[:16]
+    return f"data_{digest}_{sort_order}.zip"
+
+
+def write_export_zip(fileobj, csv_text: str, metadata: dict) -> None:
+    """The export ZIP layout: data.csv, metadata.json, README.txt."""
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("data.csv", csv_text)
+        zf.writestr("metadata.json", json.dumps(metadata, indent=2))
+        zf.writestr("README.txt", EXPORT_README)
+
+
+# ----------------------------------------------------------------------
+# Builder
+# ----------------------------------------------------------------------
+
+def build_export_shards(shard_dir: str = None) -> dict:
+    """
+    Materialize one compressed CSV per facet combination and EvOlf_ID order,
+    and write the manifest. The new shard set is built next to the old one
+    and swapped in at the end, so readers never see a half-written directory.
+    """
+    shard_dir = shard_dir or get_shard_dir()
+    parent = os.path.dirname(shard_dir)
+    os.makedirs(parent, exist_ok=True)
+
+    tmp_dir = f"{shard_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    facet_idx = [EXPORT_FIELDS.index(f) for f, _ in FACET_FIELDS]
+    writers = {}
+    shards = {}
+    total = 0
+
+    try:
+        for sort_order in SORT_ORDERS:
+            ordering = "EvOlf_ID" if sort_order == "asc" else "-EvOlf_ID"
+            rows = EvOlf.objects.order_by(ordering).values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+            for position, row in enumerate(rows):
+                # rank in the database's ascending order, whichever way this pass runs
+                rank = position if sort_order == "asc" else total - 1 - position
+                row = ["" if v is None else v for v in row]
+                key = tuple(str(row[i]) for i in facet_idx)
+
+                if (key, sort_order) not in writers:
+                    filename = _shard_filename(key, sort_order)
+                    fh = gzip.open(os.path.join(tmp_dir, filename), "wt", encoding="utf-8", newline="")
+                    writers[(key, sort_order)] = (fh, csv.writer(fh))
+                    shard = shards.setdefault(key, {
+                        "files": {},
+                        "facets": {f: v for (f, _), v in zip(FACET_FIELDS, key)},
+                        "count": 0,
+                    })
+                    shard["files"][sort_order] = filename
+
+                writers[(key, sort_order)][1].writerow([rank] + row)
+                if sort_order == "asc":
+                    shards[key]["count"] += 1
+                    total += 1
+    finally:
+        for fh, _ in writers.values():
+            fh.close()
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generatedAt": datetime.datetime.utcnow().isoformat() + "Z",
+        "fields": EXPORT_FIELDS,
+        "orderedBy": "EvOlf_ID",
+        "totalRecords": total,
+        "shards": [shard for shard in shards.values() if len(shard["files"]) == len(SORT_ORDERS)],
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # the unfiltered export in the default order is the one most often requested
+    if manifest["shards"]:
+        build_data_zip(manifest["shards"], "desc", shard_dir=tmp_dir)
+
+    # Swap the freshly built directory in
+    old_dir = f"{shard_dir}.old-{os.getpid()}"
+    if os.path.isdir(shard_dir):
+        os.rename(shard_dir, old_dir)
+    os.rename(tmp_dir, shard_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return manifest
+
+
+def _build_lock(path: str) -> threading.Lock:
+    with _build_locks_lock:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+def build_data_zip(shards: list, sort_order: str = "desc", shard_dir: str = None) -> str:
+    """
+    Path of a ZIP holding only data.csv (header plus the shards' rows in
+    EvOlf_ID order), built on first use. The rows are streamed from the
+    shards into the archive, never held in memory.
+    """
+    shard_dir = shard_dir or get_shard_dir()
+    path = os.path.join(shard_dir, _data_filename(shards, sort_order))
+    if os.path.isfile(path):
+        return path
+
+    with _build_lock(path):
+        if os.path.isfile(path):
+            return path
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+                with io.TextIOWrapper(zf.open("data.csv", "w", force_zip64=True),
+                                      encoding="utf-8", newline="") as fh:
+                    writer = csv.writer(fh)
+                    writer.writerow(EXPORT_FIELDS)
+                    writer.writerows(iter_shard_rows(shards, sort_order, shard_dir=shard_dir))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return path
+
+
+# ----------------------------------------------------------------------
+# Reader
+# ----------------------------------------------------------------------
+
+def load_manifest(shard_dir: str = None):
+    """Return the shard manifest (cached per process, reloaded on mtime change) or None."""
+    shard_dir = shard_dir or get_shard_dir()
+    manifest_path = os.path.join(shard_dir, MANIFEST_NAME)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return None
+
+    with _manifest_lock:
+        if _manifest_cache["mtime"] != mtime:
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if data.get("version") != MANIFEST_VERSION or data.get("fields") != EXPORT_FIELDS:
+                data = None
+            _manifest_cache.update(mtime=mtime, data=data)
+        return _manifest_cache["data"]
+
+
+def match_shards(manifest: dict, filters: dict) -> list:
+    """Shards whose facets match every given filter (case-insensitive, like Field__iexact)."""
+    wanted = {
+        field: str(filters[name]).lower()
+        for field, name in FACET_FIELDS
+        if filters.get(name)
+    }
+    return [
+        shard for shard in manifest["shards"]
+        if all(shard["facets"][field].lower() == value for field, value in wanted.items())
+    ]
+
+
+def _iter_shard_rows(path: str):
+    """(rank, row) pairs of one shard file."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as fh:
+        for record in csv.reader(fh):
+            yield int(record[0]), record[1:]
+
+
+def iter_shard_rows(shards: list, sort_order: str = "desc", shard_dir: str = None):
+    """
+    Export rows of the given shards in the database's EvOlf_ID order
+    (a lazy k-way merge on the stored rank; O(len(shards)) memory).
+    """
+    shard_dir = shard_dir or get_shard_dir()
+    sources = [_iter_shard_rows(os.path.join(shard_dir, s["files"][sort_order])) for s in shards]
+    for _, row in heapq.merge(*sources, key=itemgetter(0), reverse=sort_order == "desc"):
+        yield row
@@ -0,0 +1,187 @@
+# core/services/file_serving.py
+"""
+Conditional / ranged file responses for static-like payloads (structure files, archives).
+
+serve_file() handles:
+  - ETag + If-None-Match (304)
+  - Cache-Control (immutable for content-addressed URLs)
+  - single-range Range / If-Range requests (206 / 416)
+  - precompressed .br/.gz siblings negotiated on Accept-Encoding
+  - on-the-fly gzip for text-like content when no sibling exists
+  - X-Accel-Redirect hand-off to nginx when MEDIA_ACCEL_REDIRECT_PREFIX is set
+"""
+
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Files larger than this are never gzipped on the fly
+MAX_ONTHEFLY_GZIP_SIZE = 32 * 1024 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Content-Encoding -> ETag suffix, in server preference order
+_ENCODING_TAGS = {"br": "br", "gzip": "gz"}
+
+
+def make_etag(size: int, mtime: float) -> str:
+    return f'"{size:x}-{int(mtime * 1_000_000):x}"'
+
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{_ENCODING_TAGS[encoding]}"'
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.startswith(("text/", "chemical/")) or content_type == "application/json"
+
+
+def accepts_encoding(request, encoding: str) -> bool:
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [t.strip() for t in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def parse_range(header: str, size: int):
+    """Return (start, end_inclusive) for a single satisfiable byte range, None if absent/unsupported, or False if unsatisfiable."""
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        return None  # multi-range or malformed: serve the whole file
+    first, last = m.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _finish(response, etag, mtime, cache_control, vary=True):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    if vary:
+        response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def serve_file(request, path: str, content_type: str, size: int = None, mtime: float = None,
+               immutable: bool = False, filename: str = None, as_attachment: bool = False,
+               encodings: dict = None, accel_path: str = None, accel_prefix: str = None):
+    """
+    Serve path with caching validators, Range support and content-encoding negotiation.
+    size/mtime may be supplied from a manifest to avoid an extra stat.
+    encodings maps "br"/"gzip" to precompressed sibling paths.
+    accel_path is the file's path relative to the X-Accel-Redirect location; when
+    MEDIA_ACCEL_REDIRECT_PREFIX is configured nginx serves the bytes (and, with
+    gzip_static / brotli_static, the precompressed siblings and ranges) itself.
+    accel_prefix overrides MEDIA_ACCEL_REDIRECT_PREFIX for files outside MEDIA_ROOT.
+    """
+    if size is None or mtime is None:
+        st = os.stat(path)
+        size, mtime = st.st_size, st.st_mtime
+
+    encodings = encodings or {}
+    etag = make_etag(size, mtime)
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    compressible = _is_compressible(content_type)
+    vary = compressible or bool(encodings)
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if if_none_match and any(
+        _etag_matches(if_none_match, tag)
+        for tag in [etag] + [_variant_etag(etag, enc) for enc in _ENCODING_TAGS]
+    ):
+        return _finish(HttpResponse(status=304), etag, mtime, cache_control, vary=vary)
+
+    disposition = None
+    if filename:
+        kind = "attachment" if as_attachment else "inline"
+        disposition = f'{kind}; filename="{filename}"'
+
+    # --- Hand the transfer to nginx (internal location aliased to MEDIA_ROOT)
+    if accel_prefix is None:
+        accel_prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "")
+    if accel_prefix and accel_path:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + accel_path.lstrip("/")
+        if disposition:
+            response["Content-Disposition"] = disposition
+        return _finish(response, etag, mtime, cache_control, vary=vary)
+
+    # --- Range request (never combined with content-encoding)
+    range_header = request.META.get("HTTP_RANGE", "")
+    if_range = request.META.get("HTTP_IF_RANGE", "")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return _finish(response, etag, mtime, cache_control, vary=vary)
+        if byte_range is not None:
+            start, end = byte_range
+            with open(path, "rb") as fh:
+                fh.seek(start)
+                body = fh.read(end - start + 1)
+            response = HttpResponse(body, status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            if disposition:
+                response["Content-Disposition"] = disposition
+            return _finish(response, etag, mtime, cache_control, vary=vary)
+
+    # --- Precompressed sibling the client accepts
+    for encoding in _ENCODING_TAGS:
+        variant = encodings.get(encoding)
+        if variant and accepts_encoding(request, encoding):
+            try:
+                fh = open(variant, "rb")
+            except OSError:
+                continue
+            response = FileResponse(fh, content_type=content_type)
+            response["Content-Encoding"] = encoding
+            if disposition:
+                response["Content-Disposition"] = disposition
+            return _finish(response, _variant_etag(etag, encoding), mtime, cache_control)
+
+    # --- gzip on the fly for text-like payloads without a sibling
+    if compressible and size <= MAX_ONTHEFLY_GZIP_SIZE and accepts_encoding(request, "gzip"):
+        with open(path, "rb") as fh:
+            body = gzip.compress(fh.read(), compresslevel=6)
+        response = HttpResponse(body, content_type=content_type)
+        response["Content-Encoding"] = "gzip"
+        if disposition:
+            response["Content-Disposition"] = disposition
+        return _finish(response, _variant_etag(etag, "gzip"), mtime, cache_control)
+
+    response = FileResponse(open(path, "rb"), content_type=content_type)
+    if disposition:
+        response["Content-Disposition"] = disposition
+    return _finish(response, etag, mtime, cache_control, vary=vary)
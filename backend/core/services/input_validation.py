@@ -0,0 +1,187 @@
+# core/services/input_validation.py
+"""
+Validation of prediction inputs: ligand SMILES and receptor sequences.
+
+validate_smiles() / validate_receptor_sequence() check one string (the
+single-prediction endpoint). For batches, smiles_errors() /
+receptor_errors() check whole columns at once with the same rules and
+messages. Every row is UTF-8 encoded into one NumPy byte buffer, and 256-entry
+lookup tables flag disallowed and whitespace bytes. np.bincount over each
+byte's row number then gives the per-row verdicts. Python-level work is
+limited to the rows that fail; rows with non-ASCII bytes (always invalid,
+but possibly Unicode whitespace) are re-checked with the single-string
+validator so messages match it exactly.
+
+first_occurrence() maps repeated ligands, receptors or pairs to their
+first row, for deduplicating batch jobs.
+"""
+
+import re
+import string
+
+import numpy as np
+
+MAX_SMILES_LENGTH = 512
+MAX_RECEPTOR_LENGTH = 1024
+ALLOWED_AMINO_ACIDS = "ARNDCQEGHILKMFPSTWYV"
+
+SMILES_REQUIRED = "'smiles' is required."
+SMILES_TOO_LONG = f"Ligand SMILES exceeds the maximum limit of {MAX_SMILES_LENGTH}.Please provide a shorter SMILES "
+SMILES_WHITESPACE = "SMILES contains whitespace."
+SMILES_INVALID = "Invalid SMILES characters."
+RECEPTOR_FASTA = "FASTA format is not allowed."
+RECEPTOR_TOO_LONG = f"Receptor sequence exceeds the maximum allowed length of {MAX_RECEPTOR_LENGTH}.Please provide a shorter sequence."
+RECEPTOR_WHITESPACE = "Receptor sequence contains whitespace."
+RECEPTOR_INVALID = "Invalid characters detected in the receptor sequence. Please use only the 20 standard amino acids (A, C, D, E, F, G, H, I, K, L, M, N, P, Q, R, S, T, V, W, Y)."
+
+_SMILES_ALLOWED_RE = re.compile(r'^[A-Za-z0-9@\+\-\[\]\(\)=#\/\\%.:\*]+$')
+_RECEPTOR_AA_RE = re.compile(r'^[ARNDCQEGHILKMFPSTWYV]+$', re.I)
+
+
+# ----------------------------------------------------------------------
+# Single strings
+# ----------------------------------------------------------------------
+
+def validate_smiles(smiles: str):
+    """Return an error message for an invalid (already stripped) SMILES, else None."""
+    if len(smiles) > MAX_SMILES_LENGTH:
+        return SMILES_TOO_LONG
+    if re.search(r"\s", smiles):
+        return SMILES_WHITESPACE
+    if not _SMILES_ALLOWED_RE.match(smiles):
+        return SMILES_INVALID
+    return None
+
+
+def validate_receptor_sequence(receptor_seq: str):
+    """Return an error message for an invalid (already stripped, non-empty) receptor sequence, else None."""
+    if receptor_seq.startswith(">"):
+        return RECEPTOR_FASTA
+    if len(receptor_seq) > MAX_RECEPTOR_LENGTH:
+        return RECEPTOR_TOO_LONG
+    if re.search(r"\s", receptor_seq):
+        return RECEPTOR_WHITESPACE
+    if not _RECEPTOR_AA_RE.match(receptor_seq):
+        return RECEPTOR_INVALID
+    return None
+
+
+# ----------------------------------------------------------------------
+# Columns
+# ----------------------------------------------------------------------
+
+def _byte_table(chars: str) -> np.ndarray:
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(chars.encode("ascii"), dtype=np.uint8)] = True
+    return table
+
+
+_SMILES_TABLE = _byte_table(string.ascii_letters + string.digits + "@+-[]()=#/\\%.:*")
+_AA_TABLE = _byte_table(ALLOWED_AMINO_ACIDS + ALLOWED_AMINO_ACIDS.lower())
+# ASCII characters str.isspace() / \s accept
+_WHITESPACE_TABLE = _byte_table(" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")
+
+
+class _Column:
+    """A column of strings as one byte buffer plus per-row bookkeeping."""
+
+    def __init__(self, values):
+        self.values = values
+        encoded = [v.encode("utf-8") for v in values]
+        self.count = len(values)
+        self.lengths = np.fromiter(map(len, values), dtype=np.int64, count=self.count)
+        byte_lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=self.count)
+        self.buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self.row_of_byte = np.repeat(np.arange(self.count), byte_lengths)
+        self.starts = np.cumsum(byte_lengths) - byte_lengths
+        self.non_ascii = byte_lengths != self.lengths
+
+    def rows_with(self, byte_mask: np.ndarray) -> np.ndarray:
+        """Boolean per row: does any of its bytes satisfy byte_mask?"""
+        return np.bincount(self.row_of_byte[byte_mask], minlength=self.count) > 0
+
+    def first_byte_is(self, char: str) -> np.ndarray:
+        first = np.zeros(self.count, dtype=bool)
+        nonempty = self.lengths > 0
+        first[nonempty] = self.buf[self.starts[nonempty]] == ord(char)
+        return first
+
+
+def smiles_errors(values) -> list:
+    """Per-row error message (or None) for a list of stripped SMILES strings; "" is an error."""
+    column = _Column(values)
+    empty = column.lengths == 0
+    too_long = column.lengths > MAX_SMILES_LENGTH
+    whitespace = column.rows_with(_WHITESPACE_TABLE[column.buf])
+    invalid = column.rows_with(~_SMILES_TABLE[column.buf])
+
+    errors = [None] * column.count
+    for i in np.flatnonzero(empty | too_long | whitespace | invalid | column.non_ascii):
+        if empty[i]:
+            errors[i] = SMILES_REQUIRED
+        elif column.non_ascii[i]:
+            errors[i] = validate_smiles(values[i])
+        elif too_long[i]:
+            errors[i] = SMILES_TOO_LONG
+        elif whitespace[i]:
+            errors[i] = SMILES_WHITESPACE
+        else:
+            errors[i] = SMILES_INVALID
+    return errors
+
+
+def receptor_errors(values) -> list:
+    """Per-row error message (or None) for a list of stripped receptor sequences; "" (no receptor) is valid."""
+    column = _Column(values)
+    fasta = column.first_byte_is(">")
+    too_long = column.lengths > MAX_RECEPTOR_LENGTH
+    whitespace = column.rows_with(_WHITESPACE_TABLE[column.buf])
+    invalid = column.rows_with(~_AA_TABLE[column.buf])
+
+    errors = [None] * column.count
+    for i in np.flatnonzero(fasta | too_long | whitespace | invalid | column.non_ascii):
+        if column.non_ascii[i]:
+            errors[i] = validate_receptor_sequence(values[i])
+        elif fasta[i]:
+            errors[i] = RECEPTOR_FASTA
+        elif too_long[i]:
+            errors[i] = RECEPTOR_TOO_LONG
+        elif whitespace[i]:
+            errors[i] = RECEPTOR_WHITESPACE
+        else:
+            errors[i] = RECEPTOR_INVALID
+    return errors
+
+
+def batch_errors(smiles, sequences, row_ids) -> list:
+    """
+    Per-row error message (or None) for a batch: SMILES rules, then receptor
+    rules, then duplicate row IDs (the first valid row with an ID keeps it).
+    """
+    errors = smiles_errors(smiles)
+    for i, error in enumerate(receptor_errors(sequences)):
+        if error and not errors[i]:
+            errors[i] = error
+    seen = set()
+    for i, row_id in enumerate(row_ids):
+        if errors[i]:
+            continue
+        if row_id in seen:
+            errors[i] = f"Duplicate row ID '{row_id}'."
+        else:
+            seen.add(row_id)
+    return errors
+
+
+# ----------------------------------------------------------------------
+# Deduplication
+# ----------------------------------------------------------------------
+
+def first_occurrence(keys) -> np.ndarray:
+    """For every key, the index of the first row with an equal key."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    column = np.empty(len(keys), dtype=object)
+    column[:] = keys
+    _, first, inverse = np.unique(column, return_index=True, return_inverse=True)
+    return first[inverse.reshape(-1)]
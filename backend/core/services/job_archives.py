@@ -0,0 +1,125 @@
+# core/services/job_archives.py
+"""
+Shared output archives for prediction job downloads.
+
+The ZIP of a job's output/ is built once per output state and reused:
+its name carries a fingerprint of the output files (relative path, size,
+mtime), so a stale archive is never served and a finished job's archive is
+never rebuilt. Builds are single-flight - a per-process lock plus an
+flock() on a lock file for other workers - and land via atomic rename, so
+concurrent downloads never see a half-written file.
+
+Outputs larger than JOB_ARCHIVE_STREAM_THRESHOLD bytes are not cached;
+they are streamed as a store-only ZIP instead of compressed to disk first.
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from core.services.file_serving import serve_file
+from core.services.zip_stream import iter_zip
+
+ARCHIVE_DIR = ".archives"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _job_lock(job_dir: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(job_dir, threading.Lock())
+
+
+def output_members(job_dir: str) -> list:
+    """[(arcname, absolute path, size, mtime_ns)] for the files under output/, sorted."""
+    members = []
+    for root, _, filenames in os.walk(os.path.join(job_dir, "output")):
+        for fn in filenames:
+            full = os.path.join(root, fn)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            members.append((os.path.relpath(full, job_dir), full, st.st_size, st.st_mtime_ns))
+    return sorted(members)
+
+
+def fingerprint(members) -> str:
+    digest = hashlib.sha1()
+    for arcname, _, size, mtime_ns in members:
+        digest.update(f"{arcname}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _build(job_dir: str, members, path: str):
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for arcname, full, _, _ in members:
+                zf.write(full, arcname=arcname)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    # drop archives of earlier output states
+    keep = os.path.basename(path)
+    for name in os.listdir(os.path.dirname(path)):
+        if name.endswith(".zip") and name != keep:
+            try:
+                os.remove(os.path.join(os.path.dirname(path), name))
+            except OSError:
+                pass
+
+
+def get_output_archive(job_dir: str, members=None) -> str:
+    """Path of the cached ZIP for the job's current output/, building it if needed."""
+    members = output_members(job_dir) if members is None else members
+    archive_dir = os.path.join(job_dir, ARCHIVE_DIR)
+    path = os.path.join(archive_dir, f"output-{fingerprint(members)}.zip")
+    if os.path.isfile(path):
+        return path
+
+    os.makedirs(archive_dir, exist_ok=True)
+    with _job_lock(job_dir):
+        with open(os.path.join(archive_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not os.path.isfile(path):   # built by another request while we waited
+                    _build(job_dir, members, path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return path
+
+
+def output_archive_response(request, job_id: str, job_dir: str):
+    """
+    Download response for the job's output/ as <job_id>_output.zip, or None
+    when there are no output files.
+    """
+    members = output_members(job_dir)
+    if not members:
+        return None
+    filename = f"{job_id}_output.zip"
+
+    threshold = int(getattr(settings, "JOB_ARCHIVE_STREAM_THRESHOLD", 512 * 1024 * 1024))
+    if sum(size for _, _, size, _ in members) > threshold:
+        stream = iter_zip(((arcname, Path(full)) for arcname, full, _, _ in members), compression=zipfile.ZIP_STORED)
+        response = StreamingHttpResponse(stream, content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    path = get_output_archive(job_dir, members)
+    job_root = getattr(settings, "JOB_DATA_DIR", "")
+    return serve_file(
+        request, path, "application/zip", filename=filename, as_attachment=True,
+        accel_path=os.path.relpath(path, job_root) if job_root else None,
+        accel_prefix=getattr(settings, "JOB_ACCEL_REDIRECT_PREFIX", ""),
+    )
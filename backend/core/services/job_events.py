@@ -0,0 +1,183 @@
+# core/services/job_events.py
+"""
+Job-state change notifications for long-poll and SSE status requests.
+
+A job's observable state is summarised by a signature: the mtimes of its
+output/ directory and submission.json, the mtime and size of
+Prediction_Output.csv and the _SUCCESS marker (a pipeline rewriting or
+appending to the output in place leaves the directory mtime alone), and
+whether the output has settled (output_complete() only counts it then).
+Waiters block on an Event per job; one watcher thread per process
+re-stats only the jobs somebody is currently waiting on (every
+JOB_EVENTS_POLL_INTERVAL seconds) and wakes their waiters when the
+signature changes. notify_job() wakes them immediately, for in-process
+completion callbacks. Async views wait with wait_async(), which parks a
+coroutine on the event loop instead of a thread.
+
+Stat polling is used instead of inotify: JOB_DATA_DIR is usually a
+volume shared with the pipeline container or host, where inotify does not
+see writes made by other machines.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from core.services.job_paths import resolve_job_dir
+from core.services.prediction_results import OUTPUT_FILENAME, OUTPUT_SENTINEL, OUTPUT_SETTLE_SECONDS
+from core.services.submission_executor import STATE_FILE
+
+
+def _stat_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _stat_file(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _AsyncWaiter:
+    """Waiter for a coroutine: set() may be called from the watcher thread."""
+
+    def __init__(self, loop):
+        self._loop = loop
+        self.event = asyncio.Event()
+
+    def set(self):
+        try:
+            self._loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:   # loop already closed; nobody is waiting any more
+            pass
+
+
+class JobEventNotifier:
+    def __init__(self, job_root: str, poll_interval: float = 0.5):
+        self.job_root = job_root
+        self.poll_interval = poll_interval
+        self._waiters = {}       # job_id -> set of threading.Event / _AsyncWaiter
+        self._signatures = {}    # job_id -> last signature seen by the watcher
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def signature(self, job_id: str):
+        job_dir = resolve_job_dir(job_id) or os.path.join(self.job_root, job_id)
+        output_dir = os.path.join(job_dir, "output")
+        output = _stat_file(os.path.join(output_dir, OUTPUT_FILENAME))
+        settled = output is not None and time.time_ns() - output[0] >= OUTPUT_SETTLE_SECONDS * 1e9
+        return (
+            _stat_mtime(output_dir),
+            _stat_mtime(os.path.join(job_dir, STATE_FILE)),
+            output,
+            settled,
+            _stat_file(os.path.join(output_dir, OUTPUT_SENTINEL)),
+        )
+
+    def notify(self, job_id: str):
+        with self._lock:
+            events = list(self._waiters.get(job_id, ()))
+        for event in events:
+            event.set()
+
+    def wait(self, job_id: str, since, timeout: float):
+        """
+        Block until the job's signature differs from since, notify() is called,
+        or timeout seconds pass. Returns the current signature.
+        """
+        deadline = time.monotonic() + timeout
+        event = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(event)
+            self._signatures.setdefault(job_id, since)
+            self._ensure_watcher()
+        try:
+            current = self.signature(job_id)
+            while current == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or event.wait(remaining):
+                    break
+                current = self.signature(job_id)
+            return self.signature(job_id)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(event)
+                    if not waiters:
+                        del self._waiters[job_id]
+                        self._signatures.pop(job_id, None)
+
+    async def wait_async(self, job_id: str, since, timeout: float):
+        """wait() for async views: nothing but the (threaded) stat calls leaves the event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = _AsyncWaiter(loop)
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(waiter)
+            self._signatures.setdefault(job_id, since)
+            self._ensure_watcher()
+        try:
+            if await asyncio.to_thread(self.signature, job_id) == since:
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+            return await asyncio.to_thread(self.signature, job_id)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+                        self._signatures.pop(job_id, None)
+
+    def _ensure_watcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name="job-events", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                watched = list(self._waiters)
+            for job_id in watched:
+                current = self.signature(job_id)
+                with self._lock:
+                    changed = job_id in self._signatures and self._signatures[job_id] != current
+                    if job_id in self._signatures:
+                        self._signatures[job_id] = current
+                if changed:
+                    self.notify(job_id)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_job_notifier() -> JobEventNotifier:
+    """Return the per-process JobEventNotifier for JOB_DATA_DIR."""
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = JobEventNotifier(
+                    getattr(settings, "JOB_DATA_DIR", "/data"),
+                    poll_interval=float(getattr(settings, "JOB_EVENTS_POLL_INTERVAL", 0.5)),
+                )
+    return _notifier
+
+
+def notify_job(job_id: str):
+    """Wake every request in this process waiting on job_id."""
+    get_job_notifier().notify(job_id)
@@ -0,0 +1,41 @@
+# core/services/job_inputs.py
+"""
+Job input files.
+
+write_job_input() is what the request path does: one makedirs, one write
+to a temp file and an atomic rename into <job dir>/<job_id>.csv.
+Readers see either no file or the complete file, so there is no need to
+poll for the directory or for a non-zero size, and no fsync on the
+request thread. ensure_durable() does the fsync of the file and its
+directory, and the background submission stage calls it just before
+handing the file to the pipeline.
+"""
+
+import os
+import threading
+
+from core.services.job_paths import get_job_dir
+
+
+def write_job_input(job_id: str, csv_bytes: bytes, filename: str = None) -> str:
+    """Atomically write the job input CSV (or another job file, by filename); returns its path."""
+    job_dir = get_job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    csv_path = os.path.join(job_dir, filename or f"{job_id}.csv")
+    tmp = f"{csv_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as fh:
+        fh.write(csv_bytes)
+    os.replace(tmp, csv_path)
+    return csv_path
+
+
+def ensure_durable(path: str):
+    """fsync the file and its directory entry (off the request path)."""
+    with open(path, "rb") as fh:
+        os.fsync(fh.fileno())
+    dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
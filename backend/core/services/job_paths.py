@@ -0,0 +1,84 @@
+# core/services/job_paths.py
+"""
+Where a job's directory lives under JOB_DATA_DIR.
+
+Layouts (JOB_DIR_LAYOUT):
+  flat     JOB_DATA_DIR/<job_id>/            (original layout)
+  sharded  JOB_DATA_DIR/<ab>/<cd>/<job_id>/  (ab, cd = first hex pairs of the UUID)
+
+New jobs are created in the configured layout; resolve_job_dir() finds a
+job in either layout, so jobs created before a switch keep working. With
+the sharded layout the pipeline is told the relative directory through
+the job_subdir form field.
+"""
+
+import hashlib
+import os
+import re
+
+from django.conf import settings
+
+_JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,100}$")
+_HEX_RE = re.compile(r"^[0-9a-f]{4}")
+
+# shard directories are two hex characters; anything else at the top level is a flat job
+SHARD_NAME_RE = re.compile(r"^[0-9a-f]{2}$")
+
+
+def get_job_root() -> str:
+    return getattr(settings, "JOB_DATA_DIR", None) or "/tmp/smiles_jobs"
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    return bool(job_id) and bool(_JOB_ID_RE.match(job_id))
+
+
+def _shards(job_id: str):
+    key = job_id.replace("-", "").lower()
+    if not _HEX_RE.match(key):
+        key = hashlib.sha1(job_id.encode("utf-8")).hexdigest()
+    return key[:2], key[2:4]
+
+
+def job_subdir(job_id: str) -> str:
+    """Job directory relative to JOB_DATA_DIR for new jobs (configured layout)."""
+    if getattr(settings, "JOB_DIR_LAYOUT", "flat") == "sharded":
+        return os.path.join(*_shards(job_id), job_id)
+    return job_id
+
+
+def get_job_dir(job_id: str) -> str:
+    """Directory a new job is created in."""
+    return os.path.join(get_job_root(), job_subdir(job_id))
+
+
+def resolve_job_dir(job_id: str):
+    """Existing directory of job_id in either layout, or None (also for malformed IDs)."""
+    if not is_valid_job_id(job_id):
+        return None
+    root = get_job_root()
+    for path in (os.path.join(root, *_shards(job_id), job_id), os.path.join(root, job_id)):
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def iter_job_dirs():
+    """Yield (job_id, job_dir) for every job in both layouts."""
+    root = get_job_root()
+    try:
+        top = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in top:
+        if not entry.is_dir() or entry.name.startswith(("_", ".")):
+            continue
+        if not SHARD_NAME_RE.match(entry.name):
+            yield entry.name, entry.path
+            continue
+        for second in os.scandir(entry.path):
+            if not second.is_dir():
+                continue
+            for job in os.scandir(second.path):
+                if job.is_dir():
+                    yield job.name, job.path
@@ -0,0 +1,272 @@
+# core/services/job_retention.py
+"""
+Retention for job directories under JOB_DATA_DIR.
+
+sweep() removes job directories (both layouts, see job_paths):
+  - older than JOB_RETENTION_MAX_AGE_DAYS, finished or not
+  - then, while the jobs together exceed JOB_RETENTION_MAX_BYTES, the oldest
+    finished jobs older than JOB_RETENTION_MIN_AGE_HOURS
+
+Before a directory goes its outcome is kept: results are recorded into
+PredictionJob/PredictionResult (so job status keeps answering from the
+database), and with JOB_RETENTION_ARCHIVE_DIR set the job's files are also
+written to <archive dir>/<ab>/<job_id>.tar.gz. Archives older than
+JOB_RETENTION_ARCHIVE_MAX_AGE_DAYS and finished scheduler rows older than
+the job age limit are dropped as well.
+
+maybe_sweep() runs a sweep in the background at most every
+JOB_RETENTION_INTERVAL seconds across all processes (flock on a stamp file
+in JOB_DATA_DIR); the job worker calls it on each poll. `manage.py
+sweep_jobs` runs it on demand.
+"""
+
+import datetime
+import fcntl
+import os
+import shutil
+import tarfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from core.models import PredictionJob, ScheduledJob
+from core.services.job_paths import SHARD_NAME_RE, get_job_root, iter_job_dirs
+from core.services.prediction_results import output_complete, record_completion, record_failure
+from core.services.submission_executor import STATE_FAILED, STATE_FILE, read_submission_state
+
+STAMP_FILE = "_retention.stamp"
+
+_last_check = 0.0
+_sweep_thread = None
+_sweep_guard = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _log(msg):
+    if _setting("DEBUG_LOG", False):
+        print(f"[RETENTION] {msg}")
+
+
+# ----------------------------------------------------------------------
+# Scanning
+# ----------------------------------------------------------------------
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            try:
+                total += os.lstat(os.path.join(root, fn)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _has_output(job_dir: str) -> bool:
+    return any(files for _, _, files in os.walk(os.path.join(job_dir, "output")))
+
+
+def scan_jobs() -> list:
+    """
+    [{job_id, job_dir, mtime, size, finished}] for every job directory.
+    mtime is the last activity (directory, output/ or submission.json);
+    finished means the output is complete or the submission failed or came from the cache.
+    """
+    jobs = []
+    for job_id, job_dir in iter_job_dirs():
+        state = (read_submission_state(job_dir) or {}).get("state")
+        jobs.append({
+            "job_id": job_id,
+            "job_dir": job_dir,
+            "mtime": max(_mtime(job_dir), _mtime(os.path.join(job_dir, "output")),
+                         _mtime(os.path.join(job_dir, STATE_FILE))),
+            "size": _dir_size(job_dir),
+            "finished": state in (STATE_FAILED, "cached") or output_complete(job_dir, job_id),
+        })
+    return jobs
+
+
+# ----------------------------------------------------------------------
+# Archiving
+# ----------------------------------------------------------------------
+
+def _archive_files(job_id: str, job_dir: str, archive_root: str) -> str:
+    """Write the job's files (minus cached download ZIPs) to <archive_root>/<ab>/<job_id>.tar.gz."""
+    path = os.path.join(archive_root, job_id[:2].lower(), f"{job_id}.tar.gz")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with tarfile.open(tmp, "w:gz") as tar:
+            tar.add(job_dir, arcname=job_id, filter=lambda info: None if "/.archives" in info.name else info)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def archive_job(job_id: str, job_dir: str, finished: bool, archive_root: str = None):
+    """Keep a job's outcome before its directory is removed (database rows, optional tarball)."""
+    state = read_submission_state(job_dir) or {}
+    try:
+        if output_complete(job_dir, job_id):
+            record_completion(job_id, job_dir)
+        elif state.get("state") == STATE_FAILED:
+            record_failure(job_id, state.get("error") or "Pipeline submission failed")
+        elif _has_output(job_dir):
+            record_failure(job_id, "Job expired with incomplete pipeline output")
+        elif not finished:
+            record_failure(job_id, "Job expired before the pipeline produced results")
+    except (DatabaseError, OSError, ValueError) as e:
+        _log(f"Could not record job {job_id}: {e}")
+    if archive_root:
+        _archive_files(job_id, job_dir, archive_root)
+
+
+def _remove_job_dir(job_dir: str):
+    shutil.rmtree(job_dir, ignore_errors=True)
+    # drop the shard directories if this was their last job
+    root = os.path.abspath(get_job_root())
+    parent = os.path.dirname(os.path.abspath(job_dir))
+    while parent != root and SHARD_NAME_RE.match(os.path.basename(parent)):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def _evict_archives(archive_root: str, max_age: float) -> int:
+    removed = 0
+    cutoff = time.time() - max_age
+    for root, _, files in os.walk(archive_root):
+        for fn in files:
+            path = os.path.join(root, fn)
+            if _mtime(path) < cutoff:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+# ----------------------------------------------------------------------
+# Sweep
+# ----------------------------------------------------------------------
+
+def sweep(max_age_days: float = None, max_bytes: int = None, min_age_hours: float = None,
+          dry_run: bool = False) -> dict:
+    """Apply the age and size limits to JOB_DATA_DIR. Returns counts of what was (or would be) removed."""
+    if max_age_days is None:
+        max_age_days = _setting("JOB_RETENTION_MAX_AGE_DAYS", 30)
+    if max_bytes is None:
+        max_bytes = _setting("JOB_RETENTION_MAX_BYTES", 50 * 1024 ** 3)
+    if min_age_hours is None:
+        min_age_hours = _setting("JOB_RETENTION_MIN_AGE_HOURS", 24)
+    archive_root = _setting("JOB_RETENTION_ARCHIVE_DIR", "")
+
+    now = time.time()
+    jobs = sorted(scan_jobs(), key=lambda j: j["mtime"])
+    total = sum(j["size"] for j in jobs)
+
+    expired = [j for j in jobs if now - j["mtime"] > max_age_days * 86400]
+    victims = {j["job_id"]: j for j in expired}
+    remaining = total - sum(j["size"] for j in expired)
+    for job in jobs:
+        if remaining <= max_bytes:
+            break
+        if job["job_id"] in victims or not job["finished"] or now - job["mtime"] < min_age_hours * 3600:
+            continue
+        victims[job["job_id"]] = job
+        remaining -= job["size"]
+
+    stats = {"scanned": len(jobs), "removed": 0, "freedBytes": 0, "totalBytes": total,
+             "expired": len(expired), "archivesRemoved": 0, "scheduledRowsRemoved": 0}
+    if dry_run:
+        stats["removed"] = len(victims)
+        stats["freedBytes"] = sum(j["size"] for j in victims.values())
+        stats["totalBytes"] = total - stats["freedBytes"]
+        return stats
+
+    for job in victims.values():
+        try:
+            archive_job(job["job_id"], job["job_dir"], job["finished"], archive_root)
+        except (OSError, tarfile.TarError) as e:
+            # keep the directory if its archive could not be written
+            _log(f"Could not archive job {job['job_id']}: {e}")
+            continue
+        _remove_job_dir(job["job_dir"])
+        stats["removed"] += 1
+        stats["freedBytes"] += job["size"]
+    stats["totalBytes"] = total - stats["freedBytes"]
+
+    if archive_root:
+        stats["archivesRemoved"] = _evict_archives(
+            archive_root, _setting("JOB_RETENTION_ARCHIVE_MAX_AGE_DAYS", 365) * 86400)
+
+    cutoff = timezone.now() - datetime.timedelta(days=max_age_days)
+    stats["scheduledRowsRemoved"], _ = ScheduledJob.objects.filter(
+        state__in=[ScheduledJob.STATE_DONE, ScheduledJob.STATE_FAILED], finished_at__lt=cutoff,
+    ).delete()
+    # a job still "processing" in the database whose directory is gone will never finish
+    PredictionJob.objects.filter(
+        status=PredictionJob.STATUS_PROCESSING, created_at__lt=cutoff,
+    ).update(status=PredictionJob.STATUS_FAILED, error="Job expired", completed_at=timezone.now())
+
+    _log(f"Swept {stats['removed']} job(s), freed {stats['freedBytes']} bytes, {stats['totalBytes']} bytes remain")
+    return stats
+
+
+def _run_locked():
+    """Sweep if no other process is sweeping and the last sweep is older than the interval."""
+    root = get_job_root()
+    interval = _setting("JOB_RETENTION_INTERVAL", 3600)
+    try:
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, STAMP_FILE), "a") as stamp:
+            try:
+                fcntl.flock(stamp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            try:
+                st = os.fstat(stamp.fileno())
+                if st.st_size and time.time() - st.st_mtime < interval:
+                    return
+                sweep()
+                stamp.truncate(0)
+                stamp.write(f"{timezone.now().isoformat()}\n")
+            finally:
+                fcntl.flock(stamp, fcntl.LOCK_UN)
+    except Exception as e:
+        _log(f"Sweep failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def maybe_sweep():
+    """Start a background sweep when one is due (JOB_RETENTION_INTERVAL <= 0 disables)."""
+    global _last_check, _sweep_thread
+    interval = _setting("JOB_RETENTION_INTERVAL", 3600)
+    now = time.monotonic()
+    if interval <= 0 or now - _last_check < min(interval, 60):
+        return
+    with _sweep_guard:
+        if _sweep_thread is not None and _sweep_thread.is_alive():
+            return
+        _last_check = now
+        _sweep_thread = threading.Thread(target=_run_locked, name="job-retention", daemon=True)
+        _sweep_thread.start()
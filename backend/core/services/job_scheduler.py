@@ -1,40 +1,387 @@
 # core/services/job_scheduler.py
+"""
+Durable job queue backed by the Django database (core.models.ScheduledJob).
 
+Replaces the per-process JOB_QUEUE list:
+  - jobs survive restarts and are shared by every gunicorn worker
+  - claims use SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL); on SQLite
+    writes are serialised by the database itself
+  - at most JOB_SCHEDULER_CONCURRENCY jobs run across all processes: a
+    running job holds a slot number, unique among running rows
+  - priority classes (interactive single predictions before bulk batches,
+    with JOB_SCHEDULER_INTERACTIVE_RESERVED slots bulk jobs cannot take)
+    and round-robin fairness across client keys within a class
+  - running jobs hold a lease renewed by a heartbeat; jobs whose lease
+    expired (crashed/restarted worker) are re-queued or failed
+  - a handler returning AWAIT_COMPLETION (pipeline submission) keeps its
+    slot after it returns, until the job's outcome is recorded
+    (release_job(), from prediction_results) or, as a backstop, until
+    JOB_SCHEDULER_PIPELINE_LEASE_SECONDS pass; so the slots limit the work
+    running on the pipeline, not just the submission POSTs
+
+Handlers are registered by name, since callables cannot be persisted:
+
+    @register_handler("pipeline_submit")
+    def submit_to_pipeline(job_id, payload): ...
+
+    schedule_job(job_id, "pipeline_submit", {...})
+
+Workers run in-process (started by CoreConfig.ready() when the web server
+is launched with JOB_SCHEDULER_IN_PROCESS=1) or in a dedicated
+`manage.py run_job_worker` process, and also trigger the job-directory
+retention sweep (core.services.job_retention) when it is due.
+"""
+
+import datetime
+import os
 import threading
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from core.models import ScheduledJob
+from core.services.submission_executor import QueueFull, get_submission_executor
+
+HANDLERS = {}   # name -> fn(job_id, payload)
+
+# handler return value: keep the slot until release_job() is called for the job
+AWAIT_COMPLETION = "await_completion"
+# lease owner of jobs handed off to the pipeline (no worker heartbeats them)
+PIPELINE_LEASE_OWNER = "pipeline"
+
+# clients considered per fairness decision (bounds the round-robin queries)
+FAIRNESS_CLIENT_WINDOW = 200
+
 
-JOB_RUNNING = False
-JOB_QUEUE = []   # list of (job_id, callback_fn)
+def register_handler(name):
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
 
 
-def schedule_job(job_id, callback):
-    global JOB_RUNNING
-    JOB_QUEUE.append((job_id, callback))
+def _setting(name, default):
+    return getattr(settings, name, default)
 
-    if not JOB_RUNNING:
-        _run_next_job()
 
+def _log(msg):
+    if _setting("DEBUG_LOG", False):
+        print(f"[SCHEDULER] {msg}")
 
-def _run_next_job():
-    global JOB_RUNNING
 
-    if not JOB_QUEUE:
-        JOB_RUNNING = False
-        return
+# ----------------------------------------------------------------------
+# Queue operations
+# ----------------------------------------------------------------------
 
-    JOB_RUNNING = True
-    job_id, callback = JOB_QUEUE[0]
+def schedule_job(job_id, handler, payload=None, max_attempts=1,
+                 priority=ScheduledJob.PRIORITY_INTERACTIVE, client_key=""):
+    """Persist a job for handler. Raises QueueFull when too many jobs are pending."""
+    if handler not in HANDLERS:
+        raise ValueError(f"Unknown job handler: {handler}")
 
-    thread = threading.Thread(target=_execute_job, args=(job_id, callback))
-    thread.start()
+    max_pending = _setting("JOB_SCHEDULER_MAX_PENDING", 1000)
+    if ScheduledJob.objects.filter(state=ScheduledJob.STATE_QUEUED).count() >= max_pending:
+        raise QueueFull(f"Job queue is full ({max_pending} pending jobs)")
 
+    job = ScheduledJob.objects.create(
+        job_id=job_id, handler=handler, payload=payload or {}, max_attempts=max(1, max_attempts),
+        priority=priority, client_key=client_key[:100],
+    )
+    if _worker is not None:
+        _worker.wake()
+    return job
 
-def _execute_job(job_id, callback):
-    global JOB_RUNNING, JOB_QUEUE
 
+def recover_expired_leases():
+    """Re-queue (or fail) running jobs whose lease ran out. Returns the number of rows touched."""
+    now = timezone.now()
+    expired = ScheduledJob.objects.filter(state=ScheduledJob.STATE_RUNNING, lease_expires_at__lt=now)
+    touched = 0
+    for job in expired.only("id", "attempts", "max_attempts", "lease_owner"):
+        if job.lease_owner == PIPELINE_LEASE_OWNER:
+            # submitted, but no outcome was recorded in time: free the slot, don't resubmit
+            touched += ScheduledJob.objects.filter(
+                pk=job.pk, state=ScheduledJob.STATE_RUNNING, lease_expires_at__lt=now,
+            ).update(
+                state=ScheduledJob.STATE_FAILED, slot=None, lease_owner=None, lease_expires_at=None,
+                error="No outcome recorded before the pipeline lease expired", finished_at=now,
+            )
+            continue
+        retry = job.attempts < job.max_attempts
+        touched += ScheduledJob.objects.filter(
+            pk=job.pk, state=ScheduledJob.STATE_RUNNING, lease_expires_at__lt=now,
+        ).update(
+            state=ScheduledJob.STATE_QUEUED if retry else ScheduledJob.STATE_FAILED,
+            slot=None, lease_owner=None, lease_expires_at=None,
+            error="Lease expired (worker stopped or lost)",
+            finished_at=None if retry else now,
+        )
+    if touched:
+        _log(f"Recovered {touched} job(s) with expired leases")
+    return touched
+
+
+def _fair_client(runnable, priority):
+    """
+    Round-robin across clients at one priority: the client with the fewest
+    running jobs wins, ties go to the client served least recently.
+    """
+    clients = list(
+        runnable.filter(priority=priority).values_list("client_key", flat=True).distinct()[:FAIRNESS_CLIENT_WINDOW]
+    )
+    if len(clients) == 1:
+        return clients[0]
+    running = dict(
+        ScheduledJob.objects.filter(state=ScheduledJob.STATE_RUNNING, client_key__in=clients)
+        .values("client_key").annotate(n=Count("id")).values_list("client_key", "n")
+    )
+    last_served = dict(
+        ScheduledJob.objects.filter(client_key__in=clients, started_at__isnull=False)
+        .values("client_key").annotate(last=Max("started_at")).values_list("client_key", "last")
+    )
+    now = timezone.now()
+    return min(clients, key=lambda c: (running.get(c, 0), c in last_served, last_served.get(c, now)))
+
+
+def claim_job(owner):
+    """
+    Claim the next runnable job into a free slot, or return None.
+    Order: priority class, then round-robin across client keys, then FIFO.
+    JOB_SCHEDULER_INTERACTIVE_RESERVED slots are kept free for interactive jobs.
+    """
+    concurrency = _setting("JOB_SCHEDULER_CONCURRENCY", 2)
+    reserved = min(_setting("JOB_SCHEDULER_INTERACTIVE_RESERVED", 1), concurrency - 1)
+    lease = datetime.timedelta(seconds=_setting("JOB_SCHEDULER_LEASE_SECONDS", 60))
+    now = timezone.now()
     try:
-        callback(job_id)
-    except Exception as e:
-        print(f"Job {job_id} failed:", e)
+        with transaction.atomic():
+            used = set(ScheduledJob.objects.filter(state=ScheduledJob.STATE_RUNNING).values_list("slot", flat=True))
+            free = [s for s in range(concurrency) if s not in used]
+            if not free:
+                return None
+
+            runnable = ScheduledJob.objects.filter(state=ScheduledJob.STATE_QUEUED, available_at__lte=now)
+            if len(free) <= reserved:
+                runnable = runnable.filter(priority__lte=ScheduledJob.PRIORITY_INTERACTIVE)
+            priority = runnable.order_by("priority").values_list("priority", flat=True).first()
+            if priority is None:
+                return None
+
+            job = (
+                runnable.select_for_update(skip_locked=True)
+                .filter(priority=priority, client_key=_fair_client(runnable, priority))
+                .order_by("available_at", "id")
+                .first()
+            )
+            if job is None:
+                return None
+            job.state = ScheduledJob.STATE_RUNNING
+            job.slot = free[0]
+            job.attempts += 1
+            job.lease_owner = owner
+            job.lease_expires_at = now + lease
+            job.started_at = now
+            job.save(update_fields=["state", "slot", "attempts", "lease_owner", "lease_expires_at", "started_at"])
+            return job
+    except IntegrityError:
+        # another process took the same slot first; try again on the next poll
+        return None
+
+
+def renew_lease(job, owner) -> bool:
+    lease = datetime.timedelta(seconds=_setting("JOB_SCHEDULER_LEASE_SECONDS", 60))
+    return ScheduledJob.objects.filter(
+        pk=job.pk, state=ScheduledJob.STATE_RUNNING, lease_owner=owner,
+    ).update(lease_expires_at=timezone.now() + lease) == 1
+
+
+def finish_job(job, owner, error=None):
+    """Mark a claimed job done, or re-queue/fail it after an error."""
+    now = timezone.now()
+    fields = {"slot": None, "lease_owner": None, "lease_expires_at": None, "error": error}
+    if error is None:
+        fields.update(state=ScheduledJob.STATE_DONE, finished_at=now)
+    elif job.attempts < job.max_attempts:
+        backoff = _setting("JOB_SCHEDULER_RETRY_DELAY", 10) * (2 ** (job.attempts - 1))
+        fields.update(state=ScheduledJob.STATE_QUEUED, available_at=now + datetime.timedelta(seconds=backoff))
+    else:
+        fields.update(state=ScheduledJob.STATE_FAILED, finished_at=now)
+    # only the lease holder may finish the job; a recovered job belongs to someone else now
+    ScheduledJob.objects.filter(pk=job.pk, state=ScheduledJob.STATE_RUNNING, lease_owner=owner).update(**fields)
+
+
+def hold_for_completion(job, owner):
+    """Hand a claimed job's slot over to the pipeline: it stays running until release_job()."""
+    lease = datetime.timedelta(seconds=_setting("JOB_SCHEDULER_PIPELINE_LEASE_SECONDS", 6 * 3600))
+    ScheduledJob.objects.filter(pk=job.pk, state=ScheduledJob.STATE_RUNNING, lease_owner=owner).update(
+        lease_owner=PIPELINE_LEASE_OWNER, lease_expires_at=timezone.now() + lease,
+    )
+
+
+def release_job(job_id, error=None):
+    """
+    Free the slot of a running job once its outcome is known (done, or failed
+    with error). Returns True if a slot was released. Matches any lease owner,
+    so an outcome recorded before the worker handed the job off still counts.
+    """
+    now = timezone.now()
+    released = ScheduledJob.objects.filter(job_id=job_id, state=ScheduledJob.STATE_RUNNING).update(
+        state=ScheduledJob.STATE_FAILED if error else ScheduledJob.STATE_DONE,
+        slot=None, lease_owner=None, lease_expires_at=None, error=error, finished_at=now,
+    ) > 0
+    if released and _worker is not None:
+        _worker.wake()
+    return released
+
+
+def queue_status(job_id):
+    """
+    Scheduler view of one job for status responses, or None if it was never queued:
+    state, priority, attempts, waitSeconds (queued -> started, or so far) and,
+    while queued, position (jobs that will be considered before it).
+    """
+    job = ScheduledJob.objects.filter(job_id=job_id).first()
+    if job is None:
+        return None
+    now = timezone.now()
+    started = job.started_at if job.state != ScheduledJob.STATE_QUEUED else None
+    info = {
+        "state": job.state,
+        "priority": job.get_priority_display().lower(),
+        "attempts": job.attempts,
+        "waitSeconds": round(((started or now) - job.created_at).total_seconds(), 1),
+    }
+    if job.state == ScheduledJob.STATE_QUEUED:
+        info["position"] = ScheduledJob.objects.filter(state=ScheduledJob.STATE_QUEUED).filter(
+            Q(priority__lt=job.priority) | Q(priority=job.priority, available_at__lt=job.available_at)
+        ).count()
+    return info
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+
+class JobWorker:
+    """Polls the queue and runs claimed jobs in threads (up to the global concurrency)."""
+
+    def __init__(self, poll_interval: float = 2.0, max_threads: int = 2):
+        self.owner = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.max_threads = max(1, max_threads)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._running = threading.Semaphore(self.max_threads)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        if self._thread:
+            return
+        with self._start_lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self.run_forever, name="job-worker", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Poll now instead of after poll_interval (no-op until the worker is started)."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_forever(self):
+        # imported here: job_retention -> prediction_results -> job_scheduler
+        from core.services.job_retention import maybe_sweep
+
+        _log(f"Worker {self.owner} started")
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                recover_expired_leases()
+                maybe_sweep()
+                while self._running.acquire(blocking=False):
+                    job = claim_job(self.owner)
+                    if job is None:
+                        self._running.release()
+                        break
+                    threading.Thread(target=self._execute, args=(job,), name=f"job-{job.job_id}", daemon=True).start()
+            except Exception as e:
+                _log(f"Poll failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _heartbeat(self, job, done):
+        interval = _setting("JOB_SCHEDULER_LEASE_SECONDS", 60) / 3
+        while not done.wait(interval):
+            try:
+                if not renew_lease(job, self.owner):
+                    _log(f"Lost lease on job {job.job_id}")
+                    return
+            except Exception as e:
+                _log(f"Heartbeat failed for job {job.job_id}: {e}")
+            finally:
+                close_old_connections()
+
+    def _execute(self, job):
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, done), daemon=True).start()
+        error = None
+        hold = False
+        try:
+            handler = HANDLERS.get(job.handler)
+            if handler is None:
+                raise ValueError(f"Unknown job handler: {job.handler}")
+            _log(f"Running job {job.job_id} ({job.handler}) in slot {job.slot}, attempt {job.attempts}")
+            hold = handler(job.job_id, job.payload) == AWAIT_COMPLETION
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            print(f"Job {job.job_id} failed:", e)
+        finally:
+            done.set()
+            try:
+                if hold:
+                    hold_for_completion(job, self.owner)
+                else:
+                    finish_job(job, self.owner, error)
+            finally:
+                close_old_connections()
+                self._running.release()
+                self._wake.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_job_worker() -> JobWorker:
+    """Return the per-process JobWorker configured from settings."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = JobWorker(
+                    poll_interval=_setting("JOB_SCHEDULER_POLL_INTERVAL", 2.0),
+                    max_threads=_setting("JOB_SCHEDULER_CONCURRENCY", 2),
+                )
+    return _worker
+
+
+# ----------------------------------------------------------------------
+# Handlers
+# ----------------------------------------------------------------------
 
-    JOB_QUEUE.pop(0)
-    _run_next_job()
+@register_handler("pipeline_submit")
+def submit_to_pipeline(job_id, payload):
+    """
+    POST the job CSV to the prediction pipeline (retries/backoff live in the
+    executor); the slot is held until the job's outcome is recorded.
+    """
+    if not get_submission_executor().run_submission(job_id, payload["csv_path"], payload["form_data"]):
+        raise RuntimeError("Pipeline submission failed")
+    return AWAIT_COMPLETION
@@ -0,0 +1,170 @@
+# core/services/media_manifest.py
+"""
+In-memory manifest of per-entry structure files under MEDIA_ROOT.
+
+Scans pdb_files/, sdf_files/ and smiles_2d/ once and answers "which files
+exist for this EvOlf ID, how big, how new" from memory, so views do not
+stat the (network-mounted) media directory on every request.
+
+Precompressed siblings (<file>.gz / <file>.br) are recorded with the file
+they belong to, so the media view can negotiate Content-Encoding without
+extra stats.
+
+Refresh is incremental: at most every MEDIA_MANIFEST_REFRESH_INTERVAL
+seconds each directory is stat'ed once and only directories whose mtime
+changed are rescanned. Every MEDIA_MANIFEST_FULL_RESCAN_INTERVAL seconds
+all directories are rescanned, to pick up files overwritten in place.
+Only the very first scan runs on a request; later refreshes run on a
+background thread while requests keep reading the current manifest, so no
+request waits behind a walk of the media tree.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+# encodings: {"br"|"gzip": absolute path of an up-to-date precompressed sibling}
+MediaFile = namedtuple("MediaFile", ["relpath", "path", "size", "mtime", "encodings"])
+
+# suffix of precompressed siblings (written by `manage.py compress_structures`) -> Content-Encoding
+PRECOMPRESSED_SUFFIXES = {".br": "br", ".gz": "gzip"}
+
+# kind -> (directory under MEDIA_ROOT, extension)
+MEDIA_DIRS = {
+    "pdb": ("pdb_files", ".pdb"),
+    "pdb_legacy": ("pdf_files", ".pdb"),   # older deployments used this folder name
+    "sdf": ("sdf_files", ".sdf"),
+    "png": ("smiles_2d", ".png"),
+    "arrays": ("pdb_arrays", ".npz"),      # <id>.npz and <id>.ca.npz (see structure_arrays)
+}
+
+
+class MediaManifest:
+    def __init__(self, media_root: str, refresh_interval: float = 60.0, full_rescan_interval: float = 3600.0):
+        self.media_root = str(media_root)
+        self.refresh_interval = refresh_interval
+        self.full_rescan_interval = full_rescan_interval
+        self._files = {kind: {} for kind in MEDIA_DIRS}   # kind -> {evolf_id: MediaFile}
+        self._dir_mtimes = {}                             # kind -> directory mtime_ns
+        self._checked_at = None
+        self._full_scan_at = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._refresh_thread_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------
+
+    def _scan_dir(self, kind):
+        folder, ext = MEDIA_DIRS[kind]
+        files = {}
+        siblings = {}   # evolf_id -> [(encoding, path, mtime)]
+        try:
+            with os.scandir(os.path.join(self.media_root, folder)) as it:
+                for entry in it:
+                    name, encoding = entry.name, None
+                    for suffix, enc in PRECOMPRESSED_SUFFIXES.items():
+                        if name.endswith(suffix):
+                            name, encoding = name[: -len(suffix)], enc
+                            break
+                    if not name.endswith(ext):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    evolf_id = name[: -len(ext)]
+                    if encoding:
+                        siblings.setdefault(evolf_id, []).append((encoding, entry.path, st.st_mtime))
+                    else:
+                        files[evolf_id] = MediaFile(f"{folder}/{entry.name}", entry.path, st.st_size, st.st_mtime, {})
+        except OSError:
+            pass
+
+        # attach precompressed variants that are not older than their source
+        for evolf_id, variants in siblings.items():
+            media_file = files.get(evolf_id)
+            if media_file:
+                for encoding, path, mtime in variants:
+                    if mtime >= media_file.mtime:
+                        media_file.encodings[encoding] = path
+
+        self._files[kind] = files
+
+    def refresh(self, force: bool = False):
+        """Rescan changed directories (or all of them when force/full-rescan is due)."""
+        now = time.monotonic()
+        with self._lock:
+            full = force or self._full_scan_at is None or now - self._full_scan_at >= self.full_rescan_interval
+            for kind, (folder, _) in MEDIA_DIRS.items():
+                try:
+                    dir_mtime = os.stat(os.path.join(self.media_root, folder)).st_mtime_ns
+                except OSError:
+                    dir_mtime = None
+                if full or dir_mtime != self._dir_mtimes.get(kind):
+                    self._scan_dir(kind)
+                    self._dir_mtimes[kind] = dir_mtime
+            if full:
+                self._full_scan_at = now
+            self._checked_at = now
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:   # keep serving the current manifest
+            print(f"Media manifest refresh failed: {e}")
+
+    def refresh_in_background(self):
+        """Start refresh() on a thread unless one is already running."""
+        with self._refresh_thread_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh_quietly, name="media-manifest", daemon=True)
+            self._refresh_thread.start()
+
+    def _ensure_fresh(self):
+        checked_at = self._checked_at
+        if checked_at is None:
+            self.refresh()   # nothing to serve yet
+        elif time.monotonic() - checked_at >= self.refresh_interval:
+            self.refresh_in_background()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get(self, evolf_id, kind, fallback=True):
+        """MediaFile for one kind ("pdb", "sdf", "png"), or None. "pdb" falls back to pdf_files/."""
+        self._ensure_fresh()
+        found = self._files[kind].get(evolf_id)
+        if found is None and kind == "pdb" and fallback:
+            found = self._files["pdb_legacy"].get(evolf_id)
+        return found
+
+    def lookup(self, evolf_id):
+        """{"pdb": MediaFile|None, "sdf": ..., "png": ...} for one EvOlf ID."""
+        return {kind: self.get(evolf_id, kind) for kind in ("pdb", "sdf", "png")}
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_media_manifest() -> MediaManifest:
+    """Return the per-process MediaManifest for MEDIA_ROOT."""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = MediaManifest(
+                    settings.MEDIA_ROOT,
+                    refresh_interval=float(getattr(settings, "MEDIA_MANIFEST_REFRESH_INTERVAL", 60)),
+                    full_rescan_interval=float(getattr(settings, "MEDIA_MANIFEST_FULL_RESCAN_INTERVAL", 3600)),
+                )
+    return _manifest
@@ -0,0 +1,370 @@
+# core/services/prediction_results.py
+"""
+Prediction job outcomes recorded in the database.
+
+The pipeline calls the completion webhook (or `manage.py watch_job_outputs`
+stands in for it); record_completion() then parses output/ and the input
+CSV once into PredictionJob / PredictionResult rows, and job status becomes
+an indexed row lookup instead of a directory walk plus CSV parse per poll.
+"""
+
+import csv
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import PredictionJob, PredictionResult
+from core.services import result_cache
+from core.services.job_paths import resolve_job_dir
+from core.services.job_scheduler import release_job
+from core.services.screening_jobs import count_screen_rows, is_screening_job, iter_screen_rows
+from core.services.submission_executor import read_submission_state
+
+OUTPUT_FILENAME = result_cache.OUTPUT_FILENAME
+# Optional marker the pipeline may write into output/ once every output file is in place
+OUTPUT_SENTINEL = "_SUCCESS"
+# Without the marker, Prediction_Output.csv is only counted once it has not changed for this long
+OUTPUT_SETTLE_SECONDS = 2.0
+
+# Deduplicated batch jobs: the pipeline input holds each (ligand, receptor)
+# pair once; REQUEST_FILENAME keeps every submitted row, and rows repeating
+# an earlier pair name that row's ID in PIPELINE_ID_COLUMN.
+REQUEST_FILENAME = "request.csv"
+PIPELINE_ID_COLUMN = "Pipeline_ID"
+
+LABELS = {"1": "Agonist (1)", "0": "Non-Agonist (0)"}
+
+# rows per bulk insert while recording a job
+RESULT_BATCH_SIZE = 2000
+
+# column order of result downloads
+EXPORT_COLUMNS = [
+    ("row_id", "ID"),
+    ("temp_ligand_id", "Temp_Ligand_ID"),
+    ("smiles", "SMILES"),
+    ("mutated_sequence", "Mutated_Sequence"),
+    ("temp_rec_id", "TempRecID"),
+    ("predicted_label", "Predicted Label"),
+    ("p1", "P1"),
+]
+
+
+def display_label(raw: str) -> str:
+    """Convert 1 to "Agonist (1)" and 0 to "Non-Agonist (0)"; other values are kept as is."""
+    return LABELS.get(raw, raw)
+
+
+def parse_label_filter(value: str):
+    """Raw label for a ?predicted_label= filter ("1", "agonist", "Agonist (1)", ...), or None for no filter."""
+    value = (value or "").strip().lower()
+    if not value:
+        return None
+    for raw, label in LABELS.items():
+        if value in (raw, label.lower(), label.split(" (")[0].lower()):
+            return raw
+    return value
+
+
+def prediction_dict(r) -> dict:
+    """Status-response entry for a result row (model instance or iter_job_results dict)."""
+    get = r.get if isinstance(r, dict) else lambda k: getattr(r, k)
+    return {
+        "id": get("row_id"),
+        "temp_ligand_id": get("temp_ligand_id"),
+        "smiles": get("smiles"),
+        "mutated_sequence": get("mutated_sequence"),
+        "temp_rec_id": get("temp_rec_id"),
+        "predicted_label": display_label(get("predicted_label")),
+        "p1": get("p1"),
+    }
+
+
+def pagination(page: int, limit: int, total: int) -> dict:
+    return {"page": page, "limit": limit, "total": total, "pages": (total + limit - 1) // limit if limit else 0}
+
+
+def register_job(job_id: str) -> PredictionJob:
+    job, _ = PredictionJob.objects.get_or_create(job_id=job_id)
+    return job
+
+
+def _iter_csv(path: str):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _input_csv(job_dir: str, job_id: str):
+    input_dir = os.path.join(job_dir, "input")
+    if os.path.isdir(input_dir):
+        for fn in sorted(os.listdir(input_dir)):
+            if fn.endswith(".csv"):
+                return os.path.join(input_dir, fn)
+    fallback = os.path.join(job_dir, f"{job_id}.csv")
+    return fallback if os.path.isfile(fallback) else None
+
+
+def _list_output_files(job_dir: str) -> list:
+    output_files = []
+    for root, _, filenames in os.walk(os.path.join(job_dir, "output")):
+        for fn in filenames:
+            output_files.append(os.path.relpath(os.path.join(root, fn), job_dir))
+    return sorted(output_files)
+
+
+def _count_rows(path: str) -> int:
+    return sum(1 for _ in _iter_csv(path))
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+# path -> ((mtime_ns, size), rows) for files counted by output_complete()
+_row_counts = {}
+_row_counts_lock = threading.Lock()
+ROW_COUNT_CACHE_SIZE = 1024
+
+
+def _cached_count(path: str, signature, count):
+    """Row count of path at signature, calling count() only when it changed since the last call."""
+    with _row_counts_lock:
+        cached = _row_counts.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    rows = count()
+    with _row_counts_lock:
+        _row_counts.pop(path, None)
+        _row_counts[path] = (signature, rows)
+        while len(_row_counts) > ROW_COUNT_CACHE_SIZE:
+            _row_counts.pop(next(iter(_row_counts)))
+    return rows
+
+
+def expected_rows(job_dir: str, job_id: str):
+    """
+    Rows the pipeline writes for this job: one per row of its input CSV,
+    or per expanded pair for screening jobs. None without an input CSV.
+    Counted once at submission and kept in submission.json (expectedRows).
+    """
+    input_csv = _input_csv(job_dir, job_id)
+    if not input_csv:
+        return None
+    if is_screening_job(job_dir):
+        return count_screen_rows(job_dir, _iter_csv(input_csv))
+    return _count_rows(input_csv)
+
+
+def output_complete(job_dir: str, job_id: str) -> bool:
+    """
+    Whether the pipeline has finished writing output/: the OUTPUT_SENTINEL
+    marker exists, or Prediction_Output.csv ends with a complete line, has
+    not changed for OUTPUT_SETTLE_SECONDS and has the expectedRows recorded
+    at submission. Files merely appearing in output/ are not enough; a poll
+    landing mid-write must not record a truncated result set. Polls only
+    stat the output; it is counted once per (mtime, size) it settles at.
+    """
+    if os.path.isfile(os.path.join(job_dir, "output", OUTPUT_SENTINEL)):
+        return True
+    output_csv = os.path.join(job_dir, "output", OUTPUT_FILENAME)
+    try:
+        st = os.stat(output_csv)
+        if time.time() - st.st_mtime < OUTPUT_SETTLE_SECONDS or not _ends_with_newline(output_csv):
+            return False
+
+        expected = (read_submission_state(job_dir) or {}).get("expectedRows")
+        if expected is None:
+            # submitted before expectedRows was recorded: count the (unchanging) input once
+            input_csv = _input_csv(job_dir, job_id)
+            if not input_csv:
+                return False
+            in_st = os.stat(input_csv)
+            expected = _cached_count(input_csv, (in_st.st_mtime_ns, in_st.st_size),
+                                     lambda: expected_rows(job_dir, job_id))
+        rows = _cached_count(output_csv, (st.st_mtime_ns, st.st_size), lambda: _count_rows(output_csv))
+        return rows >= expected
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return False
+
+
+def _reused_ids(request_csv: str) -> set:
+    """IDs of pipeline rows that later request rows repeat (their outputs are kept while joining)."""
+    return {
+        (row.get(PIPELINE_ID_COLUMN) or "").strip()
+        for row in _iter_csv(request_csv)
+        if (row.get(PIPELINE_ID_COLUMN) or "").strip()
+    }
+
+
+def iter_job_results(job_dir: str, job_id: str):
+    """
+    Stream input rows joined with their Prediction_Output.csv rows, one dict
+    of PredictionResult fields per input row with an ID.
+
+    Rows are joined on the ID column; output rows read ahead of their input
+    row are held until it arrives, so outputs in input order (the pipeline's
+    normal case) need O(1) memory. Outputs without an ID column pair by position.
+    For deduplicated jobs the submitted rows (REQUEST_FILENAME) are joined
+    instead; a repeated pair reuses the output of the row it repeats.
+    Screening jobs join the lazily expanded pair table.
+    """
+    input_csv = _input_csv(job_dir, job_id)
+    if not input_csv:
+        return
+    request_csv = os.path.join(job_dir, REQUEST_FILENAME)
+    deduplicated = os.path.isfile(request_csv)
+    reused = _reused_ids(request_csv) if deduplicated else set()
+    kept = {}         # outputs of pipeline rows in `reused`
+
+    output_csv = os.path.join(job_dir, "output", OUTPUT_FILENAME)
+    outputs = _iter_csv(output_csv) if os.path.isfile(output_csv) else iter(())
+    ahead = {}        # output rows whose input row has not been reached yet
+    by_id = None      # decided from the first output row
+
+    if is_screening_job(job_dir):
+        rows = iter_screen_rows(job_dir, _iter_csv(input_csv))
+    else:
+        rows = _iter_csv(request_csv if deduplicated else input_csv)
+
+    for position, row in enumerate(rows):
+        row_id = (row.get("ID") or "").strip()
+        if not row_id:
+            continue
+        pipeline_id = (row.get(PIPELINE_ID_COLUMN) or "").strip() if deduplicated else ""
+        if pipeline_id:
+            yield _result_fields(position, row_id, row, kept.get(pipeline_id) or {})
+            continue
+        out = ahead.pop(row_id, None)
+        if out is None:
+            for candidate in outputs:
+                if by_id is None:
+                    by_id = "ID" in candidate
+                if not by_id:
+                    out = candidate
+                    break
+                candidate_id = (candidate.get("ID") or "").strip()
+                if candidate_id == row_id:
+                    out = candidate
+                    break
+                ahead[candidate_id] = candidate
+        out = out or {}
+        if row_id in reused:
+            kept[row_id] = out
+        yield _result_fields(position, row_id, row, out)
+
+
+def _result_fields(position: int, row_id: str, row: dict, out: dict) -> dict:
+    return {
+        "position": position,
+        "row_id": row_id,
+        "temp_ligand_id": (row.get("Temp_Ligand_ID") or "").strip(),
+        "smiles": (row.get("SMILES") or "").strip(),
+        "mutated_sequence": (row.get("Mutated_Sequence") or "").strip(),
+        "temp_rec_id": (row.get("TempRecID") or "").strip(),
+        "predicted_label": (out.get("Predicted Label") or "").strip(),
+        "p1": (out.get("P1") or "").strip(),
+    }
+
+
+def record_completion(job_id: str, job_dir: str) -> PredictionJob:
+    """
+    Parse a finished job's files once into the database (idempotent). Callers
+    other than the pipeline callback check output_complete() first: the job
+    is FINISHED for good afterwards.
+    """
+    job = register_job(job_id)
+    if job.status == PredictionJob.STATUS_FINISHED:
+        return job
+
+    with transaction.atomic():
+        job = PredictionJob.objects.select_for_update().get(pk=job.pk)
+        if job.status == PredictionJob.STATUS_FINISHED:
+            return job
+        job.results.all().delete()
+        row_count = 0
+        batch = []
+        for fields in iter_job_results(job_dir, job_id):
+            batch.append(PredictionResult(job=job, **fields))
+            if len(batch) >= RESULT_BATCH_SIZE:
+                PredictionResult.objects.bulk_create(batch)
+                row_count += len(batch)
+                batch = []
+        PredictionResult.objects.bulk_create(batch)
+        row_count += len(batch)
+        job.status = PredictionJob.STATUS_FINISHED
+        job.row_count = row_count
+        job.output_files = _list_output_files(job_dir)
+        job.error = None
+        job.completed_at = timezone.now()
+        job.save(update_fields=["status", "row_count", "output_files", "error", "completed_at"])
+
+    submission = read_submission_state(job_dir)
+    if getattr(settings, "RESULT_CACHE_ENABLED", False):
+        try:
+            result_cache.cache_job_output(job_dir, submission)
+        except OSError as e:
+            print(f"Error caching prediction result: {e}")
+    result_cache.release_job_inflight(submission, job_id)
+    # the job's scheduler slot was held while the pipeline worked on it
+    release_job(job_id)
+    return job
+
+
+def record_failure(job_id: str, error: str) -> PredictionJob:
+    job = register_job(job_id)
+    PredictionJob.objects.filter(pk=job.pk).exclude(status=PredictionJob.STATUS_FINISHED).update(
+        status=PredictionJob.STATUS_FAILED, error=error, completed_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    # identical requests must not keep coalescing onto the failed job
+    job_dir = resolve_job_dir(job_id)
+    if job_dir is not None:
+        result_cache.release_job_inflight(read_submission_state(job_dir), job_id)
+    release_job(job_id, error)
+    return job
+
+
+def job_payload(job: PredictionJob, page: int = 1, limit: int = 100, label: str = None) -> dict:
+    """
+    Job-status body for a recorded job (same shape as the filesystem-based
+    response), with one page of predictions optionally filtered by raw label.
+    """
+    timings = {
+        "createdAt": job.created_at.isoformat() if job.created_at else None,
+        "completedAt": job.completed_at.isoformat() if job.completed_at else None,
+        "durationSeconds": (
+            round((job.completed_at - job.created_at).total_seconds(), 1)
+            if job.completed_at and job.created_at else None
+        ),
+    }
+    if job.status == PredictionJob.STATUS_FAILED:
+        return {
+            "job_id": job.job_id,
+            "status": "failed",
+            "message": "Prediction pipeline reported a failure",
+            "error": job.error,
+            "timings": timings,
+        }
+
+    results = job.results.all()
+    total = job.row_count
+    if label is not None:
+        results = results.filter(predicted_label=label)
+        total = results.count()
+    offset = (page - 1) * limit
+    return {
+        "job_id": job.job_id,
+        "status": "finished",
+        "output_files": job.output_files,
+        "predictions": [prediction_dict(r) for r in results[offset:offset + limit]],
+        "pagination": pagination(page, limit, total),
+        "timings": timings,
+    }
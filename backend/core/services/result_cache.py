@@ -0,0 +1,285 @@
+# core/services/result_cache.py
+"""
+Content-addressed cache of single-pair prediction results.
+
+Key: sha256 of the normalised ligand SMILES and receptor sequence
+(canonical SMILES when RDKit is installed). Layout under RESULT_CACHE_DIR:
+
+    results/<key[:2]>/<key>.csv   cached Prediction_Output.csv
+    inflight/<flight key>         job_id of the pipeline run computing a request
+
+A hit is materialised into a fresh job's output/ so the usual job-status
+and download endpoints serve it. The inflight marker lets identical
+concurrent requests coalesce onto one pending job: it is created with its
+job_id already in it (os.link of a temp file, which fails if a marker
+exists, so it works across processes), and taking over a stale marker or
+releasing one happens under an flock on inflight/.lock. Its key
+(inflight_key()) also covers the caller's job CSV, so only requests with
+the same row / ligand / receptor IDs coalesce and every caller sees its
+own labels. The marker is released when the job's outcome is recorded,
+finished or failed (release_job_inflight()). Entries are evicted by age
+and total size (`manage.py prune_result_cache`, and opportunistically
+after stores).
+"""
+
+import contextlib
+import csv
+import fcntl
+import hashlib
+import io
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    from rdkit import Chem, RDLogger
+    RDLogger.DisableLog("rdApp.*")
+    RDKIT_AVAILABLE = True
+except ImportError:
+    RDKIT_AVAILABLE = False
+
+KEY_VERSION = "v1"
+OUTPUT_FILENAME = "Prediction_Output.csv"
+
+_last_evict = 0.0
+_evict_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_cache_dir() -> str:
+    return _setting("RESULT_CACHE_DIR", "") or os.path.join(_setting("JOB_DATA_DIR", "/data"), "_result_cache")
+
+
+# ----------------------------------------------------------------------
+# Keys
+# ----------------------------------------------------------------------
+
+def normalize_smiles(smiles: str) -> str:
+    smiles = (smiles or "").strip()
+    if RDKIT_AVAILABLE and smiles:
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is not None:
+            return Chem.MolToSmiles(mol, canonical=True)
+    return smiles
+
+
+def normalize_sequence(sequence: str) -> str:
+    return "".join((sequence or "").split()).upper()
+
+
+def cache_key(smiles: str, receptor_seq: str) -> str:
+    payload = f"{KEY_VERSION}\n{normalize_smiles(smiles)}\n{normalize_sequence(receptor_seq)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def inflight_key(key: str, job_input: bytes) -> str:
+    """Coalescing key: the result key plus the caller's job CSV (IDs and column names)."""
+    return hashlib.sha256(key.encode("utf-8") + b"\n" + job_input).hexdigest()
+
+
+def _result_path(key: str) -> str:
+    return os.path.join(get_cache_dir(), "results", key[:2], f"{key}.csv")
+
+
+def _inflight_path(key: str) -> str:
+    return os.path.join(get_cache_dir(), "inflight", key)
+
+
+# ----------------------------------------------------------------------
+# Results
+# ----------------------------------------------------------------------
+
+def lookup(key: str):
+    """Path of the cached output for key, or None. Refreshes its mtime (LRU)."""
+    path = _result_path(key)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def store_result(key: str, output_csv: str):
+    """Copy a finished job's Prediction_Output.csv into the cache."""
+    path = _result_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(output_csv, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(src.read())
+    os.replace(tmp, path)
+    _maybe_evict()
+    return path
+
+
+def cache_job_output(job_dir: str, submission: dict):
+    """Store a finished job's output if it was submitted with a cacheKey and is not cached yet."""
+    submission = submission or {}
+    key = submission.get("cacheKey")
+    if not key or submission.get("state") == "cached" or lookup(key):
+        return None
+    output_csv = os.path.join(job_dir, "output", OUTPUT_FILENAME)
+    if not os.path.isfile(output_csv):
+        return None
+    return store_result(key, output_csv)
+
+
+def materialize(key: str, job_dir: str, row_id: str, id_column: str = "ID") -> str:
+    """
+    Write the cached output into <job_dir>/output/ for a new job.
+    The row ID column is rewritten to this job's ID (outputs are single-row).
+    """
+    with open(_result_path(key), "r", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    if rows and id_column in rows[0]:
+        col = rows[0].index(id_column)
+        for row in rows[1:]:
+            if col < len(row):
+                row[col] = row_id
+
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+
+    output_dir = os.path.join(job_dir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, OUTPUT_FILENAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, path)
+    return path
+
+
+# ----------------------------------------------------------------------
+# Single-flight
+# ----------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _inflight_lock():
+    """Exclusive lock (all processes) for replacing or removing existing markers."""
+    lock_path = os.path.join(get_cache_dir(), "inflight", ".lock")
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_marker(path: str):
+    """(job_id, age in seconds) of a marker, or (None, None) when there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            existing = f.read().strip()
+        return existing, time.time() - os.path.getmtime(path)
+    except OSError:
+        return None, None
+
+
+def claim_inflight(key: str, job_id: str):
+    """
+    Register job_id as the run computing key. Returns None when claimed, or
+    the job_id of an identical run already in flight. Markers older than
+    RESULT_CACHE_INFLIGHT_TTL seconds (crashed/abandoned runs) are taken over.
+    """
+    path = _inflight_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(job_id)
+    try:
+        try:
+            os.link(tmp, path)   # atomic create, already holding job_id
+            return None
+        except FileExistsError:
+            pass
+        # A marker exists. Check and take over under the lock, so two requests
+        # that both find it stale cannot both claim it.
+        with _inflight_lock():
+            existing, age = _read_marker(path)
+            if existing and age < _setting("RESULT_CACHE_INFLIGHT_TTL", 6 * 3600):
+                return existing
+            os.replace(tmp, path)
+            return None
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def release_inflight(key: str, job_id: str = None):
+    """Remove the inflight marker (only if it belongs to job_id, when given)."""
+    path = _inflight_path(key)
+    if not os.path.exists(path):
+        return
+    with _inflight_lock():
+        existing, _ = _read_marker(path)
+        if existing is None or (job_id is not None and existing != job_id):
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def release_job_inflight(submission: dict, job_id: str):
+    """Release the inflight marker a job was submitted under (submission.json inflightKey / cacheKey)."""
+    submission = submission or {}
+    flight = submission.get("inflightKey") or submission.get("cacheKey")
+    if flight:
+        release_inflight(flight, job_id)
+
+
+# ----------------------------------------------------------------------
+# Eviction
+# ----------------------------------------------------------------------
+
+def evict(max_age: float = None, max_bytes: int = None) -> dict:
+    """Drop results older than max_age seconds, then the least recently used until under max_bytes."""
+    if max_age is None:
+        max_age = _setting("RESULT_CACHE_MAX_AGE_DAYS", 30) * 86400
+    if max_bytes is None:
+        max_bytes = _setting("RESULT_CACHE_MAX_BYTES", 1024 ** 3)
+
+    entries = []
+    for root, _, files in os.walk(os.path.join(get_cache_dir(), "results")):
+        for fn in files:
+            path = os.path.join(root, fn)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+    now = time.time()
+    removed = freed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+        total -= size
+    return {"removed": removed, "freedBytes": freed, "remaining": len(entries) - removed, "totalBytes": total}
+
+
+def _maybe_evict():
+    global _last_evict
+    interval = _setting("RESULT_CACHE_EVICT_INTERVAL", 3600)
+    now = time.monotonic()
+    if now - _last_evict < interval or not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_evict = now
+        evict()
+    finally:
+        _evict_lock.release()
@@ -0,0 +1,173 @@
+# core/services/screening_jobs.py
+"""
+Screening jobs: M ligands against N receptors without an M x N job CSV.
+
+The single-row job format repeats the full SMILES and receptor sequence on
+every (ligand, receptor) row. A screening job instead writes each unique
+ligand once to ligands.csv (Temp_Ligand_ID, SMILES) and each unique receptor
+once to receptors.csv (TempRecID, Mutated_Sequence). IDs are content hashes,
+so a molecule or sequence gets the same ID in every job. The job input CSV is
+a pair table of (Temp_Ligand_ID, TempRecID) references. "*" in a column
+stands for the whole set, so a full screen is the single row "*,*". Job
+files therefore scale with M + N, and the pipeline (sent job_format=screen
+plus the two file names, read from the job directory it already writes
+output/ into) can featurise every ligand and receptor once.
+
+Pair rows are keyed ID = "<Temp_Ligand_ID>_<TempRecID>"; iter_screen_rows()
+expands the pair table lazily into the same row dicts as a single-row job
+CSV, ligand-major, for joining the pipeline output.
+
+Pipelines without the screen format (SCREEN_JOB_FORMAT_SUPPORTED off) get
+build_screening_job(..., expand=True): the same IDs, expanded into the
+legacy single-table job CSV (bounded by MAX_SCREEN_PAIRS in the view).
+"""
+
+import csv
+import hashlib
+import io
+import itertools
+import os
+
+from core.services.job_inputs import write_job_input
+
+LIGANDS_FILENAME = "ligands.csv"
+RECEPTORS_FILENAME = "receptors.csv"
+JOB_FORMAT = "screen"
+ALL = "*"
+
+LIGAND_ID_PREFIX = "lig_"
+RECEPTOR_ID_PREFIX = "TRec"
+# hex digits of sha256 kept in generated IDs
+ID_DIGEST_LENGTH = 16
+
+
+def content_id(prefix: str, value: str) -> str:
+    return prefix + hashlib.sha256(value.encode("utf-8")).hexdigest()[:ID_DIGEST_LENGTH]
+
+
+def ligand_id(smiles: str) -> str:
+    return content_id(LIGAND_ID_PREFIX, smiles)
+
+
+def receptor_id(sequence: str) -> str:
+    return content_id(RECEPTOR_ID_PREFIX, sequence)
+
+
+def pair_id(lig_id: str, rec_id: str) -> str:
+    return f"{lig_id}_{rec_id}"
+
+
+def is_screening_job(job_dir: str) -> bool:
+    return os.path.isfile(os.path.join(job_dir, LIGANDS_FILENAME))
+
+
+def _unique_by_id(values, make_id) -> dict:
+    """{content ID: value} in first-seen order; raises ValueError on a (practically impossible) hash collision."""
+    unique = {}
+    for value in values:
+        key = make_id(value)
+        if unique.setdefault(key, value) != value:
+            raise ValueError(f"Content ID collision for {key}")
+    return unique
+
+
+def _csv_bytes(header, rows) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def _expand(ligands: dict, receptors: dict, pair_rows):
+    """Single-row job dicts for (Temp_Ligand_ID, TempRecID) pairs over {ID: SMILES} / {ID: sequence} sets."""
+    for lig, rec in pair_rows:
+        lig_ids = ligands if lig == ALL else [lig]
+        rec_ids = receptors if rec == ALL else [rec]
+        for lig_key, rec_key in itertools.product(lig_ids, rec_ids):
+            yield {
+                "ID": pair_id(lig_key, rec_key),
+                "Temp_Ligand_ID": lig_key,
+                "SMILES": ligands.get(lig_key, ""),
+                "Mutated_Sequence": receptors.get(rec_key, ""),
+                "TempRecID": rec_key,
+            }
+
+
+def build_screening_job(job_id: str, ligands, receptors, pairs=None, expand: bool = False) -> dict:
+    """
+    Write a screening job's files from validated, stripped SMILES and receptor
+    sequences. pairs is None for the full cross product, else (ligand index,
+    receptor index) tuples into the given lists. Repeated ligands, receptors
+    and pairs are written once. With expand, the job is one legacy
+    ID/Temp_Ligand_ID/SMILES/Mutated_Sequence/TempRecID CSV instead.
+
+    Returns {"csv_path": job input, "ligands": M, "receptors": N, "pairs": unique pairs}.
+    """
+    unique_ligands = _unique_by_id(ligands, ligand_id)
+    unique_receptors = _unique_by_id(receptors, receptor_id)
+
+    if pairs is None:
+        pair_rows = [(ALL, ALL)]
+        pair_count = len(unique_ligands) * len(unique_receptors)
+    else:
+        pair_rows = list(dict.fromkeys(
+            (ligand_id(ligands[i]), receptor_id(receptors[j])) for i, j in pairs
+        ))
+        pair_count = len(pair_rows)
+
+    if expand:
+        header = ["ID", "Temp_Ligand_ID", "SMILES", "Mutated_Sequence", "TempRecID"]
+        rows = (
+            [row[column] for column in header]
+            for row in _expand(unique_ligands, unique_receptors, pair_rows)
+        )
+        csv_path = write_job_input(job_id, _csv_bytes(header, rows))
+    else:
+        write_job_input(job_id, _csv_bytes(["Temp_Ligand_ID", "SMILES"], unique_ligands.items()),
+                        filename=LIGANDS_FILENAME)
+        write_job_input(job_id, _csv_bytes(["TempRecID", "Mutated_Sequence"], unique_receptors.items()),
+                        filename=RECEPTORS_FILENAME)
+        # the pair table last: it is the job input the pipeline is sent
+        csv_path = write_job_input(job_id, _csv_bytes(["Temp_Ligand_ID", "TempRecID"], pair_rows))
+    return {
+        "csv_path": csv_path,
+        "ligands": len(unique_ligands),
+        "receptors": len(unique_receptors),
+        "pairs": pair_count,
+    }
+
+
+def _read_set(path: str, id_col: str, value_col: str) -> dict:
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return {
+            (row.get(id_col) or "").strip(): (row.get(value_col) or "").strip()
+            for row in csv.DictReader(f)
+        }
+
+
+def iter_screen_rows(job_dir: str, pair_rows):
+    """
+    Expand a screening job's pair table (an iterable of {Temp_Ligand_ID,
+    TempRecID} dicts) into single-row job dicts: ID, Temp_Ligand_ID, SMILES,
+    Mutated_Sequence, TempRecID. Only the two sets are held in memory.
+    """
+    ligands = _read_set(os.path.join(job_dir, LIGANDS_FILENAME), "Temp_Ligand_ID", "SMILES")
+    receptors = _read_set(os.path.join(job_dir, RECEPTORS_FILENAME), "TempRecID", "Mutated_Sequence")
+    pairs = (
+        ((pair.get("Temp_Ligand_ID") or "").strip(), (pair.get("TempRecID") or "").strip())
+        for pair in pair_rows
+    )
+    yield from _expand(ligands, receptors, pairs)
+
+
+def count_screen_rows(job_dir: str, pair_rows) -> int:
+    """Number of rows iter_screen_rows() yields, without expanding the pairs."""
+    ligands = _read_set(os.path.join(job_dir, LIGANDS_FILENAME), "Temp_Ligand_ID", "SMILES")
+    receptors = _read_set(os.path.join(job_dir, RECEPTORS_FILENAME), "TempRecID", "Mutated_Sequence")
+    total = 0
+    for pair in pair_rows:
+        lig = (pair.get("Temp_Ligand_ID") or "").strip()
+        rec = (pair.get("TempRecID") or "").strip()
+        total += (len(ligands) if lig == ALL else 1) * (len(receptors) if rec == ALL else 1)
+    return total
@@ -0,0 +1,133 @@
+# core/services/structure_arrays.py
+"""
+Compact binary coordinates for receptor structures.
+
+Each pdb_files/<id>.pdb is parsed once into NumPy arrays and stored as
+pdb_arrays/<id>.npz (all atoms) and pdb_arrays/<id>.ca.npz (CA-only
+backbone level of detail). The 3D viewer can load these directly instead
+of downloading and re-parsing the PDB text.
+
+Arrays in each .npz:
+  coords         float32 (N, 3)   Cartesian coordinates (Å)
+  element        uint8   (N,)     index into ELEMENTS (0 = unknown)
+  residue_index  int32   (N,)     0-based running residue index
+  residue_seq    int32   (N,)     PDB residue sequence number
+  residue_name   uint8   (N,)     index into RESIDUES (0 = unknown)
+  chain          uint8   (N,)     ASCII code of the chain identifier (0 = blank or non-ASCII)
+  hetero         bool    (N,)     True for HETATM records
+  is_ca          bool    (N,)     True for alpha-carbon atoms
+"""
+
+import os
+
+import numpy as np
+
+ARRAY_DIR = "pdb_arrays"
+FORMAT_VERSION = 1
+
+ELEMENTS = (
+    "", "H", "HE", "LI", "BE", "B", "C", "N", "O", "F", "NE", "NA", "MG", "AL", "SI", "P", "S",
+    "CL", "AR", "K", "CA", "MN", "FE", "CO", "NI", "CU", "ZN", "SE", "BR", "I",
+)
+RESIDUES = (
+    "", "ALA", "ARG", "ASN", "ASP", "CYS", "GLN", "GLU", "GLY", "HIS", "ILE",
+    "LEU", "LYS", "MET", "PHE", "PRO", "SER", "THR", "TRP", "TYR", "VAL", "HOH",
+)
+_ELEMENT_CODES = {e: i for i, e in enumerate(ELEMENTS)}
+_RESIDUE_CODES = {r: i for i, r in enumerate(RESIDUES)}
+
+
+def _element_code(line: str) -> int:
+    element = line[76:78].strip().upper()
+    if not element:
+        # Fall back to the atom name (columns 13-14), e.g. " CA " -> C, "FE  " -> FE
+        name = line[12:16]
+        element = name[:2].strip().upper() if name[0] != " " else name[1].upper()
+    return _ELEMENT_CODES.get(element, 0)
+
+
+def _chain_code(chain_id: str) -> int:
+    """ASCII code of a chain identifier; blank and non-ASCII identifiers (which do not fit the uint8 array) map to 0."""
+    code = ord(chain_id)
+    return code if chain_id.strip() and code < 128 else 0
+
+
+def parse_pdb(text: str) -> dict:
+    """Parse ATOM/HETATM records (first model only) into the arrays described above."""
+    coords, element, residue_index, residue_seq, residue_name, chain, hetero, is_ca = [], [], [], [], [], [], [], []
+    last_residue = None
+    res_idx = -1
+
+    for line in text.splitlines():
+        record = line[:6]
+        if record == "ENDMDL":
+            break
+        if record not in ("ATOM  ", "HETATM"):
+            continue
+        try:
+            x, y, z = float(line[30:38]), float(line[38:46]), float(line[46:54])
+            seq = int(line[22:26])
+        except ValueError:
+            continue
+
+        residue_key = (line[21], seq, line[26], line[17:20])
+        if residue_key != last_residue:
+            res_idx += 1
+            last_residue = residue_key
+
+        coords.append((x, y, z))
+        element.append(_element_code(line))
+        residue_index.append(res_idx)
+        residue_seq.append(seq)
+        residue_name.append(_RESIDUE_CODES.get(line[17:20].strip(), 0))
+        chain.append(_chain_code(line[21]))
+        hetero.append(record == "HETATM")
+        is_ca.append(line[12:16].strip() == "CA" and line[76:78].strip().upper() in ("", "C"))
+
+    return {
+        "coords": np.asarray(coords, dtype=np.float32).reshape(-1, 3),
+        "element": np.asarray(element, dtype=np.uint8),
+        "residue_index": np.asarray(residue_index, dtype=np.int32),
+        "residue_seq": np.asarray(residue_seq, dtype=np.int32),
+        "residue_name": np.asarray(residue_name, dtype=np.uint8),
+        "chain": np.asarray(chain, dtype=np.uint8),
+        "hetero": np.asarray(hetero, dtype=bool),
+        "is_ca": np.asarray(is_ca, dtype=bool),
+    }
+
+
+def select_atoms(arrays: dict, mask) -> dict:
+    return {key: value[mask] for key, value in arrays.items()}
+
+
+def ca_level_of_detail(arrays: dict) -> dict:
+    """CA-only backbone: one atom per amino-acid residue."""
+    return select_atoms(arrays, arrays["is_ca"] & ~arrays["hetero"])
+
+
+def array_paths(media_root: str, evolf_id: str) -> dict:
+    base = os.path.join(media_root, ARRAY_DIR, evolf_id)
+    return {"full": f"{base}.npz", "ca": f"{base}.ca.npz"}
+
+
+def convert_pdb(pdb_path: str, media_root: str, evolf_id: str) -> dict:
+    """Write the full and CA-only .npz files for one PDB. Returns {"full": n_atoms, "ca": n_atoms}."""
+    with open(pdb_path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+
+    arrays = parse_pdb(text)
+    ca = ca_level_of_detail(arrays)
+
+    paths = array_paths(media_root, evolf_id)
+    os.makedirs(os.path.dirname(paths["full"]), exist_ok=True)
+    for lod, data in (("full", arrays), ("ca", ca)):
+        tmp = f"{paths[lod]}.tmp-{os.getpid()}.npz"
+        np.savez_compressed(tmp, version=np.uint8(FORMAT_VERSION), **data)
+        os.replace(tmp, paths[lod])
+
+    return {"full": len(arrays["coords"]), "ca": len(ca["coords"])}
+
+
+def load_arrays(path: str) -> dict:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
@@ -0,0 +1,196 @@
+# core/services/submission_executor.py
+"""
+Shared worker pool that hands job CSVs to the prediction pipeline.
+
+Replaces the thread-per-request submission:
+  - SUBMIT_POOL_SIZE worker threads share one keep-alive requests.Session
+  - a bounded queue (SUBMIT_QUEUE_SIZE); submit() raises QueueFull when it is full
+  - exponential backoff with jitter on connection errors, timeouts, 429 and 5xx
+  - per-job state persisted to <job_dir>/submission.json
+    (queued -> submitting -> submitted | failed)
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from core.services.job_inputs import ensure_durable
+
+STATE_FILE = "submission.json"
+
+STATE_QUEUED = "queued"
+STATE_SUBMITTING = "submitting"
+STATE_SUBMITTED = "submitted"
+STATE_FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """The submission queue is at capacity; the caller should ask the client to retry later."""
+
+
+class PermanentSubmissionError(Exception):
+    """The pipeline rejected the job with a non-retryable status."""
+
+
+# ----------------------------------------------------------------------
+# Persisted state
+# ----------------------------------------------------------------------
+
+def read_submission_state(job_dir: str):
+    try:
+        with open(os.path.join(job_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_submission_state(job_dir: str, **fields):
+    """Merge fields into <job_dir>/submission.json (atomic replace)."""
+    state = read_submission_state(job_dir) or {}
+    state.update(fields)
+    state["updatedAt"] = datetime.datetime.utcnow().isoformat() + "Z"
+
+    path = os.path.join(job_dir, STATE_FILE)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return state
+
+
+# ----------------------------------------------------------------------
+# Executor
+# ----------------------------------------------------------------------
+
+class SubmissionExecutor:
+    def __init__(self, pipeline_url: str, pool_size: int = 4, queue_size: int = 100, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, timeout: float = 30.0, debug: bool = False):
+        self.pipeline_url = pipeline_url
+        self.pool_size = max(1, pool_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.debug = debug
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._workers = []
+        self._start_lock = threading.Lock()
+
+    def _log(self, msg):
+        if self.debug:
+            print(f"[SUBMIT] {msg}")
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        with self._start_lock:
+            if self._workers:
+                return
+            for i in range(self.pool_size):
+                t = threading.Thread(target=self._worker, name=f"pipeline-submit-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, job_id: str, csv_path: str, form_data: dict):
+        """Queue a job for submission. Raises QueueFull when the queue is at capacity."""
+        self._ensure_workers()
+        # state first: a worker may pick the job up as soon as it is queued
+        write_submission_state(os.path.dirname(csv_path), state=STATE_QUEUED, attempts=0, jobId=job_id)
+        try:
+            self._queue.put_nowait((job_id, csv_path, form_data))
+        except queue.Full:
+            raise QueueFull(f"Submission queue is full ({self._queue.maxsize} jobs)")
+
+    def _worker(self):
+        while True:
+            job_id, csv_path, form_data = self._queue.get()
+            try:
+                self.run_submission(job_id, csv_path, form_data)
+            except Exception as e:  # never let a worker die
+                self._log(f"Unexpected error for job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _post(self, csv_path: str, form_data: dict):
+        with open(csv_path, "rb") as fh:
+            files = {"input_file": (os.path.basename(csv_path), fh, "text/csv")}
+            resp = self._session.post(self.pipeline_url, data=form_data, files=files, timeout=self.timeout)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise requests.HTTPError(f"Pipeline responded {resp.status_code}", response=resp)
+        if resp.status_code >= 400:
+            raise PermanentSubmissionError(f"Pipeline rejected job with {resp.status_code}")
+        return resp
+
+    def run_submission(self, job_id: str, csv_path: str, form_data: dict) -> bool:
+        """Make the input durable, then submit with retries; persists state. Returns True on success."""
+        job_dir = os.path.dirname(csv_path)
+        try:
+            ensure_durable(csv_path)
+        except OSError as e:
+            write_submission_state(job_dir, state=STATE_FAILED, error=f"Job input unavailable: {e}")
+            self._log(f"Job {job_id} input not readable: {e}")
+            return False
+        attempt = 0
+        while True:
+            attempt += 1
+            write_submission_state(job_dir, state=STATE_SUBMITTING, attempts=attempt)
+            try:
+                self._log(f"Submitting job {job_id} -> {self.pipeline_url} (attempt {attempt})")
+                resp = self._post(csv_path, form_data)
+                write_submission_state(job_dir, state=STATE_SUBMITTED, httpStatus=resp.status_code, error=None)
+                self._log(f"Pipeline responded {resp.status_code} for job {job_id}")
+                return True
+            except PermanentSubmissionError as e:
+                write_submission_state(job_dir, state=STATE_FAILED, error=str(e))
+                self._log(f"Job {job_id} failed permanently: {e}")
+                return False
+            except (requests.RequestException, OSError) as e:
+                if attempt > self.max_retries:
+                    write_submission_state(job_dir, state=STATE_FAILED, error=str(e))
+                    self._log(f"Job {job_id} failed after {attempt} attempts: {e}")
+                    return False
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay *= random.uniform(0.5, 1.0)
+                write_submission_state(job_dir, state=STATE_SUBMITTING, error=str(e), retryInSeconds=round(delay, 2))
+                self._log(f"Job {job_id} attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_submission_executor() -> SubmissionExecutor:
+    """Return the per-process SubmissionExecutor configured from settings."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = SubmissionExecutor(
+                    getattr(settings, "PREDICT_DOCKER_URL", ""),
+                    pool_size=getattr(settings, "SUBMIT_POOL_SIZE", 4),
+                    queue_size=getattr(settings, "SUBMIT_QUEUE_SIZE", 100),
+                    max_retries=getattr(settings, "SUBMIT_MAX_RETRIES", 5),
+                    backoff_base=getattr(settings, "SUBMIT_BACKOFF_BASE", 1.0),
+                    backoff_max=getattr(settings, "SUBMIT_BACKOFF_MAX", 60.0),
+                    timeout=getattr(settings, "SUBMIT_TIMEOUT", 30.0),
+                    debug=getattr(settings, "DEBUG_LOG", False),
+                )
+    return _executor
@@ -0,0 +1,123 @@
+# core/services/zip_stream.py
+"""
+Build ZIP archives as a byte stream, without a temp file or a full in-memory copy.
+
+Usage:
+    StreamingHttpResponse(iter_zip([("data.csv", csv_text), ("x.pdb", Path(p))]),
+                          content_type="application/zip")
+
+extend_zip() streams a prebuilt archive with small members appended, copying
+the prebuilt entries byte for byte instead of recompressing them.
+"""
+
+import zipfile
+from pathlib import Path
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _ChunkSink:
+    """Write-only, non-seekable target; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _OffsetSink(_ChunkSink):
+    """_ChunkSink that reports positions as if offset bytes had been written before it."""
+
+    def __init__(self, offset: int):
+        super().__init__()
+        self._position = offset
+
+    def write(self, data):
+        self._position += len(data)
+        return super().write(data)
+
+    def tell(self) -> int:
+        return self._position
+
+
+def iter_zip(members, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yield a ZIP archive chunk by chunk.
+    members: iterable of (arcname, source) where source is str/bytes (stored as
+    content) or a pathlib.Path (file copied in CHUNK_SIZE pieces). Missing
+    files are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=compression) as zf:
+        for arcname, source in members:
+            if isinstance(source, Path):
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(source, arcname)
+                    src = open(source, "rb")
+                except OSError:
+                    continue
+                zinfo.compress_type = compression
+                with src, zf.open(zinfo, "w") as dst:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                zf.writestr(arcname, source)
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # central directory
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def extend_zip(path: str, members):
+    """
+    Return (size, chunks) for the ZIP at path with members (arcname, str/bytes)
+    appended. The prebuilt local entries are copied unchanged; only the new
+    members and a central directory listing old and new entries are built.
+    """
+    with zipfile.ZipFile(path) as prebuilt:
+        infos = prebuilt.infolist()
+        prefix = prebuilt.start_dir   # local entries end where the central directory starts
+
+    sink = _OffsetSink(prefix)
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, source in members:
+            zf.writestr(arcname, source)
+        # the copied entries keep their header offsets, so their records are reused as-is
+        zf.filelist[:0] = infos
+    tail = sink.drain()
+
+    src = open(path, "rb")   # opened now: a rebuild replacing path cannot pull it away mid-response
+
+    def chunks():
+        with src:
+            remaining = prefix
+            while remaining > 0:
+                chunk = src.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        yield tail
+
+    return prefix + len(tail), chunks()
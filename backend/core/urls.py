@@ -3,13 +3,28 @@ from django.urls import path
 from .views.dataset_views import DatasetListAPIView, DatasetExportAPIView, DatasetDownloadAPIView,FetchDatasetDetails
 from .views.elastic_search_views import ElasticSearchView
 # from core.views.structure_views import FetchStructureFilesAPIView
-from core.views.structure_views import FetchLocalStructureAPIView
+from core.views.structure_views import FetchLocalStructureAPIView, StructureFileAPIView, StructureArraysAPIView
 from django.conf import settings
 from django.conf.urls.static import static
-from core.views.dataset_views import FetchDatasetDetails, DownloadByEvolfId
-from core.views.prediction_views import SmilesPredictionAPIView
-from core.views.job_status_views import JobStatusAPIView,DownloadOutputAPIView
-
+from core.views.dataset_views import FetchDatasetDetails, DownloadByEvolfId, BatchDatasetDetails, DownloadBundleByEvolfIds
+from core.views import job_status_views, prediction_views
+from core.views.prediction_views import BatchPredictionAPIView, ScreeningPredictionAPIView
+from core.views.job_status_views import PipelineCallbackAPIView
+
+if getattr(settings, "ASYNC_VIEWS", False):
+    # native asyncio views (serve evo_backend.asgi)
+    from core.views import async_views
+    SmilesPredictionView = async_views.AsyncSmilesPredictionView
+    JobStatusView = async_views.AsyncJobStatusView
+    JobEventsView = async_views.AsyncJobEventsView
+    DownloadOutputView = async_views.AsyncDownloadOutputView
+    JobResultsDownloadView = async_views.AsyncJobResultsDownloadView
+else:
+    SmilesPredictionView = prediction_views.SmilesPredictionAPIView
+    JobStatusView = job_status_views.JobStatusAPIView
+    JobEventsView = job_status_views.JobEventsAPIView
+    DownloadOutputView = job_status_views.DownloadOutputAPIView
+    JobResultsDownloadView = job_status_views.JobResultsDownloadAPIView
 
 
 urlpatterns = [
@@ -19,16 +34,25 @@ urlpatterns = [
     path("search/", ElasticSearchView.as_view(), name="elastic_search"),
     # path("fetch-structures/<str:evolf_id>/", FetchStructureFilesAPIView.as_view(), name="fetch-structures"),
 
-    #path("structures/<str:evolf_id>/", FetchLocalStructureAPIView.as_view(), name="fetch-local-structure"),
+    path("structures/<str:evolf_id>/", FetchLocalStructureAPIView.as_view(), name="fetch-local-structure"),
+    path("structures/<str:evolf_id>/arrays/", StructureArraysAPIView.as_view(), name="structure-arrays"),
+    path("structures/<str:evolf_id>/<str:kind>/", StructureFileAPIView.as_view(), name="structure-file"),
     # path("dataset/export/<str:evolfId>/", DownloadDatasetByEvolf.as_view(), name="download-dataset-evolf"),
 
 
+    path('dataset/details', BatchDatasetDetails.as_view(), name='batch_dataset_details'),
+    path('dataset/export/bundle', DownloadBundleByEvolfIds.as_view(), name='download_bundle'),
     path('dataset/details/<str:evolfId>/', FetchDatasetDetails.as_view(), name='fetch_dataset_details'),
     path('dataset/export/<str:evolfId>/', DownloadByEvolfId.as_view(), name='download_by_evolf'),
 
-    path("predict/smiles/", SmilesPredictionAPIView.as_view()),
+    path("predict/smiles/", SmilesPredictionView.as_view()),
+    path("predict/batch/", BatchPredictionAPIView.as_view(), name="predict-batch"),
+    path("predict/screen/", ScreeningPredictionAPIView.as_view(), name="predict-screen"),
     # path("predict/csv/", CSVPredictionAPIView.as_view()),
-    path("predict/job/<str:job_id>/", JobStatusAPIView.as_view(), name="job-status"),
-    path("predict/download/<str:job_id>/", DownloadOutputAPIView.as_view(), name="job-download"),
+    path("predict/job/<str:job_id>/", JobStatusView.as_view(), name="job-status"),
+    path("predict/job/<str:job_id>/events", JobEventsView.as_view(), name="job-events"),
+    path("predict/job/<str:job_id>/complete", PipelineCallbackAPIView.as_view(), name="job-complete"),
+    path("predict/job/<str:job_id>/results", JobResultsDownloadView.as_view(), name="job-results"),
+    path("predict/download/<str:job_id>/", DownloadOutputView.as_view(), name="job-download"),
 ]
 
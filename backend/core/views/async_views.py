@@ -0,0 +1,353 @@
+# core/views/async_views.py
+"""
+Native asyncio versions of the prediction submission, job-status and
+download endpoints, routed instead of the APIViews when ASYNC_VIEWS=1
+(serve evo_backend.asgi with an ASGI server, e.g. uvicorn/daphne).
+
+A request waiting on the pipeline, the disk or a long-poll holds a
+coroutine instead of a worker thread:
+  - validation, CSV building and response bodies reuse the sync views' helpers
+  - file-system work runs through asyncio.to_thread, ORM work through
+    sync_to_async (Django's thread-sensitive executor)
+  - pipeline submission uses the shared httpx.AsyncClient pool
+    (core.services.async_pipeline)
+  - ?wait= long-polls and the SSE events stream park on JobEventNotifier.wait_async()
+  - file and CSV downloads stream through async iterators, so ASGI never
+    buffers a whole download in memory
+DRF's default throttles are applied as for the APIViews.
+"""
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.settings import api_settings
+
+from core.models import PredictionJob
+from core.services import result_cache
+from core.services.async_pipeline import get_async_submitter
+from core.services.job_archives import output_archive_response
+from core.services.job_events import get_job_notifier
+from core.services.job_inputs import write_job_input
+from core.services.job_paths import resolve_job_dir
+from core.services.prediction_results import EXPORT_COLUMNS, job_payload, parse_label_filter, register_job
+from core.services.submission_executor import QueueFull, write_submission_state
+from core.views.job_status_views import (
+    JOB_EVENTS_KEEPALIVE, JOB_EVENTS_MAX_SECONDS, JOB_EVENTS_RETRY_MS,
+    JobResultsDownloadAPIView, JobStatusAPIView, PYARROW_AVAILABLE, RESULTS_EXPORT_CHUNK,
+    _is_terminal, _list_output_files, _page_args, _status_event, _wait_seconds,
+)
+from core.views.prediction_views import (
+    CURATED_LOOKUP_MODE, DEBUG_LOG, ENABLE_SCHEDULER, PREDICT_DOCKER_URL, QUEUE_FULL_MESSAGE,
+    RESULT_CACHE_ENABLED, SUBMIT_RETRY_AFTER,
+    _client_key, _curated_records, _enqueue_job, _record_expected_rows, _with_curated, _with_job_subdir,
+    _write_cached_job, parse_smiles_request,
+)
+
+# bytes per read when streaming files to ASGI
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def _error(message: str, status_code: int) -> JsonResponse:
+    return JsonResponse({"error": message}, status=status_code)
+
+
+async def _aiter_sync(iterable):
+    """Drive a blocking iterator (file reads, ZIP writer) from a worker thread, one chunk at a time."""
+    it = iter(iterable)
+    sentinel = object()
+    while True:
+        chunk = await asyncio.to_thread(next, it, sentinel)
+        if chunk is sentinel:
+            return
+        yield chunk
+
+
+def _as_async_response(response):
+    """Give a streaming response (FileResponse, StreamingHttpResponse) an async iterator."""
+    if getattr(response, "streaming", False) and not response.is_async:
+        file_to_stream = getattr(response, "file_to_stream", None)
+        if file_to_stream is not None:
+            content = iter(lambda: file_to_stream.read(STREAM_CHUNK_SIZE), b"")
+        else:
+            content = response.streaming_content
+        response.streaming_content = _aiter_sync(content)
+    return response
+
+
+class AsyncAPIView(View):
+    """Base for the async views: DRF's default throttles, then the async handler."""
+
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    def _throttle_wait(self, request):
+        """Seconds to wait when a throttle rejects the request, else None (runs in a thread: it touches request.user)."""
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                return throttle.wait() or 1
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        wait = await sync_to_async(self._throttle_wait)(request)
+        if wait is not None:
+            response = _error("Request was throttled.", status.HTTP_429_TOO_MANY_REQUESTS)
+            response["Retry-After"] = str(int(wait))
+            return response
+        return await super().dispatch(request, *args, **kwargs)
+
+    def _request_data(self, request):
+        """JSON body or form fields, like DRF's request.data."""
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return None
+            return data if isinstance(data, dict) else None
+        return request.POST
+
+
+# ----------------------------------------------------------------------
+# Prediction submission
+# ----------------------------------------------------------------------
+
+class AsyncSmilesPredictionView(AsyncAPIView):
+    """POST /api/predict/smiles/ (async). Same request and responses as SmilesPredictionAPIView."""
+
+    http_method_names = ["post", "options"]
+
+    async def post(self, request):
+        payload = self._request_data(request)
+        if payload is None:
+            return _error("Malformed JSON body.", status.HTTP_400_BAD_REQUEST)
+        job, error = parse_smiles_request(payload, bool(request.FILES))
+        if error:
+            return _error(error, status.HTTP_400_BAD_REQUEST)
+        smiles, receptor_seq = job["smiles"], job["receptor_seq"]
+
+        # curated lookups are in-memory once the index is built; the first call may load the dataset
+        curated = await asyncio.to_thread(_curated_records, smiles, receptor_seq)
+        if curated and CURATED_LOOKUP_MODE == "instead":
+            return JsonResponse(
+                {"job_id": None, "message": "Pair found in the curated EvOlf dataset.", "curated": curated})
+
+        job_id = str(uuid.uuid4())
+
+        key = flight = None
+        if RESULT_CACHE_ENABLED:
+            key = result_cache.cache_key(smiles, receptor_seq or "")
+            if await asyncio.to_thread(result_cache.lookup, key):
+                try:
+                    await asyncio.to_thread(
+                        _write_cached_job, job_id, job["csv_bytes"], key, job["lr_id_value"], job["lr_id_col"])
+                except Exception as e:
+                    if DEBUG_LOG:
+                        print(f"[SMILES] Cache hit could not be materialised ({e}); running pipeline")
+                else:
+                    return JsonResponse(_with_curated(
+                        {"job_id": job_id, "message": "Prediction served from cache.", "cached": True}, curated))
+            flight = result_cache.inflight_key(key, job["csv_bytes"])
+            existing_job = await asyncio.to_thread(result_cache.claim_inflight, flight, job_id)
+            if existing_job:
+                return JsonResponse(_with_curated(
+                    {"job_id": existing_job, "message": "Identical prediction already in progress.",
+                     "coalesced": True}, curated))
+
+        try:
+            csv_path = await asyncio.to_thread(write_job_input, job_id, job["csv_bytes"])
+            if key:
+                await asyncio.to_thread(
+                    write_submission_state, os.path.dirname(csv_path), cacheKey=key, inflightKey=flight)
+        except Exception as e:
+            if DEBUG_LOG:
+                print(f"[SMILES] Error saving CSV: {e}")
+            await self._release(flight, job_id)
+            return _error("Failed to save CSV to disk.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not PREDICT_DOCKER_URL:
+            await self._release(flight, job_id)
+            return _error("Pipeline URL not configured", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        form_data = {"job_id": job_id, **job["form_data"]}
+        try:
+            await self._submit(request, job_id, csv_path, form_data)
+        except QueueFull:
+            await self._release(flight, job_id)
+            response = _error(QUEUE_FULL_MESSAGE, status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(SUBMIT_RETRY_AFTER)
+            return response
+
+        return JsonResponse(_with_curated(
+            {"job_id": job_id, "message": "Job submitted to pipeline asynchronously."}, curated))
+
+    async def _submit(self, request, job_id: str, csv_path: str, form_data: dict):
+        """The durable queue when ENABLE_SCHEDULER is set, else the loop's httpx submitter (threaded pool without it)."""
+        submitter = None if ENABLE_SCHEDULER else get_async_submitter()
+        if submitter is None:
+            client_key = await sync_to_async(_client_key)(request)
+            await sync_to_async(_enqueue_job)(job_id, csv_path, form_data, client_key)
+            return
+        await asyncio.to_thread(_record_expected_rows, os.path.dirname(csv_path), job_id)
+        try:
+            await submitter.submit(job_id, csv_path, _with_job_subdir(job_id, form_data))
+        except QueueFull:
+            await asyncio.to_thread(shutil.rmtree, os.path.dirname(csv_path), ignore_errors=True)
+            raise
+        await sync_to_async(register_job)(job_id)
+
+    async def _release(self, flight, job_id):
+        if flight:
+            await asyncio.to_thread(result_cache.release_inflight, flight, job_id)
+
+
+# ----------------------------------------------------------------------
+# Job status and downloads
+# ----------------------------------------------------------------------
+
+async def _archive_response(request, job_id: str, job_dir: str):
+    """Async counterpart of JobStatusAPIView._zip_and_serve."""
+    try:
+        response = await asyncio.to_thread(output_archive_response, request, job_id, job_dir)
+    except Exception as e:
+        return _error(f"Failed to create zip archive: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if response is None:
+        return _error("Output not found for job", status.HTTP_404_NOT_FOUND)
+    return _as_async_response(response)
+
+
+class AsyncJobStatusView(AsyncAPIView):
+    """GET /predict/job/<job_id>/ (async). Same parameters and bodies as JobStatusAPIView."""
+
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, job_id):
+        params = request.GET
+        download_param = params.get("download") or params.get("dl")
+        wants_download = bool(download_param and download_param.lower() == "output")
+        page_args = _page_args(params)
+
+        if not wants_download:
+            job = await PredictionJob.objects.filter(job_id=job_id).exclude(
+                status=PredictionJob.STATUS_PROCESSING).afirst()
+            if job is not None:
+                return JsonResponse(await sync_to_async(job_payload)(job, *page_args))
+
+        job_dir = await asyncio.to_thread(resolve_job_dir, job_id)
+        if job_dir is None:
+            return _error("Job not found", status.HTTP_404_NOT_FOUND)
+
+        wait = _wait_seconds(params)
+        if wait:
+            notifier = get_job_notifier()
+            since = await asyncio.to_thread(notifier.signature, job_id)
+            if not await asyncio.to_thread(_is_terminal, job_dir, job_id):
+                await notifier.wait_async(job_id, since, wait)
+
+        output_files = await asyncio.to_thread(_list_output_files, job_dir)
+        if output_files and wants_download:
+            return await _archive_response(request, job_id, job_dir)
+
+        # reads the submission state and may record the finished job: ORM work
+        payload = await sync_to_async(JobStatusAPIView().status_payload)(job_id, job_dir, output_files, *page_args)
+        return JsonResponse(payload)
+
+
+class AsyncJobEventsView(AsyncAPIView):
+    """
+    GET /predict/job/<job_id>/events (async): the SSE stream of JobEventsAPIView.
+    An open stream is a parked coroutine, so it may last JOB_EVENTS_MAX_SECONDS.
+    """
+
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, job_id):
+        job_dir = await asyncio.to_thread(resolve_job_dir, job_id)
+        if job_dir is None:
+            return _error("Job not found", status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(self._stream(job_id, job_dir), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"   # let nginx flush events immediately
+        return response
+
+    async def _stream(self, job_id: str, job_dir: str):
+        notifier = get_job_notifier()
+        status_payload = sync_to_async(JobStatusAPIView().status_payload)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + JOB_EVENTS_MAX_SECONDS
+        since = None
+        yield f"retry: {JOB_EVENTS_RETRY_MS}\n\n"
+        while True:
+            current = await asyncio.to_thread(notifier.signature, job_id)
+            if current != since:
+                since = current
+                output_files = await asyncio.to_thread(_list_output_files, job_dir)
+                payload = await status_payload(job_id, job_dir, output_files)
+                yield _status_event(payload)
+                if payload["status"] in ("finished", "failed"):
+                    return
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            if await notifier.wait_async(job_id, since, min(JOB_EVENTS_KEEPALIVE, remaining)) == since:
+                yield ": keep-alive\n\n"
+
+
+class AsyncDownloadOutputView(AsyncAPIView):
+    """GET /predict/download/<job_id>/ (async): the shared output/ ZIP."""
+
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, job_id):
+        job_dir = await asyncio.to_thread(resolve_job_dir, job_id)
+        if job_dir is None:
+            return _error("Job not found", status.HTTP_404_NOT_FOUND)
+        return await _archive_response(request, job_id, job_dir)
+
+
+class AsyncJobResultsDownloadView(AsyncAPIView):
+    """GET /predict/job/<job_id>/results?format=csv|parquet (async)."""
+
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, job_id):
+        fmt = (request.GET.get("format") or "csv").lower()
+        if fmt not in ("csv", "parquet"):
+            return _error("format must be 'csv' or 'parquet'", status.HTTP_400_BAD_REQUEST)
+        if fmt == "parquet" and not PYARROW_AVAILABLE:
+            return _error("Parquet export is not available on this server (pyarrow missing).",
+                          status.HTTP_501_NOT_IMPLEMENTED)
+
+        sync_view = JobResultsDownloadAPIView()
+        rows = await sync_to_async(sync_view._rows)(job_id, parse_label_filter(request.GET.get("predicted_label")))
+        if rows is None:
+            return _error("Results not found for job", status.HTTP_404_NOT_FOUND)
+
+        if fmt == "parquet":
+            return _as_async_response(await sync_to_async(sync_view._parquet_response)(job_id, rows))
+
+        response = StreamingHttpResponse(self._csv_chunks(rows), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{job_id}_predictions.csv"'
+        return response
+
+    async def _csv_chunks(self, rows):
+        """One CSV chunk per RESULTS_EXPORT_CHUNK rows; the row iterator may hold a DB cursor, so it stays on the ORM thread."""
+        next_chunk = sync_to_async(lambda: list(itertools.islice(rows, RESULTS_EXPORT_CHUNK)))
+        chunk = [[name for _, name in EXPORT_COLUMNS]]
+        while True:
+            chunk.extend(await next_chunk())
+            if not chunk:
+                return
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator="\n").writerows(chunk)
+            yield buf.getvalue()
+            chunk = []
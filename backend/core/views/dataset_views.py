@@ -4,21 +4,28 @@ import json
 import zipfile
 import datetime
 import os
+import tempfile
+from pathlib import Path
 import math
 import re
 
-from django.http import HttpResponse, JsonResponse, FileResponse, Http404
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.db.models import Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
-import pandas as pd
 from django.conf import settings
 
 from core.models import EvOlf
 from core.serializers import EvOlfSerializer
-from core.views.structure_views import format_dataset_detail, FetchLocalStructureAPIView
+from core.views.structure_views import format_dataset_detail, compile_field_map, wants_inline_structures, FetchLocalStructureAPIView
+from core.services.dataset_store import get_dataset_store, DatasetNotFound, DatasetSchemaError
+from core.services.media_manifest import get_media_manifest
+from core.services.zip_stream import extend_zip, iter_zip
+from core.services.export_shards import (
+    EXPORT_FIELDS, EXPORT_README, build_data_zip, load_manifest, match_shards, write_export_zip,
+)
 
 # ES import
 try:
@@ -452,6 +459,12 @@ class DatasetExportAPIView(APIView):
         data = request.data
         evolf_ids = data.get('evolfIds')
 
+        # --- CASE 0: filter-only export -> serve from pre-built shards
+        if not (isinstance(evolf_ids, list) and len(evolf_ids) > 0) and not data.get('search', '').strip():
+            response = self._export_from_shards(request, data)
+            if response is not None:
+                return response
+
         # --- CASE A: frontend sends IDs directly
         if isinstance(evolf_ids, list) and len(evolf_ids) > 0:
             qs = EvOlf.objects.filter(EvOlf_ID__in=evolf_ids)
@@ -521,15 +534,9 @@ class DatasetExportAPIView(APIView):
         # --- Build ZIP
         csv_buffer = io.StringIO()
         writer = csv.writer(csv_buffer)
-        fields = ['EvOlf_ID', 'Class', 'Species', 'Receptor_ID', 'Receptor', 'UniProt_ID', 
-                  'Mutation_Status', 'Mutation', 'Mutation_Impact', 'Sequence', 'Receptor_SubType', 
-                  'Ligand_ID', 'Ligand', 'SMILES', 'CID', 'InChiKey', 'InChi', 'IUPAC_Name', 'Source',
-                    'Model', 'Source_Links', 'Value', 'Method']
-
-
-        writer.writerow(fields)
+        writer.writerow(EXPORT_FIELDS)
         for obj in qs:
-            writer.writerow([getattr(obj, f, '') for f in fields])
+            writer.writerow([getattr(obj, f, '') for f in EXPORT_FIELDS])
 
         metadata = {
             "exportDate": datetime.datetime.utcnow().isoformat() + 'Z',
@@ -538,12 +545,53 @@ class DatasetExportAPIView(APIView):
             "version": "1.0",
             "searchUsed": "enhanced" if ES_AVAILABLE else "basic"
         }
-        
+        return self._zip_response(csv_buffer.getvalue(), metadata)
+
+    def _export_from_shards(self, request, data):
+        """
+        Serve a filter-only export sorted by EvOlf_ID from the shard manifest:
+        the combination's prebuilt data.csv entry (built on first request) with
+        metadata stamped now. Returns None when no usable manifest exists or
+        another column is sorted on, so the caller falls back to the DB.
+        """
+        manifest = load_manifest()
+        if not manifest or data.get('sortBy', 'EvOlf_ID') != 'EvOlf_ID':
+            return None
+
+        filters = {
+            'species': data.get('species'),
+            'class_filter': data.get('class') or data.get('classFilter'),
+            'mutation_type': data.get('mutationType'),
+        }
+        shards = match_shards(manifest, filters)
+        if not shards:
+            return Response({"message": "No records found for given filters or IDs"}, status=404)
+
+        metadata = {
+            "exportDate": datetime.datetime.utcnow().isoformat() + 'Z',
+            "totalRecords": sum(shard["count"] for shard in shards),
+            "format": "csv",
+            "version": "1.0",
+            "searchUsed": "shards",
+            "shardsGeneratedAt": manifest.get("generatedAt"),
+        }
+        sort_order = "asc" if data.get('sortOrder', 'desc') == "asc" else "desc"
+        try:
+            size, chunks = extend_zip(build_data_zip(shards, sort_order), [
+                ("metadata.json", json.dumps(metadata, indent=2)),
+                ("README.txt", EXPORT_README),
+            ])
+        except FileNotFoundError:   # shards swapped out by a rebuild
+            return None
+
+        response = StreamingHttpResponse(chunks, content_type="application/zip")
+        response["Content-Length"] = str(size)
+        response["Content-Disposition"] = "attachment; filename=evolf_filtered_export.zip"
+        return response
+
+    def _zip_response(self, csv_text, metadata):
         mem_zip = io.BytesIO()
-        with zipfile.ZipFile(mem_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr("data.csv", csv_buffer.getvalue())
-            zf.writestr("metadata.json", json.dumps(metadata, indent=2))
-            zf.writestr("README.txt", "EvoLF dataset export containing filtered data.")
+        write_export_zip(mem_zip, csv_text, metadata)
         mem_zip.seek(0)
         
         response = HttpResponse(mem_zip.read(), content_type="application/zip")
@@ -607,6 +655,12 @@ def json_safe(obj):
         return [json_safe(v) for v in obj]
     return obj
 
+def _csv_cell(value):
+    """Render a dataset value the way DataFrame.to_csv does (NaN -> empty)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
 # ============================================================
 # 1️⃣ FETCH DATASET DETAILS
 # ============================================================
@@ -615,28 +669,25 @@ class FetchDatasetDetails(APIView):
     """
     GET /api/dataset/details/<evolfId>/
     Returns JSON exactly in README format (keys and default types/values).
+    ?structures=lazy returns structure URLs/sizes instead of inline pdbData/sdfData.
     """
     def get(self, request, evolfId):
         try:
-            csv_path = os.path.join(settings.BASE_DIR, settings.PATH_AFTER_BASE_DIR, "evolf_data.csv")
-            if not os.path.exists(csv_path):
-                return Response({"error": "Dataset CSV not found", "path": csv_path}, status=status.HTTP_404_NOT_FOUND)
-
-            df = pd.read_csv(csv_path)
-
-            # Accept either column name "EvOlf ID" or "EvOlf_ID"
-            id_col = "EvOlf ID" if "EvOlf ID" in df.columns else ("EvOlf_ID" if "EvOlf_ID" in df.columns else None)
-            if not id_col:
+            store = get_dataset_store()
+            try:
+                # Keyed lookup in the per-process store (reloads on CSV change)
+                entry = store.get(evolfId)
+            except DatasetNotFound:
+                return Response({"error": "Dataset CSV not found", "path": store.csv_path}, status=status.HTTP_404_NOT_FOUND)
+            except DatasetSchemaError:
                 return Response({"error": "Missing EvOlf_ID column in dataset"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            rows = df[df[id_col] == evolfId].to_dict(orient="records")
-            if not rows:
+            if entry is None:
                 return Response({"error": "Entry not found", "message": f"No record with EvOlf ID: {evolfId}"}, status=status.HTTP_404_NOT_FOUND)
 
-            entry = rows[0]
-
             # Build formatted data using centralized formatter (passes request for URL building)
-            formatted = format_dataset_detail(entry, request=request)
+            formatted = format_dataset_detail(entry, request=request,
+                                              inline_structures=wants_inline_structures(request))
 
             # Ensure exact README ordering/keys: produce dict with those keys
             # format_dataset_detail already returns keys matching README, so just sanitize
@@ -661,96 +712,42 @@ class DownloadByEvolfId(APIView):
                   'Mutation_Status', 'Mutation', 'Mutation_Impact', 'Sequence', 'Receptor_SubType', 
                   'Ligand_ID', 'Ligand', 'SMILES', 'CID', 'InChiKey', 'InChi', 'IUPAC_Name', 'Source',
                     'Model', 'Source_Links', 'Value', 'Method']
-    
-    def get(self, request, evolfId):
-        base_dir = settings.MEDIA_ROOT
-        files_to_zip = []
-
-        # Paths for PDB, SDF, and image files
-        paths = {
-            "pdb": os.path.join(base_dir, 'pdb_files', f'{evolfId}.pdb'),
-            "sdf": os.path.join(base_dir, 'sdf_files', f'{evolfId}.sdf'),
-            "img": os.path.join(base_dir, 'smiles_2d', f'{evolfId}.png')
-        }
 
-        for p in paths.values():
-            if os.path.exists(p):
-                files_to_zip.append(p)
+    # ZIPs smaller than this stay in memory, larger ones spill to a private temp file
+    SPOOL_MAX_SIZE = 8 * 1024 * 1024
 
-        # If no files exist, we still proceed because we'll add CSV row
-        if not files_to_zip:
-            files_to_zip = []
+    def get(self, request, evolfId):
+        # PDB, SDF and image files known to the media manifest
+        # (if none exist we still proceed because we'll add the CSV row)
+        files_to_zip = [m.path for m in get_media_manifest().lookup(evolfId).values() if m]
 
-        # 🧠 Step 1: Fetch row data for this EvOlf ID
+        # 🧠 Step 1: Fetch row data for this EvOlf ID (keyed lookup, columns resolved at load)
+        csv_header, csv_row = [], None
         try:
-            csv_path = os.path.join(
-                settings.BASE_DIR,
-                settings.PATH_AFTER_BASE_DIR,
-                "evolf_data.csv"
-            )
-            df = pd.read_csv(csv_path)
-            
-            # Handle column name variations
-            column_mapping = {}
-            for col in df.columns:
-                clean_col = col.strip()
-                if clean_col != col:
-                    column_mapping[col] = clean_col
-            
-            if column_mapping:
-                df = df.rename(columns=column_mapping)
-            
-            # Find EvOlf ID column
-            possible_id_cols = ['EvOlf_ID', 'EvOlf ID', 'EvOlfID', 'evolf_id']
-            id_col = None
-            for col in possible_id_cols:
-                if col in df.columns:
-                    id_col = col
-                    break
-            
-            if not id_col:
-                raise ValueError("No EvOlf ID column found in dataset")
-            
-            # Filter for the specific EvOlf ID
-            row_df = df[df[id_col] == evolfId]
-            
-            # Select only the predefined fields (if they exist)
-            available_fields = []
-            for field in self.CSV_FIELDS:
-                if field in df.columns:
-                    available_fields.append(field)
-                else:
-                    # Try to find case-insensitive or spaced version
-                    for col in df.columns:
-                        if col.replace(' ', '_').lower() == field.replace(' ', '_').lower():
-                            available_fields.append(col)
-                            break
-            
-            # If no specific fields found, use all available fields
-            if not available_fields:
-                available_fields = list(df.columns)
-            
-            # Select only the requested fields
-            if not row_df.empty:
-                row_df = row_df[available_fields]
-                
+            snapshot = get_dataset_store().snapshot()
+            entry = snapshot.get(evolfId)
+            if entry is not None:
+                columns = snapshot.resolve_columns(self.CSV_FIELDS)
+                csv_header = [header for _, header in columns]
+                csv_row = [_csv_cell(entry.get(col)) for col, _ in columns]
         except Exception as e:
-            row_df = pd.DataFrame()
             print(f"Error fetching row data for {evolfId}: {e}")
 
-        # 🧠 Step 2: Prepare ZIP
+        # 🧠 Step 2: Prepare ZIP in a per-request spooled buffer (no shared file on disk)
         zip_filename = f"{evolfId}_data.zip"
-        zip_path = os.path.join(base_dir, zip_filename)
+        zip_buffer = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE)
 
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
             # Add files if available
             for f in files_to_zip:
                 zipf.write(f, os.path.basename(f))
 
             # 🧠 Step 3: Add CSV row if available
-            if not row_df.empty:
+            if csv_row is not None:
                 csv_buffer = io.StringIO()
-                row_df.to_csv(csv_buffer, index=False)
+                writer = csv.writer(csv_buffer, lineterminator="\n")
+                writer.writerow(csv_header)
+                writer.writerow(csv_row)
                 zipf.writestr(f"{evolfId}_data.csv", csv_buffer.getvalue())
             else:
                 zipf.writestr("note.txt", f"No matching row found for {evolfId}")
@@ -760,20 +757,118 @@ class DownloadByEvolfId(APIView):
                 "EvOlf_ID": evolfId,
                 "exportDate": datetime.datetime.utcnow().isoformat() + "Z",
                 "containsFiles": [os.path.basename(f) for f in files_to_zip],
-                "containsCSV": not row_df.empty,
-                "csvFields": list(row_df.columns) if not row_df.empty else [],
+                "containsCSV": csv_row is not None,
+                "csvFields": csv_header if csv_row is not None else [],
                 "version": "1.1"
             }
             zipf.writestr("metadata.json", json.dumps(metadata, indent=2))
             zipf.writestr("README.txt", f"All available files and data for {evolfId}.")
 
-        # 🧠 Step 5: Return the ZIP as a downloadable file
-        response = FileResponse(open(zip_path, 'rb'), as_attachment=True, filename=zip_filename)
-        
-        # Clean up the temporary zip file after sending
+        # 🧠 Step 5: Stream the buffer back; FileResponse closes (and frees) it when done
+        zip_buffer.seek(0)
+        return FileResponse(zip_buffer, as_attachment=True, filename=zip_filename,
+                            content_type="application/zip")
+
+
+# ============================================================
+#  BATCH DETAILS / BUNDLE (many IDs, one keyed lookup pass)
+# ============================================================
+
+def _parse_batch_ids(data):
+    """Return (ids, error_response) for a {"evolfIds": [...]} payload, de-duplicated in order."""
+    evolf_ids = data.get('evolfIds')
+    if not isinstance(evolf_ids, list) or not evolf_ids:
+        return None, Response({"error": "'evolfIds' must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_ids = getattr(settings, "MAX_BATCH_IDS", 1000)
+    ids = list(dict.fromkeys(str(eid).strip() for eid in evolf_ids if str(eid).strip()))
+    if len(ids) > max_ids:
+        return None, Response({"error": f"At most {max_ids} IDs are allowed per request."},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return ids, None
+
+
+class BatchDatasetDetails(APIView):
+    """
+    POST /api/dataset/details
+    Body: {"evolfIds": [...], "structures": "lazy"?}
+    Returns {"results": [<detail>, ...], "notFound": [...]} in request order.
+    """
+    def post(self, request):
+        ids, error = _parse_batch_ids(request.data)
+        if error:
+            return error
+
         try:
-            os.remove(zip_path)
-        except:
-            pass
-            
-        return response
\ No newline at end of file
+            snapshot = get_dataset_store().snapshot()
+            rows = snapshot.get_many(ids)
+        except DatasetNotFound:
+            return Response({"error": "Dataset CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+        except DatasetSchemaError:
+            return Response({"error": "Missing EvOlf_ID column in dataset"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Field resolution is compiled once for the dataset schema, not per record
+        field_map = compile_field_map(tuple(snapshot.columns))
+        inline = wants_inline_structures(request)
+        results = [
+            json_safe(format_dataset_detail(rows[eid], request=request, field_map=field_map, inline_structures=inline))
+            for eid in ids if eid in rows
+        ]
+        not_found = [eid for eid in ids if eid not in rows]
+
+        return Response({"results": results, "notFound": not_found}, status=status.HTTP_200_OK)
+
+
+class DownloadBundleByEvolfIds(APIView):
+    """
+    POST /api/dataset/export/bundle
+    Body: {"evolfIds": [...]}
+    Streams one ZIP with evolf_bundle.csv (one row per found ID) plus
+    <id>/<id>.pdb, <id>/<id>.sdf and <id>/<id>.png where available.
+    """
+    def post(self, request):
+        ids, error = _parse_batch_ids(request.data)
+        if error:
+            return error
+
+        try:
+            snapshot = get_dataset_store().snapshot()
+            rows = snapshot.get_many(ids)
+            columns = snapshot.resolve_columns(DownloadByEvolfId.CSV_FIELDS)
+        except DatasetNotFound:
+            return Response({"error": "Dataset CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+        except DatasetSchemaError:
+            return Response({"error": "Missing EvOlf_ID column in dataset"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        found = [eid for eid in ids if eid in rows]
+        if not found:
+            return Response({"message": "No records found for given IDs"}, status=status.HTTP_404_NOT_FOUND)
+
+        csv_buffer = io.StringIO()
+        writer = csv.writer(csv_buffer, lineterminator="\n")
+        writer.writerow([header for _, header in columns])
+        for eid in found:
+            writer.writerow([_csv_cell(rows[eid].get(col)) for col, _ in columns])
+
+        metadata = {
+            "exportDate": datetime.datetime.utcnow().isoformat() + "Z",
+            "totalRecords": len(found),
+            "notFound": [eid for eid in ids if eid not in rows],
+            "csvFields": [header for _, header in columns],
+            "version": "1.1"
+        }
+
+        manifest = get_media_manifest()
+
+        def members():
+            yield "evolf_bundle.csv", csv_buffer.getvalue()
+            for eid in found:
+                for media_file in manifest.lookup(eid).values():
+                    if media_file:
+                        yield f"{eid}/{os.path.basename(media_file.path)}", Path(media_file.path)
+            yield "metadata.json", json.dumps(metadata, indent=2)
+            yield "README.txt", "EvoLF bundle export containing data and structure files for the requested IDs."
+
+        response = StreamingHttpResponse(iter_zip(members()), content_type="application/zip")
+        response["Content-Disposition"] = "attachment; filename=evolf_bundle.zip"
+        return response
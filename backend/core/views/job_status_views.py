@@ -1,162 +1,238 @@
 # predict/views.py
 import os
 import csv
-import zipfile
+import hmac
+import itertools
+import json
+import tempfile
+import time
 from django.conf import settings
-from django.http import FileResponse
+from django.db import DatabaseError
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-JOB_DATA_DIR = getattr(settings, "JOB_DATA_DIR", None)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from core.models import PredictionJob
+from core.services import result_cache
+from core.services.prediction_results import (
+    EXPORT_COLUMNS, iter_job_results, job_payload, output_complete, pagination, parse_label_filter,
+    prediction_dict, record_completion, record_failure,
+)
+from core.services.job_archives import output_archive_response
+from core.services.job_events import get_job_notifier, notify_job
+from core.services.job_paths import resolve_job_dir
+from core.services.job_scheduler import queue_status
+from core.services.submission_executor import read_submission_state, STATE_FAILED
+
+ENABLE_SCHEDULER = getattr(settings, "ENABLE_SCHEDULER", False)
+RESULT_CACHE_ENABLED = getattr(settings, "RESULT_CACHE_ENABLED", False)
+JOB_STATUS_MAX_WAIT = float(getattr(settings, "JOB_STATUS_MAX_WAIT", 60))
+JOB_EVENTS_MAX_SECONDS = float(getattr(settings, "JOB_EVENTS_MAX_SECONDS", 3600))
+JOB_EVENTS_SYNC_MAX_SECONDS = float(getattr(settings, "JOB_EVENTS_SYNC_MAX_SECONDS", 45))
+JOB_EVENTS_RETRY_MS = int(getattr(settings, "JOB_EVENTS_RETRY_MS", 2000))
+JOB_EVENTS_KEEPALIVE = float(getattr(settings, "JOB_EVENTS_KEEPALIVE", 15))
+PIPELINE_CALLBACK_TOKEN = getattr(settings, "PIPELINE_CALLBACK_TOKEN", "")
+RESULTS_PAGE_SIZE = int(getattr(settings, "RESULTS_PAGE_SIZE", 100))
+RESULTS_MAX_PAGE_SIZE = int(getattr(settings, "RESULTS_MAX_PAGE_SIZE", 1000))
+
+# rows fetched per DB round-trip / Parquet record batch in result downloads
+RESULTS_EXPORT_CHUNK = 10000
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def _list_output_files(job_dir: str) -> list:
+    """Paths (relative to job_dir) of the files under output/."""
+    output_files = []
+    output_dir = os.path.join(job_dir, "output")
+    if os.path.isdir(output_dir):
+        for root, _, filenames in os.walk(output_dir):
+            for fn in filenames:
+                full = os.path.join(root, fn)
+                # include only real files (optionally skip zero-byte)
+                if os.path.isfile(full):
+                    rel = os.path.relpath(full, job_dir)
+                    output_files.append(rel)
+    return output_files
+
+
+def _is_terminal(job_dir: str, job_id: str) -> bool:
+    """Finished (output complete) or failed to submit: nothing left to wait for."""
+    submission = read_submission_state(job_dir)
+    if submission and submission.get("state") == STATE_FAILED:
+        return True
+    return output_complete(job_dir, job_id)
+
+
+def _status_event(payload: dict) -> str:
+    return f"event: status\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def _wait_seconds(params) -> float:
+    try:
+        wait = float(params.get("wait", 0))
+    except ValueError:
+        return 0.0
+    return max(0.0, min(wait, JOB_STATUS_MAX_WAIT))
+
+
+def _int_param(params, name, default, maximum=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        value = default
+    value = max(1, value)
+    return min(value, maximum) if maximum else value
+
+
+def _page_args(params):
+    """(page, limit, raw label filter) from ?page=&limit=&predicted_label=."""
+    return (
+        _int_param(params, "page", 1),
+        _int_param(params, "limit", RESULTS_PAGE_SIZE, RESULTS_MAX_PAGE_SIZE),
+        parse_label_filter(params.get("predicted_label")),
+    )
 
 
 class JobStatusAPIView(APIView):
     """
     GET /predict/job/<job_id>/
-      - If output/ contains files -> return {"status":"finished","job_id":..., "output_files":[...], "predictions":[...]}
+      - If submission to the pipeline failed -> {"status":"failed","error":...}
+      - If output/ is complete (prediction_results.output_complete) -> return
+        {"status":"finished","job_id":..., "output_files":[...], "predictions":[...]}
       - If ?download=output (or ?dl=output) and output/ has files -> return zip attachment of output/
-      - Otherwise -> 404 {"error":"Job status not found"}
+      - Otherwise -> {"status":"processing", ...}
+      - ?wait=<seconds> (max JOB_STATUS_MAX_WAIT) long-polls: the response is held
+        until the job's state changes or the timeout passes
+      - ?page=&limit= (max RESULTS_MAX_PAGE_SIZE) page the predictions, and
+        ?predicted_label=1|0|agonist|non-agonist filters them; "pagination" has the totals
     """
 
     def get(self, request, job_id):
-        job_dir = os.path.join(JOB_DATA_DIR, job_id)
-        if not os.path.isdir(job_dir):
+        download_param = request.query_params.get("download") or request.query_params.get("dl")
+        wants_download = bool(download_param and download_param.lower() == "output")
+        page_args = _page_args(request.query_params)
+
+        # recorded outcome (completion webhook / earlier poll): one indexed row lookup
+        if not wants_download:
+            job = PredictionJob.objects.filter(job_id=job_id).exclude(
+                status=PredictionJob.STATUS_PROCESSING).first()
+            if job is not None:
+                return Response(job_payload(job, *page_args), status=status.HTTP_200_OK)
+
+        job_dir = resolve_job_dir(job_id)
+        if job_dir is None:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        output_dir = os.path.join(job_dir, "output")
-        input_dir = os.path.join(job_dir, "input")
-
-        # gather output files (if any)
-        output_files = []
-        if os.path.isdir(output_dir):
-            for root, _, filenames in os.walk(output_dir):
-                for fn in filenames:
-                    full = os.path.join(root, fn)
-                    # include only real files (optionally skip zero-byte)
-                    if os.path.isfile(full):
-                        rel = os.path.relpath(full, job_dir)
-                        output_files.append(rel)
-
-            # If no output files yet -> job is still running / waiting
-        if not output_files:
-            return Response(
-                {"status": "processing", "message": "Job started but no output files yet"},
-                status=status.HTTP_200_OK
-            )
+        wait = _wait_seconds(request.query_params)
+        if wait:
+            notifier = get_job_notifier()
+            since = notifier.signature(job_id)
+            if not _is_terminal(job_dir, job_id):
+                notifier.wait(job_id, since, wait)
+
+        output_files = _list_output_files(job_dir)
 
         # if client requested download via query param
-        download_param = request.query_params.get("download") or request.query_params.get("dl")
-        if download_param and download_param.lower() == "output":
-            return self._zip_and_serve(job_dir, job_id, output_dir)
+        if output_files and wants_download:
+            return self._zip_and_serve(job_dir, job_id)
+
+        return Response(self.status_payload(job_id, job_dir, output_files, *page_args), status=status.HTTP_200_OK)
+
+    def status_payload(self, job_id: str, job_dir: str, output_files: list,
+                       page: int = 1, limit: int = RESULTS_PAGE_SIZE, label: str = None) -> dict:
+        """processing / failed / finished body for the job (shared with the SSE stream)."""
+
+        # If no output files yet -> job is still running / waiting (or never reached the pipeline)
+        if not output_files:
+            submission = read_submission_state(job_dir)
+            queue = queue_status(job_id) if ENABLE_SCHEDULER else None
+            if submission and submission.get("state") == STATE_FAILED:
+                result_cache.release_job_inflight(submission, job_id)
+                return {
+                    "job_id": job_id,
+                    "status": "failed",
+                    "message": "Job could not be submitted to the prediction pipeline",
+                    "error": submission.get("error"),
+                    "submission": submission,
+                    "queue": queue,
+                }
+            payload = {"status": "processing", "message": "Job started but no output files yet"}
+            if submission:
+                payload["submission"] = submission
+            if queue:
+                payload["queue"] = queue
+            return payload
+
+        # output/ is still being written: recording now would freeze a partial result set
+        if not output_complete(job_dir, job_id):
+            return {"status": "processing", "message": "Pipeline is writing output files",
+                    "output_files": output_files}
+
+        # first finished poll records the outcome, so later polls are a row lookup
+        try:
+            return job_payload(record_completion(job_id, job_dir), page, limit, label)
+        except (DatabaseError, OSError, csv.Error) as e:
+            print(f"Error recording prediction results: {e}")
+
+        # first finished poll of a cacheable job fills the result cache
+        if RESULT_CACHE_ENABLED:
+            self._cache_result(job_dir)
 
         # Parse prediction results from CSV files
-        predictions = self._parse_prediction_results(output_dir, input_dir)
+        predictions, total = self._parse_prediction_results(job_dir, job_id, page, limit, label)
 
         # Otherwise return finished + list of output files + predictions
-        return Response(
-            {
-                "job_id": job_id,
-                "status": "finished",
-                "output_files": output_files,
-                "predictions": predictions
-            },
-            status=status.HTTP_200_OK,
-        )
-
-    def _parse_prediction_results(self, output_dir: str, input_dir: str) -> list:
+        return {
+            "job_id": job_id,
+            "status": "finished",
+            "output_files": output_files,
+            "predictions": predictions,
+            "pagination": pagination(page, limit, total),
+        }
+
+    def _cache_result(self, job_dir: str):
+        try:
+            result_cache.cache_job_output(job_dir, read_submission_state(job_dir))
+        except OSError as e:
+            print(f"Error caching prediction result: {e}")
+
+    def _parse_prediction_results(self, job_dir: str, job_id: str, page: int, limit: int, label: str):
         """
-        Parse Prediction_Output.csv and input CSV to combine the single row.
-        Returns list of dicts with: ID, Temp_Ligand_ID, SMILES, Mutated_Sequence, TempRecID, Predicted_Label, P1
-        Converts 1 to "Agonist (1)" and 0 to "Non-Agonist (0)"
+        Stream the input and Prediction_Output.csv (joined on ID) and return one page:
+        (predictions, total). Converts 1 to "Agonist (1)" and 0 to "Non-Agonist (0)".
         """
+        offset = (page - 1) * limit
         predictions = []
-        
-        # Read the single output prediction
-        output_csv_path = os.path.join(output_dir, "Prediction_Output.csv")
-        predicted_label = ""
-        p1_score = ""
-        
-        if os.path.isfile(output_csv_path):
-            try:
-                with open(output_csv_path, 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-                    if rows:  # If there's at least one row
-                        row = rows[0]  # Get the first (and only) row
-                        
-                        # Get predicted label and convert to human-readable format
-                        pred_label_raw = row.get('Predicted Label', '').strip()
-                        # Convert 1 to "Agonist (1)" and 0 to "Non-Agonist (0)"
-                        if pred_label_raw == '1':
-                            predicted_label = "Agonist (1)"
-                        elif pred_label_raw == '0':
-                            predicted_label = "Non-Agonist (0)"
-                        else:
-                            predicted_label = pred_label_raw  # Keep as is if not 0 or 1
-                        
-                        p1_score = row.get('P1', '').strip()
-            except Exception as e:
-                print(f"Error reading output CSV: {e}")
-        
-        # Read input CSV to get original data (ID, Temp_Ligand_ID, SMILES, Mutated_Sequence, TempRecID)
-        if os.path.isdir(input_dir):
-            for fn in os.listdir(input_dir):
-                if fn.endswith('.csv'):
-                    input_csv_path = os.path.join(input_dir, fn)
-                    try:
-                        with open(input_csv_path, 'r', newline='', encoding='utf-8') as f:
-                            reader = csv.DictReader(f)
-                            rows = list(reader)
-                            if rows:  # If there's at least one row
-                                row = rows[0]  # Get the first (and only) row
-                                row_id = row.get('ID', '').strip()
-                                if row_id:
-                                    predictions.append({
-                                        'id': row_id,
-                                        'temp_ligand_id': row.get('Temp_Ligand_ID', '').strip(),
-                                        'smiles': row.get('SMILES', '').strip(),
-                                        'mutated_sequence': row.get('Mutated_Sequence', '').strip(),
-                                        'temp_rec_id': row.get('TempRecID', '').strip(),
-                                        'predicted_label': predicted_label,
-                                        'p1': p1_score
-                                    })
-                    except Exception as e:
-                        print(f"Error reading input CSV: {e}")
-                    break  # Only read first CSV found
-        
-        return predictions
-
-    def _zip_and_serve(self, job_dir: str, job_id: str, output_dir: str):
-        """Create zip of output/ and return it as FileResponse (attachment)."""
-        zip_name = f"{job_id}_output.zip"
-        zip_path = os.path.join(job_dir, zip_name)
-
+        total = 0
         try:
-            # create/overwrite zip
-            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for root, _, files in os.walk(output_dir):
-                    for fname in files:
-                        full_path = os.path.join(root, fname)
-                        if os.path.isfile(full_path):
-                            # keep relative paths inside zip (e.g. output/...)
-                            rel_path = os.path.relpath(full_path, job_dir)
-                            zf.write(full_path, arcname=rel_path)
-        except Exception as e:
-            return Response({"error": f"Failed to create zip archive: {str(e)}"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for row in iter_job_results(job_dir, job_id):
+                if label is not None and row["predicted_label"] != label:
+                    continue
+                if offset <= total < offset + limit:
+                    predictions.append(prediction_dict(row))
+                total += 1
+        except (OSError, csv.Error) as e:
+            print(f"Error reading prediction CSVs: {e}")
+        return predictions, total
 
+    def _zip_and_serve(self, job_dir: str, job_id: str):
+        """Serve the shared output/ archive (built once per output state) as an attachment."""
         try:
-            f = open(zip_path, "rb")
-            return FileResponse(
-                f,
-                as_attachment=True,
-                filename=zip_name,
-                content_type="application/zip",
-            )
+            response = output_archive_response(self.request, job_id, job_dir)
         except Exception as e:
-            return Response({"error": f"Failed to serve zip file: {str(e)}"},
+            return Response({"error": f"Failed to create zip archive: {str(e)}"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if response is None:
+            return Response({"error": "Output not found for job"}, status=status.HTTP_404_NOT_FOUND)
+        return response
 
 
 class DownloadOutputAPIView(APIView):
@@ -166,42 +242,163 @@ class DownloadOutputAPIView(APIView):
     """
 
     def get(self, request, job_id):
-        # delegate to JobStatusAPIView._zip_and_serve-like behaviour
-        job_dir = os.path.join(JOB_DATA_DIR, job_id)
-        if not os.path.isdir(job_dir):
+        job_dir = resolve_job_dir(job_id)
+        if job_dir is None:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return JobStatusAPIView(request=request)._zip_and_serve(job_dir, job_id)
 
-        output_dir = os.path.join(job_dir, "output")
-        # ensure there is at least one file
-        has_files = False
-        if os.path.isdir(output_dir):
-            for _, _, filenames in os.walk(output_dir):
-                if filenames:
-                    has_files = True
-                    break
 
-        if not has_files:
-            return Response({"error": "Output not found for job"}, status=status.HTTP_404_NOT_FOUND)
+class JobEventsAPIView(APIView):
+    """
+    GET /predict/job/<job_id>/events
+    Server-Sent Events stream of the job's status: a "status" event with the
+    same body as the job-status endpoint now and on every state change,
+    ": keep-alive" comments in between, closed after the finished/failed event.
+    The stream holds a worker thread, so it also closes after
+    JOB_EVENTS_SYNC_MAX_SECONDS; the "retry:" field tells EventSource to
+    reconnect after JOB_EVENTS_RETRY_MS (ASGI deployments route
+    AsyncJobEventsView instead, which streams up to JOB_EVENTS_MAX_SECONDS).
+    """
 
-        # create zip path and stream it
-        zip_name = f"{job_id}_output.zip"
-        zip_path = os.path.join(job_dir, zip_name)
+    def get(self, request, job_id):
+        job_dir = resolve_job_dir(job_id)
+        if job_dir is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for root, _, files in os.walk(output_dir):
-                    for fname in files:
-                        full_path = os.path.join(root, fname)
-                        if os.path.isfile(full_path):
-                            rel_path = os.path.relpath(full_path, job_dir)
-                            zf.write(full_path, arcname=rel_path)
-        except Exception as e:
-            return Response({"error": f"Failed to create zip archive: {str(e)}"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response = StreamingHttpResponse(self._stream(job_id, job_dir), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"   # let nginx flush events immediately
+        return response
 
-        try:
-            f = open(zip_path, "rb")
-            return FileResponse(f, as_attachment=True, filename=zip_name, content_type="application/zip")
-        except Exception as e:
-            return Response({"error": f"Failed to serve zip file: {str(e)}"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+    def _stream(self, job_id: str, job_dir: str):
+        notifier = get_job_notifier()
+        status_view = JobStatusAPIView()
+        deadline = time.monotonic() + JOB_EVENTS_SYNC_MAX_SECONDS
+        since = None
+        yield f"retry: {JOB_EVENTS_RETRY_MS}\n\n"
+        while True:
+            current = notifier.signature(job_id)
+            if current != since:
+                since = current
+                payload = status_view.status_payload(job_id, job_dir, _list_output_files(job_dir))
+                yield _status_event(payload)
+                if payload["status"] in ("finished", "failed"):
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if notifier.wait(job_id, since, min(JOB_EVENTS_KEEPALIVE, remaining)) == since:
+                yield ": keep-alive\n\n"
+
+
+
+class PipelineCallbackAPIView(APIView):
+    """
+    POST /predict/job/<job_id>/complete
+    Called by the pipeline when a job ends. Requires the X-Pipeline-Token header
+    to match PIPELINE_CALLBACK_TOKEN (the endpoint is disabled while it is unset).
+    Body: {"status": "finished"} (default) or {"status": "failed", "error": "..."}.
+    Records the outcome in the database and wakes long-poll/SSE waiters.
+    """
+    throttle_classes = []   # pipeline-to-backend traffic; authenticated by token
+
+    def post(self, request, job_id):
+        token = request.headers.get("X-Pipeline-Token", "")
+        if not PIPELINE_CALLBACK_TOKEN or not hmac.compare_digest(token, PIPELINE_CALLBACK_TOKEN):
+            return Response({"error": "Invalid pipeline token"}, status=status.HTTP_403_FORBIDDEN)
+
+        job_dir = resolve_job_dir(job_id)
+        if job_dir is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = request.data if isinstance(request.data, dict) else {}
+        outcome = str(data.get("status") or "finished").lower()
+        if outcome == "failed":
+            job = record_failure(job_id, str(data.get("error") or "Pipeline reported a failure"))
+        elif outcome == "finished":
+            if not _list_output_files(job_dir):
+                return Response({"error": "Job has no output files"}, status=status.HTTP_409_CONFLICT)
+            job = record_completion(job_id, job_dir)
+        else:
+            return Response({"error": "status must be 'finished' or 'failed'"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        notify_job(job_id)
+        return Response({"job_id": job_id, "status": job.status, "rows": job.row_count},
+                        status=status.HTTP_200_OK)
+
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+class JobResultsDownloadAPIView(APIView):
+    """
+    GET /predict/job/<job_id>/results?format=csv|parquet[&predicted_label=...]
+    Full result table of a finished job. CSV is streamed row by row; Parquet
+    (requires pyarrow) is written in record batches to a spooled temp file.
+    """
+
+    def get(self, request, job_id):
+        fmt = (request.query_params.get("format") or "csv").lower()
+        if fmt not in ("csv", "parquet"):
+            return Response({"error": "format must be 'csv' or 'parquet'"}, status=status.HTTP_400_BAD_REQUEST)
+        if fmt == "parquet" and not PYARROW_AVAILABLE:
+            return Response({"error": "Parquet export is not available on this server (pyarrow missing)."},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        rows = self._rows(job_id, parse_label_filter(request.query_params.get("predicted_label")))
+        if rows is None:
+            return Response({"error": "Results not found for job"}, status=status.HTTP_404_NOT_FOUND)
+
+        if fmt == "parquet":
+            return self._parquet_response(job_id, rows)
+
+        writer = csv.writer(_Echo(), lineterminator="\n")
+        header = [name for _, name in EXPORT_COLUMNS]
+        stream = (writer.writerow(row) for row in itertools.chain([header], rows))
+        response = StreamingHttpResponse(stream, content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{job_id}_predictions.csv"'
+        return response
+
+    def _rows(self, job_id: str, label: str):
+        """Iterator of result tuples in EXPORT_COLUMNS order, or None when the job has no results."""
+        fields = [field for field, _ in EXPORT_COLUMNS]
+        job = PredictionJob.objects.filter(job_id=job_id, status=PredictionJob.STATUS_FINISHED).first()
+        job_dir = resolve_job_dir(job_id)
+        if job is None:
+            if job_dir is None or not output_complete(job_dir, job_id):
+                return None
+            try:
+                job = record_completion(job_id, job_dir)
+            except (DatabaseError, OSError, csv.Error) as e:
+                print(f"Error recording prediction results: {e}")
+                return (
+                    tuple(row[f] for f in fields)
+                    for row in iter_job_results(job_dir, job_id)
+                    if label is None or row["predicted_label"] == label
+                )
+
+        results = job.results.all()
+        if label is not None:
+            results = results.filter(predicted_label=label)
+        return results.values_list(*fields).iterator(chunk_size=RESULTS_EXPORT_CHUNK)
+
+    def _parquet_response(self, job_id: str, rows):
+        names = [name for _, name in EXPORT_COLUMNS]
+        schema = pa.schema([(name, pa.string()) for name in names])
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with pq.ParquetWriter(spool, schema, compression="zstd") as writer:
+            while True:
+                chunk = list(itertools.islice(rows, RESULTS_EXPORT_CHUNK))
+                if not chunk:
+                    break
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays([pa.array(c, type=pa.string()) for c in columns], schema=schema))
+        spool.seek(0)
+        return FileResponse(spool, as_attachment=True, filename=f"{job_id}_predictions.parquet",
+                            content_type="application/vnd.apache.parquet")
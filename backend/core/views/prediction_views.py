@@ -1,18 +1,35 @@
 import os
 import uuid
 import csv
+import hashlib
 import io
+import itertools
 import re
-import requests
-import threading
-import time
+import shutil
 
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-
+from rest_framework.throttling import AnonRateThrottle
+
+from core.models import ScheduledJob
+from core.services import result_cache
+from core.services.curated_index import get_curated_index
+from core.services.dataset_store import DatasetNotFound, DatasetSchemaError
+from core.services.input_validation import (
+    batch_errors, first_occurrence, receptor_errors, smiles_errors, validate_receptor_sequence, validate_smiles,
+)
+from core.services.job_inputs import get_job_dir, write_job_input
+from core.services.job_paths import job_subdir
 from core.services.job_scheduler import schedule_job
+from core.services.prediction_results import PIPELINE_ID_COLUMN, REQUEST_FILENAME, expected_rows, register_job
+from core.services.screening_jobs import (
+    JOB_FORMAT as SCREEN_JOB_FORMAT, LIGANDS_FILENAME, RECEPTORS_FILENAME, build_screening_job,
+)
+from core.services.submission_executor import (
+    get_submission_executor, write_submission_state, QueueFull, STATE_QUEUED,
+)
 
 # ----------------------------------------------------------------------
 # Settings
@@ -22,6 +39,10 @@ PREDICT_DOCKER_URL = getattr(settings, "PREDICT_DOCKER_URL", None)
 JOB_DATA_DIR = getattr(settings, "JOB_DATA_DIR", None)
 DEBUG_LOG = getattr(settings, "DEBUG_LOG", False)
 ENABLE_SCHEDULER = getattr(settings, "ENABLE_SCHEDULER", False)
+SUBMIT_RETRY_AFTER = getattr(settings, "SUBMIT_RETRY_AFTER", 30)
+QUEUE_FULL_MESSAGE = "Prediction queue is full. Please retry shortly."
+RESULT_CACHE_ENABLED = getattr(settings, "RESULT_CACHE_ENABLED", False)
+CURATED_LOOKUP_MODE = getattr(settings, "CURATED_LOOKUP_MODE", "alongside")   # alongside | instead | off
 
 # Column-name defaults
 DEFAULT_LIG_COL = "SMILES"
@@ -30,11 +51,6 @@ DEFAULT_LIG_ID_COL = "Temp_Ligand_ID"
 DEFAULT_REC_ID_COL = "TempRecID"
 DEFAULT_LR_ID_COL = "ID"
 
-# Validation constants
-MAX_SMILES_LENGTH = 512
-MAX_RECEPTOR_LENGTH = 1024
-ALLOWED_AMINO_ACIDS = "ARNDCQEGHILKMFPSTWYV"
-
 # ----------------------------------------------------------------------
 # Utility functions
 # ----------------------------------------------------------------------
@@ -49,8 +65,201 @@ def _sanitize_identifier(s: str) -> str:
     return s or ""
 
 
-_SMILES_ALLOWED_RE = re.compile(r'^[A-Za-z0-9@\+\-\[\]\(\)=#\/\\%.:\*]+$')
-_RECEPTOR_AA_RE = re.compile(r'^[ARNDCQEGHILKMFPSTWYV]+$', re.I)
+def _write_cached_job(job_id: str, csv_bytes: bytes, key: str, row_id: str, id_column: str) -> str:
+    """Lay out a completed job from a cache hit: input/<job_id>.csv plus the cached output/."""
+    job_dir = get_job_dir(job_id)
+    input_dir = os.path.join(job_dir, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    with open(os.path.join(input_dir, f"{job_id}.csv"), "wb") as fh:
+        fh.write(csv_bytes)
+    result_cache.materialize(key, job_dir, row_id, id_column)
+    write_submission_state(job_dir, state="cached", cacheKey=key, jobId=job_id)
+    return job_dir
+
+
+def _curated_records(smiles: str, receptor_seq: str) -> list:
+    """Curated EvOlf records measured for exactly this ligand/receptor pair ([] when none or disabled)."""
+    if CURATED_LOOKUP_MODE == "off" or not receptor_seq:
+        return []
+    try:
+        index = get_curated_index()
+        ids = index.lookup(smiles, receptor_seq)
+        return index.records(ids) if ids else []
+    except (DatasetNotFound, DatasetSchemaError) as e:
+        if DEBUG_LOG:
+            print(f"[SMILES] Curated lookup unavailable: {e}")
+        return []
+
+
+def _with_curated(body: dict, curated: list) -> dict:
+    if curated:
+        body["curated"] = curated
+    return body
+
+
+def _client_key(request) -> str:
+    """Fairness key for the scheduler: the (hashed) X-API-Key header, else the client IP."""
+    api_key = request.headers.get("X-API-Key", "").strip()
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+    return "ip:" + AnonRateThrottle().get_ident(request)
+
+
+def _with_job_subdir(job_id: str, form_data: dict) -> dict:
+    """With the sharded job layout the pipeline is also sent job_subdir, the job directory relative to JOB_DATA_DIR."""
+    subdir = job_subdir(job_id)
+    return {**form_data, "job_subdir": subdir} if subdir != job_id else form_data
+
+
+def _record_expected_rows(job_dir: str, job_id: str):
+    """Note the pipeline's output row count in submission.json before the job is handed off (see output_complete)."""
+    expected = expected_rows(job_dir, job_id)
+    if expected is not None:
+        write_submission_state(job_dir, expectedRows=expected)
+
+
+def _enqueue_job(job_id: str, csv_path: str, form_data: dict, client_key: str = "",
+                 priority=ScheduledJob.PRIORITY_INTERACTIVE):
+    """
+    Queue the job for submission to the pipeline: through the durable job
+    queue when ENABLE_SCHEDULER is set, otherwise straight to the in-process
+    submission pool. Raises QueueFull (after removing the job directory).
+    """
+    job_dir = os.path.dirname(csv_path)
+    form_data = _with_job_subdir(job_id, form_data)
+    _record_expected_rows(job_dir, job_id)
+    try:
+        if ENABLE_SCHEDULER:
+            write_submission_state(job_dir, state=STATE_QUEUED, attempts=0, jobId=job_id)
+            schedule_job(
+                job_id, "pipeline_submit", {"csv_path": csv_path, "form_data": form_data},
+                priority=priority, client_key=client_key,
+            )
+        else:
+            get_submission_executor().submit(job_id, csv_path, form_data)
+    except QueueFull as e:
+        if DEBUG_LOG:
+            print(f"[SUBMIT] Rejected job {job_id}: {e}")
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    # row the completion webhook fills in (created_at = submission time)
+    register_job(job_id)
+
+
+def _submit_job(job_id: str, csv_path: str, form_data: dict, request=None,
+                priority=ScheduledJob.PRIORITY_INTERACTIVE):
+    """
+    _enqueue_job() for a view: priority and the request's client key order
+    the job against other clients' jobs in the queue.
+    Returns None on success, or an error Response (503 when the queue is full,
+    in which case the job directory is removed again).
+    """
+    try:
+        _enqueue_job(job_id, csv_path, form_data, _client_key(request) if request is not None else "", priority)
+    except QueueFull:
+        response = Response({"error": QUEUE_FULL_MESSAGE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = str(SUBMIT_RETRY_AFTER)
+        return response
+    return None
+
+
+def parse_smiles_request(payload, has_files: bool = False):
+    """
+    Validate a single-prediction request body (shared by the sync and async views).
+    Returns (job, None), where job has the validated smiles / receptor_seq, the
+    job CSV bytes, the row ID and the pipeline form fields (minus job_id), or
+    (None, error message) for a 400 response.
+    """
+    # ------------------------------------------------------------------
+    #  Reject file uploads
+    # ------------------------------------------------------------------
+    if has_files:
+        return None, "File uploads are not allowed. Send JSON or form fields (no files)."
+
+    # Reject arrays
+    if any(isinstance(payload.get(k), (list, tuple)) for k in ("smiles", "sequence", "mutated_sequence")):
+        return None, "Array values are not allowed."
+
+    # ------------------------------------------------------------------
+    #  Collect Column Names
+    # ------------------------------------------------------------------
+    lig_col_name = payload.get("lig_smiles_col", DEFAULT_LIG_COL)
+    rec_col_name = payload.get("rec_seq_col", DEFAULT_REC_COL)
+    lig_id_col_name = payload.get("lig_id_col", DEFAULT_LIG_ID_COL)
+    rec_id_col_name = payload.get("rec_id_col", DEFAULT_REC_ID_COL)
+    lr_id_col_name = payload.get("lr_id_col", DEFAULT_LR_ID_COL)
+
+    # ------------------------------------------------------------------
+    #  Validate SMILES
+    # ------------------------------------------------------------------
+    smiles = payload.get("smiles")
+    if not smiles or not isinstance(smiles, str) or not smiles.strip():
+        return None, "'smiles' is required."
+
+    smiles = smiles.strip()
+    error = validate_smiles(smiles)
+    if error:
+        return None, error
+
+    # ------------------------------------------------------------------
+    #  Validate Receptor Sequence
+    # ------------------------------------------------------------------
+    receptor_seq = payload.get("sequence") or payload.get("mutated_sequence") or ""
+    if isinstance(receptor_seq, str):
+        receptor_seq = receptor_seq.strip()
+        if receptor_seq:
+            error = validate_receptor_sequence(receptor_seq)
+            if error:
+                return None, error
+    else:
+        receptor_seq = ""
+
+    # ------------------------------------------------------------------
+    #  IDs
+    # ------------------------------------------------------------------
+    lr_id_value = payload.get("id") or payload.get("lr_id") or payload.get("lr_id_value") or "1"
+    lr_id_value = lr_id_value.strip()
+
+    ligand_id = payload.get("temp_ligand_id") or payload.get(lig_id_col_name) or ""
+    ligand_id = ligand_id.strip() if isinstance(ligand_id, str) else ""
+    if not ligand_id:
+        ligand_name = payload.get("ligand_name") or ""
+        sanitized = _sanitize_identifier(ligand_name)
+        ligand_id = sanitized if sanitized else "lig_1"
+
+    rec_id = payload.get("temp_rec_id") or payload.get(rec_id_col_name) or ""
+    rec_id = rec_id.strip() if isinstance(rec_id, str) else ""
+    if not rec_id:
+        receptor_name = payload.get("receptor_name") or ""
+        sanitized = _sanitize_identifier(receptor_name)
+        rec_id = sanitized if sanitized else "TRec1"
+
+    # ------------------------------------------------------------------
+    #  Build CSV
+    # ------------------------------------------------------------------
+    csv_buf = io.StringIO()
+    writer = csv.writer(csv_buf, lineterminator="\n")
+    header = [lr_id_col_name, lig_id_col_name, lig_col_name, rec_col_name, rec_id_col_name]
+    writer.writerow(header)
+    writer.writerow([lr_id_value, ligand_id, smiles, receptor_seq or "", rec_id])
+    csv_bytes = csv_buf.getvalue().encode("utf-8")
+    csv_buf.close()
+
+    return {
+        "smiles": smiles,
+        "receptor_seq": receptor_seq,
+        "lr_id_value": lr_id_value,
+        "lr_id_col": lr_id_col_name,
+        "csv_bytes": csv_bytes,
+        "form_data": {
+            "lig_smiles_col": lig_col_name,
+            "rec_seq_col": rec_col_name if receptor_seq else "",
+            "lig_id_col": lig_id_col_name,
+            "rec_id_col": rec_id_col_name,
+            "lr_id_col": lr_id_col_name,
+        },
+    }, None
 
 
 # ----------------------------------------------------------------------
@@ -59,213 +268,409 @@ _RECEPTOR_AA_RE = re.compile(r'^[ARNDCQEGHILKMFPSTWYV]+$', re.I)
 
 class SmilesPredictionAPIView(APIView):
     """
-    POST:
+    POST /api/predict/smiles/:
       - smiles (required)
       - sequence (optional)
     Produces a CSV with:
        ID,Temp_Ligand_ID,SMILES,Mutated_Sequence,TempRecID
-    Saves CSV to JOB_DATA_DIR/<job_id>/<job_id>.csv
-    Submits multipart/form-data to pipeline asynchronously.
+    Saves CSV to <job dir>/<job_id>.csv (JOB_DATA_DIR/<job_id>/ or, sharded, JOB_DATA_DIR/ab/cd/<job_id>/)
+    Submits multipart/form-data to pipeline via the shared submission pool
+    (503 + Retry-After when its queue is full).
     """
 
     def post(self, request):
-        payload = request.data or {}
+        job, error = parse_smiles_request(request.data or {}, bool(request.FILES))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        smiles, receptor_seq, csv_bytes = job["smiles"], job["receptor_seq"], job["csv_bytes"]
+        lr_id_value, lr_id_col_name = job["lr_id_value"], job["lr_id_col"]
 
         # ------------------------------------------------------------------
-        #  Reject file uploads
+        #  Curated dataset: pairs with measured data
         # ------------------------------------------------------------------
-        if request.FILES:
+        curated = _curated_records(smiles, receptor_seq)
+        if curated and CURATED_LOOKUP_MODE == "instead":
             return Response(
-                {"error": "File uploads are not allowed. Send JSON or form fields (no files)."},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"job_id": None, "message": "Pair found in the curated EvOlf dataset.", "curated": curated},
+                status=status.HTTP_200_OK,
             )
 
-        # Reject arrays
-        if any(isinstance(payload.get(k), (list, tuple)) for k in ("smiles", "sequence", "mutated_sequence")):
-            return Response({"error": "Array values are not allowed."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # ------------------------------------------------------------------
-        #  Collect Column Names
-        # ------------------------------------------------------------------
-        lig_col_name = payload.get("lig_smiles_col", DEFAULT_LIG_COL)
-        rec_col_name = payload.get("rec_seq_col", DEFAULT_REC_COL)
-        lig_id_col_name = payload.get("lig_id_col", DEFAULT_LIG_ID_COL)
-        rec_id_col_name = payload.get("rec_id_col", DEFAULT_REC_ID_COL)
-        lr_id_col_name = payload.get("lr_id_col", DEFAULT_LR_ID_COL)
-
-        # ------------------------------------------------------------------
-        #  Validate SMILES
-        # ------------------------------------------------------------------
-        smiles = payload.get("smiles")
-        if not smiles or not isinstance(smiles, str) or not smiles.strip():
-            return Response({"error": "'smiles' is required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        smiles = smiles.strip()
-        
-        # Check SMILES length
-        if len(smiles) > MAX_SMILES_LENGTH:
-            return Response(
-                {"error": f"Ligand SMILES exceeds the maximum limit of {MAX_SMILES_LENGTH}.Please provide a shorter SMILES "},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if re.search(r"\s", smiles):
-            return Response({"error": "SMILES contains whitespace."}, status=status.HTTP_400_BAD_REQUEST)
-        if not _SMILES_ALLOWED_RE.match(smiles):
-            return Response({"error": "Invalid SMILES characters."}, status=status.HTTP_400_BAD_REQUEST)
+        job_id = str(uuid.uuid4())
 
         # ------------------------------------------------------------------
-        #  Validate Receptor Sequence
+        #  Result cache: completed hit, or coalesce onto an identical run
         # ------------------------------------------------------------------
-        receptor_seq = payload.get("sequence") or payload.get("mutated_sequence") or ""
-        if isinstance(receptor_seq, str):
-            receptor_seq = receptor_seq.strip()
-            if receptor_seq.startswith(">"):
-                return Response(
-                    {"error": "FASTA format is not allowed."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            if receptor_seq:
-                # Check receptor sequence length
-                if len(receptor_seq) > MAX_RECEPTOR_LENGTH:
-                    return Response(
-                        {"error": f"Receptor sequence exceeds the maximum allowed length of {MAX_RECEPTOR_LENGTH}.Please provide a shorter sequence."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                if re.search(r"\s", receptor_seq):
-                    return Response({"error": "Receptor sequence contains whitespace."},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                
-                # Check for valid amino acids only
-                if not _RECEPTOR_AA_RE.match(receptor_seq):
+        key = flight = None
+        if RESULT_CACHE_ENABLED:
+            key = result_cache.cache_key(smiles, receptor_seq or "")
+            if result_cache.lookup(key):
+                try:
+                    _write_cached_job(job_id, csv_bytes, key, lr_id_value, lr_id_col_name)
+                except Exception as e:
+                    if DEBUG_LOG:
+                        print(f"[SMILES] Cache hit could not be materialised ({e}); running pipeline")
+                else:
                     return Response(
-                        {"error": f"Invalid characters detected in the receptor sequence. Please use only the 20 standard amino acids (A, C, D, E, F, G, H, I, K, L, M, N, P, Q, R, S, T, V, W, Y)."},
-                        status=status.HTTP_400_BAD_REQUEST
+                        _with_curated({"job_id": job_id, "message": "Prediction served from cache.", "cached": True},
+                                      curated),
+                        status=status.HTTP_200_OK,
                     )
-        else:
-            receptor_seq = ""
+            flight = result_cache.inflight_key(key, csv_bytes)
+            existing_job = result_cache.claim_inflight(flight, job_id)
+            if existing_job:
+                return Response(
+                    _with_curated({"job_id": existing_job, "message": "Identical prediction already in progress.",
+                                   "coalesced": True}, curated),
+                    status=status.HTTP_200_OK,
+                )
 
         # ------------------------------------------------------------------
-        #  IDs
+        #  Save CSV to disk (atomic; fsync happens in the submission stage)
         # ------------------------------------------------------------------
-        lr_id_value = payload.get("id") or payload.get("lr_id") or payload.get("lr_id_value") or "1"
-        lr_id_value = lr_id_value.strip()
-
-        ligand_id = payload.get("temp_ligand_id") or payload.get(lig_id_col_name) or ""
-        ligand_id = ligand_id.strip() if isinstance(ligand_id, str) else ""
-        if not ligand_id:
-            ligand_name = payload.get("ligand_name") or ""
-            sanitized = _sanitize_identifier(ligand_name)
-            ligand_id = sanitized if sanitized else "lig_1"
-
-        rec_id = payload.get("temp_rec_id") or payload.get(rec_id_col_name) or ""
-        rec_id = rec_id.strip() if isinstance(rec_id, str) else ""
-        if not rec_id:
-            receptor_name = payload.get("receptor_name") or ""
-            sanitized = _sanitize_identifier(receptor_name)
-            rec_id = sanitized if sanitized else "TRec1"
+        try:
+            csv_path = write_job_input(job_id, csv_bytes)
+            if key:
+                write_submission_state(os.path.dirname(csv_path), cacheKey=key, inflightKey=flight)
+        except Exception as e:
+            if DEBUG_LOG:
+                print(f"[SMILES] Error saving CSV: {e}")
+            if flight:
+                result_cache.release_inflight(flight, job_id)
+            return Response({"error": "Failed to save CSV to disk."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # ------------------------------------------------------------------
-        #  Build CSV
+        #  Async pipeline submission
         # ------------------------------------------------------------------
-        csv_buf = io.StringIO()
-        writer = csv.writer(csv_buf, lineterminator="\n")
-        header = [lr_id_col_name, lig_id_col_name, lig_col_name, rec_col_name, rec_id_col_name]
-        writer.writerow(header)
-        writer.writerow([lr_id_value, ligand_id, smiles, receptor_seq or "", rec_id])
-        csv_bytes = csv_buf.getvalue().encode("utf-8")
-        csv_buf.close()
+        if not PREDICT_DOCKER_URL:
+            if flight:
+                result_cache.release_inflight(flight, job_id)
+            return Response({"error": "Pipeline URL not configured"},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        form_data = {"job_id": job_id, **job["form_data"]}
+        error_response = _submit_job(job_id, csv_path, form_data, request)
+        if error_response is not None:
+            if flight:
+                result_cache.release_inflight(flight, job_id)
+            return error_response
 
         # ------------------------------------------------------------------
-        #  Save CSV to disk (with sync + stability wait)
+        #  Return response
         # ------------------------------------------------------------------
-        job_id = str(uuid.uuid4())
-        csv_filename = f"{job_id}.csv"
+        return Response(
+            _with_curated({"job_id": job_id, "message": "Job submitted to pipeline asynchronously."}, curated),
+            status=status.HTTP_200_OK,
+        )
 
-        try:
-            job_dir = os.path.join(JOB_DATA_DIR or "/tmp/smiles_jobs", job_id)
+# ----------------------------------------------------------------------
+# Batch submission
+# ----------------------------------------------------------------------
 
-            # ensure dir exists, then wait until fs shows it
-            os.makedirs(job_dir, exist_ok=True)
-            for _ in range(50):  # ~500 ms
-                if os.path.isdir(job_dir):
-                    break
-                time.sleep(0.01)
+# Per-row errors reported back in one response (the rest are counted)
+MAX_REPORTED_ERRORS = 100
 
-            csv_path = os.path.join(job_dir, csv_filename)
 
-            # Write with flush & fsync
-            with open(csv_path, "wb") as fh:
-                fh.write(csv_bytes)
-                fh.flush()
-                os.fsync(fh.fileno())
+def _stripped(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
 
-            # wait for file size > 0
-            for _ in range(50):  # ~500 ms
-                if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
-                    break
-                time.sleep(0.01)
 
-            if DEBUG_LOG:
-                print(f"[SMILES] Final CSV saved & flushed: {csv_path} (size={os.path.getsize(csv_path)})")
+def _iter_json_rows(items):
+    """Yield row dicts from a JSON array of {"smiles", "sequence", "id", ...} objects or plain SMILES strings."""
+    for item in items:
+        if isinstance(item, str):
+            yield {"smiles": item}
+        elif isinstance(item, dict):
+            yield item
+        else:
+            yield {}
+
+
+def _iter_csv_rows(upload, lig_col, rec_col, lr_id_col, lig_id_col, rec_id_col):
+    """Stream-parse an uploaded CSV into the same row dicts as the JSON form."""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text):
+            yield {
+                "smiles": row.get(lig_col),
+                "sequence": row.get(rec_col),
+                "id": row.get(lr_id_col),
+                "temp_ligand_id": row.get(lig_id_col),
+                "temp_rec_id": row.get(rec_id_col),
+            }
+    finally:
+        text.detach()
+
+
+def _row_ids(supplied, first, prefix: str) -> list:
+    """
+    Per-row ligand/receptor IDs: the supplied one, else prefix + the 1-based
+    row of the first equal value. A generated ID that the request also
+    supplies itself gets a _2, _3, ... suffix, so it never names another molecule.
+    """
+    supplied = [str(value or "").strip() for value in supplied]
+    taken = set(supplied)
+    generated = {}
+    ids = []
+    for value, group in zip(supplied, first):
+        if not value:
+            value = generated.get(group)
+            if value is None:
+                base = value = f"{prefix}{group + 1}"
+                suffix = 1
+                while value in taken:
+                    suffix += 1
+                    value = f"{base}_{suffix}"
+                taken.add(value)
+                generated[group] = value
+        ids.append(value)
+    return ids
+
+
+class BatchPredictionAPIView(APIView):
+    """
+    POST /api/predict/batch/
+      - JSON: {"items": [{"smiles", "sequence"?, "id"?, "temp_ligand_id"?, "temp_rec_id"?}, ...]}
+        (items may also be plain SMILES strings)
+      - multipart: file=<CSV> with columns named by lig_smiles_col / rec_seq_col /
+        lr_id_col / lig_id_col / rec_id_col (same defaults as the single endpoint)
+    Accepts up to MAX_BATCH_ROWS rows, validates every row with the single-SMILES
+    rules (vectorised, core.services.input_validation), writes ONE multi-row job CSV
+    and submits ONE pipeline job. Repeated ligands/receptors share generated IDs
+    (never one the request supplies itself) and repeated pairs are predicted once;
+    their results are filled in from the first row.
+    """
 
-        except Exception as e:
-            if DEBUG_LOG:
-                print(f"[SMILES] Error saving CSV: {e}")
-            return Response({"error": "Failed to save CSV to disk."},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request):
+        payload = request.data or {}
+        options = payload if isinstance(payload, dict) else {}
+        max_rows = getattr(settings, "MAX_BATCH_ROWS", 1000)
+
+        lig_col_name = options.get("lig_smiles_col", DEFAULT_LIG_COL)
+        rec_col_name = options.get("rec_seq_col", DEFAULT_REC_COL)
+        lig_id_col_name = options.get("lig_id_col", DEFAULT_LIG_ID_COL)
+        rec_id_col_name = options.get("rec_id_col", DEFAULT_REC_ID_COL)
+        lr_id_col_name = options.get("lr_id_col", DEFAULT_LR_ID_COL)
 
         # ------------------------------------------------------------------
-        #  Async pipeline submission
+        #  Row source: uploaded CSV (streamed) or JSON array
+        # ------------------------------------------------------------------
+        upload = request.FILES.get("file") or request.FILES.get("input_file")
+        if upload is not None:
+            rows = _iter_csv_rows(upload, lig_col_name, rec_col_name, lr_id_col_name, lig_id_col_name, rec_id_col_name)
+        else:
+            items = options.get("items") if options else payload
+            if not isinstance(items, list) or not items:
+                return Response({"error": "Provide a non-empty 'items' array or upload a CSV as 'file'."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            rows = _iter_json_rows(items)
+
         # ------------------------------------------------------------------
+        #  Validate all rows at once (input_validation: byte lookup tables)
+        # ------------------------------------------------------------------
+        try:
+            rows = list(itertools.islice(rows, max_rows + 1))
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"Could not parse CSV: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > max_rows:
+            return Response({"error": f"Too many rows: at most {max_rows} rows are allowed per batch job."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        smiles = [_stripped(row.get("smiles")) for row in rows]
+        sequences = [_stripped(row.get("sequence") or row.get("mutated_sequence")) for row in rows]
+        row_ids = [str(row.get("id") or index).strip() for index, row in enumerate(rows, start=1)]
+
+        errors = [
+            {"row": index, "error": error}
+            for index, error in enumerate(batch_errors(smiles, sequences, row_ids), start=1) if error
+        ]
+        if errors:
+            return Response({"error": f"{len(errors)} invalid row(s).", "rows": errors[:MAX_REPORTED_ERRORS]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not rows:
+            return Response({"error": "No rows to predict."}, status=status.HTTP_400_BAD_REQUEST)
+        with_sequence = sum(1 for seq in sequences if seq)
+        if with_sequence not in (0, len(rows)):
+            return Response({"error": "Either every row or no row must have a receptor sequence."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # ------------------------------------------------------------------
+        #  Deduplicate: repeated ligands / receptors share one generated
+        #  Temp_Ligand_ID / TempRecID, and a repeated (ligand, receptor) pair
+        #  is sent to the pipeline once
+        # ------------------------------------------------------------------
+        ligand_first = first_occurrence(smiles)
+        receptor_first = first_occurrence(sequences)
+        pair_first = first_occurrence([f"{lig}\n{seq}" for lig, seq in zip(smiles, sequences)])
+
+        ligand_ids = _row_ids([row.get("temp_ligand_id") for row in rows], ligand_first, "lig_")
+        receptor_ids = _row_ids([row.get("temp_rec_id") for row in rows], receptor_first, "TRec")
+
+        header = [lr_id_col_name, lig_id_col_name, lig_col_name, rec_col_name, rec_id_col_name]
+        pipeline_buf, request_buf = io.StringIO(), io.StringIO()
+        pipeline_writer = csv.writer(pipeline_buf, lineterminator="\n")
+        request_writer = csv.writer(request_buf, lineterminator="\n")
+        pipeline_writer.writerow(header)
+        request_writer.writerow(header + [PIPELINE_ID_COLUMN])
+        unique_rows = 0
+        for i, row in enumerate(rows):
+            values = [row_ids[i], ligand_ids[i], smiles[i], sequences[i], receptor_ids[i]]
+            first = pair_first[i]
+            if first == i:
+                pipeline_writer.writerow(values)
+                unique_rows += 1
+            request_writer.writerow(values + ["" if first == i else row_ids[first]])
+        csv_bytes = pipeline_buf.getvalue().encode("utf-8")
+        # the full request is only needed to expand results when rows were dropped
+        request_bytes = request_buf.getvalue().encode("utf-8") if unique_rows < len(rows) else None
+
         if not PREDICT_DOCKER_URL:
             return Response({"error": "Pipeline URL not configured"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        pipeline_url = PREDICT_DOCKER_URL
+        job_id = str(uuid.uuid4())
+        try:
+            if request_bytes is not None:
+                write_job_input(job_id, request_bytes, filename=REQUEST_FILENAME)
+            csv_path = write_job_input(job_id, csv_bytes)
+        except Exception as e:
+            if DEBUG_LOG:
+                print(f"[BATCH] Error saving CSV: {e}")
+            return Response({"error": "Failed to save CSV to disk."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         form_data = {
             "job_id": job_id,
             "lig_smiles_col": lig_col_name,
-            "rec_seq_col": rec_col_name if receptor_seq else "",
+            "rec_seq_col": rec_col_name if with_sequence else "",
             "lig_id_col": lig_id_col_name,
             "rec_id_col": rec_id_col_name,
             "lr_id_col": lr_id_col_name,
         }
+        priority = ScheduledJob.PRIORITY_BULK if unique_rows > 1 else ScheduledJob.PRIORITY_INTERACTIVE
+        error_response = _submit_job(job_id, csv_path, form_data, request, priority=priority)
+        if error_response is not None:
+            return error_response
 
-        def async_submit():
-            try:
-                if DEBUG_LOG:
-                    print(f"[ASYNC] Submitting job {job_id} -> {pipeline_url}")
-
-                with open(csv_path, "rb") as fh:
-                    files = {"input_file": (csv_filename, fh, "text/csv")}
-                    resp = requests.post(pipeline_url, data=form_data, files=files, timeout=30)
+        return Response(
+            {"job_id": job_id, "rows": len(rows), "unique_rows": unique_rows,
+             "message": "Batch job submitted to pipeline asynchronously."},
+            status=status.HTTP_200_OK,
+        )
 
-                if DEBUG_LOG:
-                    print(f"[ASYNC] Pipeline responded {resp.status_code} for job {job_id}")
+# ----------------------------------------------------------------------
+# Ligand x receptor screens
+# ----------------------------------------------------------------------
 
-            except Exception as e:
-                if DEBUG_LOG:
-                    print(f"[ASYNC] Error submitting job {job_id}: {e}")
+def _pair_indices(pairs, ligand_count: int, receptor_count: int):
+    """[(ligand index, receptor index), ...] from a JSON [[i, j], ...] array, or None if malformed."""
+    indices = []
+    for pair in pairs:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            return None
+        i, j = pair
+        if not isinstance(i, int) or not isinstance(j, int) or isinstance(i, bool) or isinstance(j, bool):
+            return None
+        if not (0 <= i < ligand_count and 0 <= j < receptor_count):
+            return None
+        indices.append((i, j))
+    return indices
+
+
+class ScreeningPredictionAPIView(APIView):
+    """
+    POST /api/predict/screen/
+      {"ligands": ["<SMILES>", ...], "receptors": ["<sequence>", ...], "pairs"?: [[i, j], ...]}
+    Screens every ligand against every receptor, or only the listed
+    (ligand index, receptor index) pairs. Each unique ligand and receptor is
+    written once with a content-hash Temp_Ligand_ID / TempRecID
+    (core.services.screening_jobs), so the job scales with M + N; results
+    have one row per pair, ID "<Temp_Ligand_ID>_<TempRecID>". Unless the
+    pipeline supports the screen format (SCREEN_JOB_FORMAT_SUPPORTED), the
+    pairs are expanded into the legacy single-table job CSV instead.
+    """
 
-        threading.Thread(target=async_submit, daemon=True).start()
+    def post(self, request):
+        payload = request.data if isinstance(request.data, dict) else {}
+        ligands, receptors = payload.get("ligands"), payload.get("receptors")
+        if not isinstance(ligands, list) or not ligands or not isinstance(receptors, list) or not receptors:
+            return Response({"error": "Provide non-empty 'ligands' and 'receptors' arrays."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        max_ligands = getattr(settings, "MAX_SCREEN_LIGANDS", 1000)
+        max_receptors = getattr(settings, "MAX_SCREEN_RECEPTORS", 50)
+        max_pairs = getattr(settings, "MAX_SCREEN_PAIRS", 10000)
+        if len(ligands) > max_ligands or len(receptors) > max_receptors:
+            return Response({"error": f"At most {max_ligands} ligands and {max_receptors} receptors are allowed per screen."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         # ------------------------------------------------------------------
-        #  Optional scheduler
+        #  Validate both sets (vectorised, core.services.input_validation)
         # ------------------------------------------------------------------
-        if ENABLE_SCHEDULER:
-            try:
-                schedule_job(job_id, lambda j: None)
-            except Exception as e:
-                if DEBUG_LOG:
-                    print(f"[SCHEDULER] Failed: {e}")
+        ligands = [_stripped(v) for v in ligands]
+        receptors = [_stripped(v) for v in receptors]
+        errors = [
+            {"ligand": index, "error": error}
+            for index, error in enumerate(smiles_errors(ligands)) if error
+        ] + [
+            {"receptor": index, "error": error or "Receptor sequence is required."}
+            for index, error in enumerate(receptor_errors(receptors)) if error or not receptors[index]
+        ]
+        if errors:
+            return Response({"error": f"{len(errors)} invalid input(s).", "inputs": errors[:MAX_REPORTED_ERRORS]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        pairs = payload.get("pairs")
+        if pairs is not None:
+            pairs = _pair_indices(pairs, len(ligands), len(receptors)) if isinstance(pairs, list) else None
+            if not pairs:
+                return Response({"error": "'pairs' must be a non-empty array of [ligand index, receptor index]."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        if pairs is None:
+            pair_count = len(set(ligands)) * len(set(receptors))
+        else:
+            pair_count = len({(ligands[i], receptors[j]) for i, j in pairs})
+        if pair_count > max_pairs:
+            return Response({"error": f"Too many pairs: at most {max_pairs} ligand/receptor pairs are allowed per screen."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not PREDICT_DOCKER_URL:
+            return Response({"error": "Pipeline URL not configured"},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # ------------------------------------------------------------------
-        #  Return response
+        #  ligands.csv + receptors.csv + pair table -> one pipeline job
+        #  (one expanded legacy CSV when the pipeline lacks the screen format)
         # ------------------------------------------------------------------
+        screen_format = getattr(settings, "SCREEN_JOB_FORMAT_SUPPORTED", False)
+        job_id = str(uuid.uuid4())
+        try:
+            job = build_screening_job(job_id, ligands, receptors, pairs, expand=not screen_format)
+        except Exception as e:
+            if DEBUG_LOG:
+                print(f"[SCREEN] Error saving job files: {e}")
+            shutil.rmtree(get_job_dir(job_id), ignore_errors=True)
+            return Response({"error": "Failed to save job files to disk."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        form_data = {"job_id": job_id}
+        if screen_format:
+            form_data.update(job_format=SCREEN_JOB_FORMAT, ligands_file=LIGANDS_FILENAME,
+                             receptors_file=RECEPTORS_FILENAME)
+        form_data.update({
+            "lig_smiles_col": DEFAULT_LIG_COL,
+            "rec_seq_col": DEFAULT_REC_COL,
+            "lig_id_col": DEFAULT_LIG_ID_COL,
+            "rec_id_col": DEFAULT_REC_ID_COL,
+            "lr_id_col": DEFAULT_LR_ID_COL,
+        })
+        error_response = _submit_job(job_id, job["csv_path"], form_data, request, priority=ScheduledJob.PRIORITY_BULK)
+        if error_response is not None:
+            return error_response
+
         return Response(
-            {"job_id": job_id, "message": "Job submitted to pipeline asynchronously."},
+            {"job_id": job_id, "ligands": job["ligands"], "receptors": job["receptors"], "pairs": job["pairs"],
+             "message": "Screening job submitted to pipeline asynchronously."},
             status=status.HTTP_200_OK,
-        )
\ No newline at end of file
+        )
@@ -3,16 +3,24 @@ Structure utilities and views for EvoLF dataset details.
 Includes:
 1. format_dataset_detail() – formats dataset detail response
 2. FetchLocalStructureAPIView – fetches local ligand & receptor structures
+3. StructureFileAPIView – serves one raw structure file with HTTP caching
+4. MediaStructureFileView – /media/ route for structure files (precompressed variants)
+5. StructureArraysAPIView – binary (.npz) receptor coordinates, full or CA-only
 """
 
 import os
 import math
+from functools import lru_cache
 from typing import Dict, Optional
 from django.conf import settings
+from django.http import Http404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from core.services.file_serving import serve_file
+from core.services.media_manifest import MEDIA_DIRS, get_media_manifest
+
 
 def _sanitize_scalar(v):
     """Return JSON-safe scalar (convert NaN/Inf to None)."""
@@ -25,9 +33,9 @@ def _sanitize_scalar(v):
 
 
 def read_file_safe(path: str) -> str:
-    """Return file contents if exists, else empty string."""
+    """Return file contents if readable, else empty string."""
     try:
-        if path and os.path.exists(path):
+        if path:
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
                 return f.read()
     except Exception:
@@ -35,132 +43,221 @@ def read_file_safe(path: str) -> str:
     return ""
 
 
-def _choose_existing(base_root: str, *relpaths) -> Optional[str]:
-    """Return first existing absolute path among relpaths, else None."""
-    for rel in relpaths:
-        abs_path = os.path.join(base_root, rel)
-        if os.path.exists(abs_path):
-            return abs_path
-    return None
-
-
-# ============================================================
-# 1️⃣ FORMATTER FUNCTION
-# ============================================================
-
-def format_dataset_detail(entry: Dict, request=None) -> Dict:
+def _normalize_key(key: str) -> str:
+    """Key form used for matching: lowercase, no padding, commas or spaces."""
+    return key.strip().lower().replace(",", "").replace(" ", "")
+
+
+# Detail field -> accepted source column names, in priority order
+DETAIL_FIELD_SOURCES = {
+    "evolfId": ("EvOlf ID", "EvOlf_ID", "evolfId"),
+    "receptor": ("Receptor",),
+    "ligand": ("Ligand",),
+    "species": ("Species",),
+    "class": (" Class",),
+    "mutation": ("Mutation",),
+    "mutationStatus": ("Mutation Status",),
+    "mutationImpact": ("Mutation Impact",),
+    "receptorSubtype": ("Receptor SubType",),
+    "uniprotId": ("UniProt ID",),
+    "uniprotLink": ("UniProt_Link",),
+    "chemblId": ("ChEMBL ID",),
+    "chemblLink": ("ChEMBL Link",),
+    "cid": ("CID",),
+    "pubchemLink": ("PubChem_Link",),
+    "smiles": ("SMILES",),
+    "inchi": ("InChi",),
+    "inchiKey": ("InChiKey",),
+    "iupacName": ("IUPAC Name",),
+    "sequence": ("Sequence",),
+    "expressionSystem": ("Expression System",),
+    "value": ("Value",),
+    "method": ("Method",),
+    "comments": ("Comment",),
+    "sourceLinks": ("Source_Links",),
+    "source": ("Source",),
+}
+
+
+@lru_cache(maxsize=64)
+def compile_field_map(columns: tuple) -> Dict[str, tuple]:
     """
-    Prepare structured dataset detail response for a single EvoLF entry.
+    Resolve DETAIL_FIELD_SOURCES against a dataset schema once.
+    Returns detail field -> tuple of actual column names to try, in order.
     """
-    def gf(*keys):
-        """Robust getter that handles whitespace, commas, capitalization, and weird key variants."""
-        norm_entry = {k.strip().lower().replace(",", "").replace(" ", ""): v for k, v in entry.items()}
-        for k in keys:
-            if not k:
-                continue
-            nk = k.strip().lower().replace(",", "").replace(" ", "")
-            v = norm_entry.get(nk)
+    lookup = {}
+    for col in columns:
+        lookup[_normalize_key(col)] = col  # later duplicates win, as before
+
+    field_map = {}
+    for field, sources in DETAIL_FIELD_SOURCES.items():
+        cols = []
+        for source in sources:
+            col = lookup.get(_normalize_key(source))
+            if col is not None and col not in cols:
+                cols.append(col)
+        field_map[field] = tuple(cols)
+    return field_map
+
+
+def resolve_detail_fields(entry: Dict, field_map: Optional[Dict[str, tuple]] = None) -> Dict[str, str]:
+    """Return detail field -> stripped string value ("" when missing/empty) for one entry."""
+    if field_map is None:
+        field_map = compile_field_map(tuple(entry.keys()))
+
+    values = {}
+    for field, cols in field_map.items():
+        value = ""
+        for col in cols:
+            v = entry.get(col)
             if v in [None, "", "nan"]:
                 continue
-            return str(v).strip()
-        return ""
+            value = str(v).strip()
+            break
+        values[field] = value
+    return values
 
 
-    evolf_id = gf("EvOlf ID", "EvOlf_ID", "evolfId")
-    if not evolf_id:
-        return {"error": "Missing EvOlf_ID"}
+def build_url(rel_path: str) -> str:
+    """
+    Build URL for a media file.
+    Uses BASE_URL from environment if present, otherwise falls back to a relative path.
+    """
+    base_url = os.getenv("BASE_URL")  # e.g., "http://192.168.24.13:3000"
+    if base_url:
+        base_url = base_url.rstrip("/")
+        media_url = settings.MEDIA_URL if settings.MEDIA_URL.endswith("/") else settings.MEDIA_URL + "/"
+        return f"{base_url}{media_url}{rel_path}"
 
-    media_root = settings.MEDIA_ROOT
+    # fallback: relative path if no BASE_URL
+    return f"/media/{rel_path}"
 
-    pdb_candidates = [f"pdb_files/{evolf_id}.pdb", f"pdf_files/{evolf_id}.pdb"]
-    sdf_file = f"sdf_files/{evolf_id}.sdf"
-    img_file = f"smiles_2d/{evolf_id}.png"
 
-    pdb_path = _choose_existing(media_root, *pdb_candidates)
-    sdf_path = os.path.join(media_root, sdf_file)
-    img_path = os.path.join(media_root, img_file)
+def structure_version(media_file) -> str:
+    """The ?v= token of a file's structure URL: changes whenever the file does."""
+    return f"{int(media_file.mtime)}-{media_file.size}"
 
-    pdb_text = read_file_safe(pdb_path) if pdb_path else ""
-    sdf_text = read_file_safe(sdf_path) if os.path.exists(sdf_path) else ""
 
-    # Helper to build absolute URLs
-    
+def is_current_version(request, media_file) -> bool:
+    """Whether the request names the file's current version (only then is the response immutable)."""
+    return request.query_params.get("v") == structure_version(media_file)
+
+
+def build_structure_url(evolf_id: str, kind: str, media_file) -> str:
+    """
+    URL of the cacheable structure endpoint for one file.
+    The ?v= token changes whenever the file does, so responses can be immutable.
+    """
+    path = f"/api/structures/{evolf_id}/{kind}/?v={structure_version(media_file)}"
+    base_url = os.getenv("BASE_URL")
+    return f"{base_url.rstrip('/')}{path}" if base_url else path
 
-    def build_url(rel_path: str) -> str:
-        """
-        Build URL for a media file.
-        Uses BASE_URL from environment if present, otherwise falls back to request or relative path.
-        """
-        base_url = os.getenv("BASE_URL")  # e.g., "http://192.168.24.13:3000"
-        if base_url:
-            base_url = base_url.rstrip("/")
-            media_url = settings.MEDIA_URL if settings.MEDIA_URL.endswith("/") else settings.MEDIA_URL + "/"
-            return f"{base_url}{media_url}{rel_path}"
 
-        # fallback: relative path if no BASE_URL
-        return f"/media/{rel_path}"
+# ============================================================
+# 1️⃣ FORMATTER FUNCTION
+# ============================================================
 
+def format_dataset_detail(entry: Dict, request=None, field_map: Optional[Dict[str, tuple]] = None,
+                          inline_structures: bool = True) -> Dict:
+    """
+    Prepare structured dataset detail response for a single EvoLF entry.
+    field_map may be passed in from compile_field_map(); otherwise it is
+    looked up (and cached) from the entry's own keys.
+    With inline_structures=False, pdbData/sdfData are left out and a
+    "structureFiles" map of URLs and sizes is returned instead.
+    """
+    fields = resolve_detail_fields(entry, field_map)
 
-   
+    evolf_id = fields["evolfId"]
+    if not evolf_id:
+        return {"error": "Missing EvOlf_ID"}
+
+    # File availability comes from the in-memory manifest (no per-request stats)
+    media = get_media_manifest().lookup(evolf_id)
+    pdb_file, sdf_file, img_file = media["pdb"], media["sdf"], media["png"]
+
+    pdb_text = read_file_safe(pdb_file.path) if pdb_file and inline_structures else ""
+    sdf_text = read_file_safe(sdf_file.path) if sdf_file and inline_structures else ""
 
     # Extract IDs and mutation info
-    uniprot_id = gf("UniProt ID") 
-    chembl_id = gf("ChEMBL ID") 
-    cid_raw = gf("CID")
+    uniprot_id = fields["uniprotId"]
+    chembl_id = fields["chemblId"]
+    cid_raw = fields["cid"]
     cid = str(cid_raw).split(".")[0] if cid_raw else ""
 
     
     
     # Structure URLs
-    structure2d_url = build_url(img_file) if os.path.exists(img_path) else ""
-    chosen_pdb_rel = next((p for p in pdb_candidates if os.path.exists(os.path.join(media_root, p))), None)
-    structure3d_url = build_url(chosen_pdb_rel) if chosen_pdb_rel else ""
-    sdf_file_url = build_url(sdf_file) if os.path.exists(sdf_path) else ""
+    structure2d_url = build_url(img_file.relpath) if img_file else ""
+    structure3d_url = build_url(pdb_file.relpath) if pdb_file else ""
+    sdf_file_url = build_url(sdf_file.relpath) if sdf_file else ""
 
     formatted = {
         "evolfId": str(evolf_id),
-        "receptor": gf("Receptor") or "",
-        "receptorName": gf("Receptor") or "",
-        "ligand": gf("Ligand") or "",
-        "ligandName": gf("Ligand") or "",
-        "species": gf("Species") or "",
-        "class": gf(" Class") or "",
-        "mutation": gf("Mutation") or "",
-        "mutationStatus": gf("Mutation Status"),
-        "mutationImpact": gf("Mutation Impact") or "",
-        "receptorSubtype": gf("Receptor SubType"),
+        "receptor": fields["receptor"] or "",
+        "receptorName": fields["receptor"] or "",
+        "ligand": fields["ligand"] or "",
+        "ligandName": fields["ligand"] or "",
+        "species": fields["species"] or "",
+        "class": fields["class"] or "",
+        "mutation": fields["mutation"] or "",
+        "mutationStatus": fields["mutationStatus"],
+        "mutationImpact": fields["mutationImpact"] or "",
+        "receptorSubtype": fields["receptorSubtype"],
         "uniprotId": uniprot_id,
-        "uniprotLink": gf("UniProt_Link"),
+        "uniprotLink": fields["uniprotLink"],
         "chemblId": chembl_id,
-        "chemblLink": gf("ChEMBL Link"),
+        "chemblLink": fields["chemblLink"],
         "pubchemId": cid,
-        "pubchemLink": gf("PubChem_Link"),
-        "smiles": gf("SMILES") or "",
-        "inchi": gf("InChi") or "",
-        "inchiKey": gf("InChiKey") or "",
-        "iupacName": gf("IUPAC Name") or "", 
-        "sequence": gf("Sequence") or "",
+        "pubchemLink": fields["pubchemLink"],
+        "smiles": fields["smiles"] or "",
+        "inchi": fields["inchi"] or "",
+        "inchiKey": fields["inchiKey"] or "",
+        "iupacName": fields["iupacName"] or "", 
+        "sequence": fields["sequence"] or "",
         "pdbData": pdb_text,
         "sdfData": sdf_text,
         "structure2d": structure2d_url,
         "image": structure2d_url,
         "structure3d": structure3d_url,
         "sdfFile": sdf_file_url,
-        "expressionSystem": gf("Expression System") or "",
+        "expressionSystem": fields["expressionSystem"] or "",
         
-        "value": str(gf("Value") or ""),
-        "method": gf("Method") or "",
-        "comments": gf("Comment") or "",
-       "sourceLinks":gf("Source_Links") or "",
-       "source":gf("Source") or "",
+        "value": str(fields["value"] or ""),
+        "method": fields["method"] or "",
+        "comments": fields["comments"] or "",
+       "sourceLinks":fields["sourceLinks"] or "",
+       "source":fields["source"] or "",
 
         
 
     }
 
+    if not inline_structures:
+        del formatted["pdbData"], formatted["sdfData"]
+        formatted["structureFiles"] = {
+            kind: {"url": build_structure_url(evolf_id, kind, media_file), "size": media_file.size}
+            for kind, media_file in media.items() if media_file
+        }
+        for lod, array_id in (("full", evolf_id), ("ca", f"{evolf_id}.ca")):
+            array_file = get_media_manifest().get(array_id, "arrays")
+            if array_file:
+                formatted["structureFiles"][f"arrays_{lod}"] = {
+                    "url": build_structure_url(evolf_id, "arrays", array_file) + f"&lod={lod}",
+                    "size": array_file.size,
+                }
+
     return formatted
 
 
+def wants_inline_structures(request) -> bool:
+    """Detail mode: ?structures=lazy (or {"structures": "lazy"} in a POST body) skips inline PDB/SDF text."""
+    mode = request.query_params.get("structures")
+    if mode is None and isinstance(getattr(request, "data", None), dict):
+        mode = request.data.get("structures")
+    return (mode or "inline").lower() != "lazy"
+
+
 # ============================================================
 # 2️⃣ FETCH LOCAL STRUCTURES
 # ============================================================
@@ -172,15 +269,12 @@ class FetchLocalStructureAPIView(APIView):
     """
     def get(self, request, evolf_id):
         try:
-            media_root = settings.MEDIA_ROOT
-            pdb_candidates = [f"pdb_files/{evolf_id}.pdb", f"pdf_files/{evolf_id}.pdb"]
-            sdf_file = f"sdf_files/{evolf_id}.sdf"
-
-            pdb_abs = _choose_existing(media_root, *pdb_candidates)
-            sdf_abs = os.path.join(media_root, sdf_file)
+            manifest = get_media_manifest()
+            pdb_file = manifest.get(evolf_id, "pdb")
+            sdf_file = manifest.get(evolf_id, "sdf")
 
-            pdb_text = read_file_safe(pdb_abs) if pdb_abs else ""
-            sdf_text = read_file_safe(sdf_abs) if os.path.exists(sdf_abs) else ""
+            pdb_text = read_file_safe(pdb_file.path) if pdb_file else ""
+            sdf_text = read_file_safe(sdf_file.path) if sdf_file else ""
 
             if not pdb_text and not sdf_text:
                 return Response({"error": "No structure files found for this ID."}, status=status.HTTP_404_NOT_FOUND)
@@ -193,3 +287,106 @@ class FetchLocalStructureAPIView(APIView):
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ============================================================
+# 3️⃣ RAW STRUCTURE FILES (cacheable)
+# ============================================================
+
+class StructureFileAPIView(APIView):
+    """
+    GET /api/structures/<evolf_id>/<kind>/   (kind: pdb | sdf | png)
+    Serves the raw file with ETag, Range and gzip support; Cache-Control: immutable
+    only when ?v= is the file's current version token (build_structure_url);
+    any other request revalidates.
+    """
+    CONTENT_TYPES = {
+        "pdb": "chemical/x-pdb",
+        "sdf": "chemical/x-mdl-sdfile",
+        "png": "image/png",
+    }
+
+    def get(self, request, evolf_id, kind):
+        content_type = self.CONTENT_TYPES.get(kind)
+        if not content_type:
+            return Response({"error": f"Unknown structure kind '{kind}'."}, status=status.HTTP_404_NOT_FOUND)
+
+        media_file = get_media_manifest().get(evolf_id, kind)
+        if not media_file:
+            return Response({"error": "No structure file found for this ID."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            return serve_file(
+                request, media_file.path, content_type,
+                size=media_file.size, mtime=media_file.mtime,
+                immutable=is_current_version(request, media_file), filename=os.path.basename(media_file.path),
+                encodings=media_file.encodings, accel_path=media_file.relpath,
+            )
+        except FileNotFoundError:
+            return Response({"error": "No structure file found for this ID."}, status=status.HTTP_404_NOT_FOUND)
+
+
+# ============================================================
+# 4️⃣ /media/ STRUCTURE FILES (precompressed variants)
+# ============================================================
+
+class MediaStructureFileView(APIView):
+    """
+    GET /media/<pdb_files|pdf_files|sdf_files|smiles_2d>/<filename>
+    Same URLs as the DEBUG static() route, but served in every environment with
+    .br/.gz siblings negotiated on Accept-Encoding and X-Accel-Redirect behind nginx.
+    """
+    throttle_classes = []   # static media: not rate limited, like static()
+
+    FOLDER_KINDS = {folder: kind for kind, (folder, _) in MEDIA_DIRS.items()}
+
+    def get(self, request, folder, filename):
+        kind = self.FOLDER_KINDS.get(folder)
+        ext = MEDIA_DIRS[kind][1] if kind else ""
+        if not kind or not filename.endswith(ext):
+            raise Http404("File not found")
+
+        media_file = get_media_manifest().get(filename[: -len(ext)], kind, fallback=False)
+        if not media_file:
+            raise Http404("File not found")
+
+        content_type = StructureFileAPIView.CONTENT_TYPES["pdb" if kind == "pdb_legacy" else kind]
+        try:
+            return serve_file(
+                request, media_file.path, content_type,
+                size=media_file.size, mtime=media_file.mtime,
+                filename=filename, encodings=media_file.encodings, accel_path=media_file.relpath,
+            )
+        except FileNotFoundError:
+            raise Http404("File not found")
+
+
+# ============================================================
+# 5️⃣ BINARY RECEPTOR COORDINATES
+# ============================================================
+
+class StructureArraysAPIView(APIView):
+    """
+    GET /api/structures/<evolf_id>/arrays/?lod=full|ca
+    Serves the pre-converted .npz (float32 coords, uint8 elements, residue indices;
+    see core.services.structure_arrays). lod=ca is the CA-only backbone.
+    """
+    def get(self, request, evolf_id):
+        lod = request.query_params.get("lod", "full")
+        if lod not in ("full", "ca"):
+            return Response({"error": "lod must be 'full' or 'ca'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        array_id = evolf_id if lod == "full" else f"{evolf_id}.ca"
+        media_file = get_media_manifest().get(array_id, "arrays")
+        if not media_file:
+            return Response({"error": "No coordinate arrays found for this ID."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            return serve_file(
+                request, media_file.path, "application/octet-stream",
+                size=media_file.size, mtime=media_file.mtime,
+                immutable=is_current_version(request, media_file),
+                filename=os.path.basename(media_file.path), accel_path=media_file.relpath,
+            )
+        except FileNotFoundError:
+            return Response({"error": "No coordinate arrays found for this ID."}, status=status.HTTP_404_NOT_FOUND)
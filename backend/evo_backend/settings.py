@@ -27,9 +27,100 @@ PATH_AFTER_BASE_DIR=os.getenv('PATH_AFTER_BASE_DIR')
 PREDICT_DOCKER_URL = os.getenv("PREDICT_DOCKER_URL", "")
 JOB_DATA_DIR = os.getenv("JOB_DATA_DIR", "/data")
 MAX_SMILES_LIMIT = int(os.getenv("MAX_SMILES_LIMIT", 1))
+# Rows per multi-row job (predict/batch/)
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", 1000))
+# Ligand x receptor screens (predict/screen/, core.services.screening_jobs)
+MAX_SCREEN_LIGANDS = int(os.getenv("MAX_SCREEN_LIGANDS", 1000))
+MAX_SCREEN_RECEPTORS = int(os.getenv("MAX_SCREEN_RECEPTORS", 50))
+MAX_SCREEN_PAIRS = int(os.getenv("MAX_SCREEN_PAIRS", 10000))
+# 1 = the pipeline reads screening jobs (job_format=screen: ligands.csv + receptors.csv + pair table);
+# 0 = screens are sent as the expanded single-table job CSV (at most MAX_SCREEN_PAIRS rows)
+SCREEN_JOB_FORMAT_SUPPORTED = os.getenv("SCREEN_JOB_FORMAT_SUPPORTED", "0") == "1"
 ENABLE_SCHEDULER = os.getenv("ENABLE_SCHEDULER", "1") == "1"
 DEBUG_LOG = os.getenv("DEBUG_LOG", "0") == "1"
 
+# Pipeline submission pool (core.services.submission_executor)
+SUBMIT_POOL_SIZE = int(os.getenv("SUBMIT_POOL_SIZE", 4))
+SUBMIT_QUEUE_SIZE = int(os.getenv("SUBMIT_QUEUE_SIZE", 100))
+SUBMIT_MAX_RETRIES = int(os.getenv("SUBMIT_MAX_RETRIES", 5))
+SUBMIT_BACKOFF_BASE = float(os.getenv("SUBMIT_BACKOFF_BASE", 1.0))
+SUBMIT_BACKOFF_MAX = float(os.getenv("SUBMIT_BACKOFF_MAX", 60.0))
+SUBMIT_TIMEOUT = float(os.getenv("SUBMIT_TIMEOUT", 30.0))
+SUBMIT_RETRY_AFTER = int(os.getenv("SUBMIT_RETRY_AFTER", 30))
+
+# Durable job queue (core.services.job_scheduler); used when ENABLE_SCHEDULER=1
+JOB_SCHEDULER_CONCURRENCY = int(os.getenv("JOB_SCHEDULER_CONCURRENCY", 2))   # running jobs across all processes
+JOB_SCHEDULER_INTERACTIVE_RESERVED = int(os.getenv("JOB_SCHEDULER_INTERACTIVE_RESERVED", 1))   # slots bulk jobs may not use
+JOB_SCHEDULER_LEASE_SECONDS = int(os.getenv("JOB_SCHEDULER_LEASE_SECONDS", 60))
+# Backstop for slots held while the pipeline runs a submitted job (released when its outcome is recorded)
+JOB_SCHEDULER_PIPELINE_LEASE_SECONDS = int(os.getenv("JOB_SCHEDULER_PIPELINE_LEASE_SECONDS", 6 * 3600))
+JOB_SCHEDULER_POLL_INTERVAL = float(os.getenv("JOB_SCHEDULER_POLL_INTERVAL", 2.0))
+JOB_SCHEDULER_RETRY_DELAY = int(os.getenv("JOB_SCHEDULER_RETRY_DELAY", 10))
+JOB_SCHEDULER_MAX_PENDING = int(os.getenv("JOB_SCHEDULER_MAX_PENDING", 1000))
+# 1 = this process runs a worker, started at app startup (set only in the web server's launch environment);
+# 0 = only `manage.py run_job_worker` runs jobs. Keep 0 with gunicorn --preload: threads started before the fork do not survive it
+JOB_SCHEDULER_IN_PROCESS = os.getenv("JOB_SCHEDULER_IN_PROCESS", "0") == "1"
+
+# Content-addressed prediction result cache (core.services.result_cache)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")   # default: <JOB_DATA_DIR>/_result_cache
+RESULT_CACHE_MAX_AGE_DAYS = int(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", 30))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 1024 ** 3))
+RESULT_CACHE_INFLIGHT_TTL = int(os.getenv("RESULT_CACHE_INFLIGHT_TTL", 6 * 3600))
+RESULT_CACHE_EVICT_INTERVAL = int(os.getenv("RESULT_CACHE_EVICT_INTERVAL", 3600))
+
+# Curated-pair lookup before queuing predictions (core.services.curated_index):
+# "alongside" adds measured records to the job response, "instead" skips the pipeline, "off" disables
+CURATED_LOOKUP_MODE = os.getenv("CURATED_LOOKUP_MODE", "alongside")
+# 1 = load the index in the background at app startup (web server launch environment only)
+CURATED_INDEX_WARM_ON_STARTUP = os.getenv("CURATED_INDEX_WARM_ON_STARTUP", "0") == "1"
+
+# Job status long-poll (?wait=) and SSE stream (core.services.job_events)
+JOB_STATUS_MAX_WAIT = float(os.getenv("JOB_STATUS_MAX_WAIT", 60))
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", 0.5))
+JOB_EVENTS_KEEPALIVE = float(os.getenv("JOB_EVENTS_KEEPALIVE", 15))
+JOB_EVENTS_MAX_SECONDS = float(os.getenv("JOB_EVENTS_MAX_SECONDS", 3600))   # async (ASGI) streams
+# WSGI streams hold a worker thread, so they close after a short window; EventSource reconnects
+# after JOB_EVENTS_RETRY_MS (sent as the stream's retry: field)
+JOB_EVENTS_SYNC_MAX_SECONDS = float(os.getenv("JOB_EVENTS_SYNC_MAX_SECONDS", 45))
+JOB_EVENTS_RETRY_MS = int(os.getenv("JOB_EVENTS_RETRY_MS", 2000))
+
+# Shared secret the pipeline sends (X-Pipeline-Token) to predict/job/<id>/complete; empty disables the webhook
+PIPELINE_CALLBACK_TOKEN = os.getenv("PIPELINE_CALLBACK_TOKEN", "")
+
+# Prediction result pages on the job-status endpoint (?page=&limit=)
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", 100))
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", 1000))
+
+# Job output downloads (core.services.job_archives)
+JOB_ARCHIVE_STREAM_THRESHOLD = int(os.getenv("JOB_ARCHIVE_STREAM_THRESHOLD", 512 * 1024 * 1024))   # bytes; larger outputs stream store-only
+JOB_ACCEL_REDIRECT_PREFIX = os.getenv("JOB_ACCEL_REDIRECT_PREFIX", "")   # nginx internal location aliased to JOB_DATA_DIR
+
+# Job directory layout (core.services.job_paths): "flat" = JOB_DATA_DIR/<id>/, "sharded" = JOB_DATA_DIR/ab/cd/<id>/
+# Existing jobs are found in either layout; with "sharded" the pipeline receives job_subdir.
+JOB_DIR_LAYOUT = os.getenv("JOB_DIR_LAYOUT", "flat")
+
+# Job directory retention (core.services.job_retention, `manage.py sweep_jobs`)
+JOB_RETENTION_MAX_AGE_DAYS = float(os.getenv("JOB_RETENTION_MAX_AGE_DAYS", 30))
+JOB_RETENTION_MAX_BYTES = int(os.getenv("JOB_RETENTION_MAX_BYTES", 50 * 1024 ** 3))
+JOB_RETENTION_MIN_AGE_HOURS = float(os.getenv("JOB_RETENTION_MIN_AGE_HOURS", 24))   # never size-evict younger jobs
+JOB_RETENTION_ARCHIVE_DIR = os.getenv("JOB_RETENTION_ARCHIVE_DIR", "")   # empty: keep results in the database only
+JOB_RETENTION_ARCHIVE_MAX_AGE_DAYS = float(os.getenv("JOB_RETENTION_ARCHIVE_MAX_AGE_DAYS", 365))
+JOB_RETENTION_INTERVAL = int(os.getenv("JOB_RETENTION_INTERVAL", 3600))   # seconds between worker-triggered sweeps; 0 disables
+
+# Native asyncio views for prediction submission, job status and downloads (core.views.async_views).
+# Only for ASGI deployments (evo_backend.asgi); pipeline submission then uses httpx.AsyncClient when installed.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+
+
+# -------------------------------
+# Dataset store
+# -------------------------------
+# Seconds between mtime checks of evolf_data.csv (reload on change)
+DATASET_STORE_CHECK_INTERVAL = float(os.getenv("DATASET_STORE_CHECK_INTERVAL", 2))
+# Max IDs accepted by the batch details / bundle endpoints
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", 1000))
+
 
 # -------------------------------
 # Static & Media Files
@@ -40,6 +131,16 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = BASE_DIR / PATH_AFTER_BASE_DIR
 MEDIA_URL = '/media/'   # Use relative URL here
 
+# Structure-file manifest (pdb_files/, sdf_files/, smiles_2d/): seconds between
+# directory mtime checks, and between full rescans
+MEDIA_MANIFEST_REFRESH_INTERVAL = float(os.getenv("MEDIA_MANIFEST_REFRESH_INTERVAL", 60))
+MEDIA_MANIFEST_FULL_RESCAN_INTERVAL = float(os.getenv("MEDIA_MANIFEST_FULL_RESCAN_INTERVAL", 3600))
+
+# Behind nginx: internal location aliased to MEDIA_ROOT (e.g. "/protected-media/").
+# When set, structure files are handed off with X-Accel-Redirect; enable
+# gzip_static (and brotli_static) on that location to serve the .gz/.br siblings.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+
 
 # -------------------------------
 # Installed apps, middleware etc.
@@ -100,7 +201,7 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         # 'anon' covers all users since you have no login
         # Format examples: '100/day', '10/minute', '5/second'
-        'anon': '60/minute', 
+        'anon': os.getenv("API_ANON_RATE", "60/minute"),   # raise for load tests (`manage.py loadtest_prediction`)
     }
 }
 
@@ -15,12 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path,include
+from django.urls import path,include,re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views.structure_views import MediaStructureFileView
 urlpatterns = [
     #path('admin/', admin.site.urls),
     path("api/", include("core.urls")),  
+    # structure files: precompressed variants / X-Accel-Redirect (before the DEBUG static route)
+    re_path(r"^media/(?P<folder>pdb_files|pdf_files|sdf_files|smiles_2d)/(?P<filename>[^/]+)$",
+            MediaStructureFileView.as_view(), name="media-structure-file"),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file